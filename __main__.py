@@ -1,7 +1,16 @@
 #!/usr/bin/env python3
 
+import sys
+
 from src.chess_engine import setup_game
 from src.chess_engine import game
+from src.chess_engine.uci import UciInterface
+
+
+# Run as UCI engine for chess GUIs ('python chess_engine uci')
+if len(sys.argv) > 1 and sys.argv[1] == 'uci':
+    UciInterface().run()
+    sys.exit()
 
 
 # Confirm program execution
@@ -0,0 +1,194 @@
+"""
+Bulk analysis of positions from EPD or PGN files.
+
+Positions are read lazily and searched by a pool of NegamaxEngine workers. Results (best move, score,
+depth, nodes and time) are written in input order as JSON lines or CSV, with a bounded number of
+positions in flight, so memory use does not depend on the input size. A partial output file can be resumed.
+
+Usage (from the project root):
+    python -m src.chess_engine.analysis positions.epd --depth 4 --workers 4 --output analysis.jsonl
+    python -m src.chess_engine.analysis games.pgn --move-time 0.5 --format csv --output analysis.csv --resume
+"""
+
+import chess
+import chess.pgn
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from .engine_negamax import NegamaxEngine
+
+
+FIELDS = ['index', 'id', 'fen', 'best_move', 'score', 'depth', 'nodes', 'time']
+WINDOW_PER_WORKER = 4 # positions in flight per worker (bounds memory and keeps workers busy)
+REPORT_INTERVAL = 5 # seconds between progress reports
+
+
+def read_positions(path):
+    """
+    Yield (id, fen) for every position of an EPD file (one position per line, id from the 'id' operation)
+    or every position of the main line of each game in a PGN file (id 'game:ply').
+    """
+    with open(path) as f:
+        if path.lower().endswith('.pgn'):
+            game_number = 0
+            while True:
+                game = chess.pgn.read_game(f)
+                if game is None:
+                    break
+                game_number += 1
+                board = game.board()
+                yield f'{game_number}:0', board.fen()
+                for ply, move in enumerate(game.mainline_moves(), start=1):
+                    board.push(move)
+                    yield f'{game_number}:{ply}', board.fen()
+        else:
+            for line_number, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                board = chess.Board()
+                operations = board.set_epd(line)
+                yield str(operations.get('id', line_number)), board.fen()
+
+
+def count_completed(path, output_format) -> int:
+    """ Number of results in a partial output file (an incomplete last line from an interrupted run is removed). """
+    if not os.path.isfile(path):
+        return 0
+    with open(path, 'rb') as f:
+        data = f.read()
+    complete = data[:data.rfind(b'\n') + 1]
+    if len(complete) < len(data):
+        with open(path, 'wb') as f:
+            f.write(complete)
+    num_lines = complete.count(b'\n')
+    if output_format == 'csv':
+        return max(num_lines - 1, 0) # header
+    return num_lines
+
+
+def format_score(score):
+    """ Score as float, forced mates as 'mate' or '-mate' (infinite scores are not valid JSON). """
+    if score is None:
+        return None
+    if abs(score) == float('Inf'):
+        return 'mate' if score > 0 else '-mate'
+    return round(float(score), 4)
+
+
+# Engine of the current worker process (set once per worker by init_worker)
+worker_engine = None
+
+
+def init_worker(settings):
+    """ Create the engine of a pool worker. """
+    global worker_engine
+    worker_engine = NegamaxEngine(**settings)
+
+
+def analyse_position(index, position_id, fen) -> dict:
+    """ Search one position in a pool worker (score in pawns from the side to move). """
+    engine = worker_engine
+    # Fresh move ordering for each position, the transposition table is kept (positions of a game share subtrees)
+    engine.new_game(clear_tt=False)
+    board = chess.Board(fen)
+    start_nodes = engine.num_nodes + engine.num_qnodes
+    start = time.perf_counter()
+    move = engine.make_move(board)
+    elapsed = time.perf_counter() - start
+    return {
+        'index': index,
+        'id': position_id,
+        'fen': fen,
+        'best_move': None if move is None else move.uci(),
+        'score': format_score(engine.evaluation),
+        'depth': engine.completed_depth,
+        'nodes': engine.num_nodes + engine.num_qnodes - start_nodes,
+        'time': round(elapsed, 6),
+        }
+
+
+def analyse(input_path, output_path, settings, workers=1, output_format='jsonl', resume=False, verbose=True) -> dict:
+    """
+    Analyse all positions of the input file and write the results in input order.
+    With resume=True, positions already in the output file are skipped and new results are appended.
+    Returns the number of analysed positions, the elapsed time and positions/sec.
+    """
+    skipped = count_completed(output_path, output_format) if resume else 0
+    positions = read_positions(input_path)
+    for i in range(skipped):
+        next(positions, None)
+
+    start = time.perf_counter()
+    last_report = start
+    num_done = 0
+    with open(output_path, 'a' if resume else 'w', newline='') as f, \
+            ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(settings,)) as pool:
+        writer = None
+        if output_format == 'csv':
+            writer = csv.DictWriter(f, FIELDS)
+            # The header is missing only from a new or empty file (a resumed file may hold just the header)
+            if f.tell() == 0:
+                writer.writeheader()
+        pending = deque()
+
+        def write_next():
+            result = pending.popleft().result()
+            if writer is not None:
+                writer.writerow(result)
+            else:
+                f.write(json.dumps(result) + '\n')
+            f.flush()
+
+        # Keep a bounded window of positions in flight, results are written in submission order
+        for index, (position_id, fen) in enumerate(positions, start=skipped):
+            if len(pending) >= WINDOW_PER_WORKER * workers:
+                write_next()
+                num_done += 1
+            pending.append(pool.submit(analyse_position, index, position_id, fen))
+            now = time.perf_counter()
+            if verbose and now - last_report > REPORT_INTERVAL:
+                print(f'{skipped + num_done} positions | {num_done / (now - start):.2f} positions/sec', file=sys.stderr)
+                last_report = now
+        while pending:
+            write_next()
+            num_done += 1
+
+    elapsed = time.perf_counter() - start
+    summary = {'positions': num_done, 'skipped': skipped, 'time': round(elapsed, 3),
+               'positions_per_sec': round(num_done / elapsed, 3) if elapsed > 0 else None}
+    if verbose:
+        print(f"Analysed {num_done} positions ({skipped} resumed) in {summary['time']}s: "
+              f"{summary['positions_per_sec']} positions/sec", file=sys.stderr)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Analyse positions from an EPD or PGN file.')
+    parser.add_argument('input', help='EPD file (one position per line) or PGN file (all main line positions)')
+    parser.add_argument('--output', required=True, help='output file (JSON lines or CSV)')
+    parser.add_argument('--format', choices=['jsonl', 'csv'], help='output format (default: from file extension)')
+    parser.add_argument('--depth', type=int, default=3, help='search depth (without --move-time)')
+    parser.add_argument('--move-time', type=float, help='seconds per position (iterative deepening)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='number of worker processes')
+    parser.add_argument('--hash', type=int, default=16, help='transposition table size per worker in MB')
+    parser.add_argument('--quiescence', action='store_true', help='resolve captures at the leaves')
+    parser.add_argument('--evaluation', choices=['material', 'pst'], default='material', help='evaluation function')
+    parser.add_argument('--resume', action='store_true', help='skip positions already in the output file')
+    args = parser.parse_args(argv)
+
+    output_format = args.format or ('csv' if args.output.lower().endswith('.csv') else 'jsonl')
+    settings = {'depth': args.depth, 'move_time': args.move_time, 'opening_book': False, 'hash_size': args.hash,
+                'quiescence': args.quiescence, 'evaluation': args.evaluation}
+    analyse(args.input, args.output, settings, args.workers, output_format, args.resume)
+
+
+if __name__ == '__main__':
+    main()
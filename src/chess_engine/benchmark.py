@@ -0,0 +1,404 @@
+"""
+Benchmark suite for move generation and search speed.
+
+Runs perft on standard positions (python-chess and the numba backend), evaluator throughput and
+fixed-depth searches for all engine versions, and reports the results as JSON.
+
+Usage (from the project root):
+    python -m src.chess_engine.benchmark --depth 3 --output bench.json
+    python -m src.chess_engine.benchmark --pruning-depths 2 3 4 5 --output pruning.json
+"""
+
+import chess
+import numba
+import numpy as np
+
+import argparse
+import inspect
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+from . import bitboard
+from .engine_negamax import NegamaxEngine
+from .evaluation import request_evaluation, ScratchEvaluation, TaperedEvaluation, IncrementalEvaluation
+from .engine_versions import (MinimaxEngine, NegamaxEngineV1, NegamaxEngineV2, NegamaxEngineV3,
+                              NegamaxEngineV4, NegamaxEngineV5, NegamaxEngineV6, NegamaxEngineV7,
+                              NegamaxEngineV8, NegamaxEngineV9)
+
+
+# Standard test positions with known perft results (depth 1, 2, 3, ...)
+POSITIONS = {
+    'start': (chess.STARTING_FEN,
+              [20, 400, 8902, 197281, 4865609]),
+    'kiwipete': ('r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1',
+                 [48, 2039, 97862, 4085603]),
+    'position3': ('8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1',
+                  [14, 191, 2812, 43238, 674624]),
+    'position4': ('r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1',
+                  [6, 264, 9467, 422333]),
+    'position5': ('rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8',
+                  [44, 1486, 62379, 2103487]),
+    'middlegame': ('r3k2r/pbp1bp2/2nqpp2/1p1p3p/P3P1QP/1PNP1N2/2P1BPP1/R3K2R b KQkq - 0 11',
+                   []),
+    }
+
+# Engines to compare (constructed with the search depth, opening book disabled)
+ENGINES = {
+    'MinimaxEngine': lambda depth: MinimaxEngine(depth=depth),
+    'NegamaxEngineV1': lambda depth: NegamaxEngineV1(depth=depth),
+    'NegamaxEngineV2': lambda depth: NegamaxEngineV2(depth=depth),
+    'NegamaxEngineV3': lambda depth: NegamaxEngineV3(depth=depth),
+    'NegamaxEngineV4': lambda depth: NegamaxEngineV4(depth=depth),
+    'NegamaxEngineV5': lambda depth: NegamaxEngineV5(depth=depth),
+    'NegamaxEngineV6': lambda depth: NegamaxEngineV6(depth=depth),
+    'NegamaxEngineV7': lambda depth: NegamaxEngineV7(depth=depth),
+    'NegamaxEngineV8': lambda depth: NegamaxEngineV8(depth=depth, opening_book=False),
+    'NegamaxEngineV9': lambda depth: NegamaxEngineV9(depth=depth, opening_book=False),
+    'NegamaxEngine': lambda depth: NegamaxEngine(depth=depth, opening_book=False),
+    'NegamaxEngine_numba': lambda depth: NegamaxEngine(depth=depth, opening_book=False, backend='numba'),
+    'NegamaxEngine_pst': lambda depth: NegamaxEngine(depth=depth, opening_book=False, evaluation='pst'),
+    }
+
+SEARCH_POSITIONS = ['start', 'kiwipete', 'middlegame']
+
+# Allowed cost of the piece-square evaluation relative to the evaluator NegamaxEngine uses by default
+EVAL_COST_BUDGET = 2.0
+
+# Search reductions compared against the plain NegamaxEngine and NegamaxEngineV9 (node counts per depth)
+PRUNING_ENGINES = {
+    'NegamaxEngineV9': lambda depth: NegamaxEngineV9(depth=depth, opening_book=False),
+    'NegamaxEngine': lambda depth: NegamaxEngine(depth=depth, opening_book=False),
+    'NegamaxEngine_pvs': lambda depth: NegamaxEngine(depth=depth, opening_book=False, pvs=True),
+    'NegamaxEngine_nmp': lambda depth: NegamaxEngine(depth=depth, opening_book=False, null_move=True),
+    'NegamaxEngine_lmr': lambda depth: NegamaxEngine(depth=depth, opening_book=False, lmr=True),
+    'NegamaxEngine_all': lambda depth: NegamaxEngine(depth=depth, opening_book=False,
+                                                     pvs=True, null_move=True, lmr=True),
+    }
+
+
+class CountingBoard(chess.Board):
+    """ Board that counts pushed moves, so nodes can be measured for every engine version. """
+
+    num_pushes = 0
+
+    def push(self, move):
+        self.num_pushes += 1
+        return super().push(move)
+
+
+def perft_python(board, depth) -> int:
+    """ Perft with python-chess move generation (bulk counting at depth 1). """
+    if depth == 1:
+        return board.legal_moves.count()
+    count = 0
+    for move in board.legal_moves:
+        board.push(move)
+        count += perft_python(board, depth - 1)
+        board.pop()
+    return count
+
+
+def bench_perft(max_depth, python_depth) -> list:
+    """ Run perft with both move generators and check the results. """
+    results = []
+    bitboard.perft(chess.Board(), 1) # numba compilation
+    for name, (fen, expected) in POSITIONS.items():
+        for depth in range(1, min(max_depth, len(expected)) + 1):
+            for generator, function in (('python-chess', perft_python), ('numba', bitboard.perft)):
+                if generator == 'python-chess' and depth > python_depth:
+                    continue
+                t0 = time.perf_counter()
+                nodes = function(chess.Board(fen), depth)
+                t1 = time.perf_counter()
+                results.append({
+                    'position': name,
+                    'generator': generator,
+                    'depth': depth,
+                    'nodes': nodes,
+                    'correct': nodes == expected[depth-1],
+                    'time': round(t1-t0, 6),
+                    'nps': round(nodes / max(t1-t0, 1e-9)),
+                    })
+    return results
+
+
+def search_position(engine, fen) -> tuple:
+    """ Search one position and return (move, time, nodes). """
+    board = CountingBoard(fen)
+    t0 = time.perf_counter()
+    move = engine.make_move(board)
+    t1 = time.perf_counter()
+    # The numba backend does not push moves on the python board
+    nodes = getattr(engine, 'num_nodes', 0) or board.num_pushes + 1
+    return move, t1-t0, nodes
+
+
+def bench_search(engine_names, depth, position_names, memory=True) -> list:
+    """ Run fixed-depth searches for all selected engines and positions. """
+    results = []
+    for name in engine_names:
+        ENGINES[name](1).make_move(chess.Board()) # numba compilation
+        for position in position_names:
+            fen = POSITIONS[position][0]
+            engine = ENGINES[name](depth)
+            move, elapsed, nodes = search_position(engine, fen)
+            result = {
+                'engine': str(engine),
+                'position': position,
+                'depth': depth,
+                'move': None if move is None else move.uci(),
+                'time_to_depth': round(elapsed, 6),
+                'nodes': nodes,
+                'nps': round(nodes / max(elapsed, 1e-9)),
+                'evals': getattr(engine, 'num_evals', None),
+                'prunes': getattr(engine, 'num_prunes', None),
+                }
+            if hasattr(engine, 'first_move_cutoff_rate'):
+                rate = engine.first_move_cutoff_rate()
+                result['first_move_cutoff_rate'] = None if rate is None else round(rate, 2)
+            # Peak memory is measured in a second run since tracing slows down the search
+            if memory:
+                tracemalloc.start()
+                search_position(ENGINES[name](depth), fen)
+                result['peak_memory'] = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            results.append(result)
+            print(f"{result['engine']} | {position} | time: {result['time_to_depth']}s | nps: {result['nps']}",
+                  file=sys.stderr)
+    return results
+
+
+def bytes_allocated(function, *args) -> int:
+    """ Peak memory allocated by a single call (after a warm-up call). """
+    function(*args)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    function(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak - before
+
+
+def default_evaluator() -> str:
+    """ Name (as in bench_evaluation) of the evaluator NegamaxEngine uses with its default settings. """
+    defaults = {name: parameter.default for name, parameter in inspect.signature(NegamaxEngine).parameters.items()}
+    if defaults['evaluation'] == 'pst':
+        return 'tapered_pst'
+    return 'incremental' if defaults['incremental_eval'] else 'scratch_int8'
+
+
+def bench_evaluation(num_evals, position_names) -> list:
+    """
+    Compare evaluations/sec and allocations per leaf evaluation of the evaluators.
+    The cost of the piece-square evaluation is checked against EVAL_COST_BUDGET times the default evaluator.
+    """
+    default = default_evaluator()
+    results = []
+    for position in position_names:
+        board = chess.Board(POSITIONS[position][0])
+        scratch = ScratchEvaluation()
+        tapered = TaperedEvaluation()
+        incremental = IncrementalEvaluation()
+        incremental.reset(board)
+        evaluators = {
+            'request_evaluation': lambda: request_evaluation(board),
+            'scratch_int8': lambda: scratch.evaluate(board),
+            'tapered_pst': lambda: tapered.evaluate(board),
+            'incremental': lambda: incremental.evaluate(),
+            }
+        speeds = {}
+        entries = {}
+        for name, function in evaluators.items():
+            allocated = bytes_allocated(function)
+            t0 = time.perf_counter()
+            for i in range(num_evals):
+                function()
+            t1 = time.perf_counter()
+            speeds[name] = num_evals / max(t1-t0, 1e-9)
+            entries[name] = {
+                'evaluator': name,
+                'position': position,
+                'evaluation': round(float(function()), 4),
+                'evals_per_sec': round(speeds[name]),
+                'bytes_allocated_per_eval': allocated,
+                }
+        cost = speeds[default] / speeds['tapered_pst']
+        entries['tapered_pst']['cost_vs_default'] = round(cost, 3)
+        entries['tapered_pst']['default_evaluator'] = default
+        entries['tapered_pst']['within_budget'] = cost <= EVAL_COST_BUDGET
+        print(f'evaluation | {position} | pst cost vs {default}: {cost:.2f}x (budget {EVAL_COST_BUDGET}x)',
+              file=sys.stderr)
+        results.extend(entries.values())
+    return results
+
+
+def bench_terminal(num_calls, position_names) -> list:
+    """
+    Compare the per-node cost of terminal detection at the end of a principal variation:
+    board.is_game_over() (as used before) against the hash-stack draw check of NegamaxEngine.negamax,
+    which at interior nodes infers checkmate and stalemate from the move loop and at leaves only tests
+    for any legal move.
+    """
+    results = []
+    for position in position_names:
+        board = chess.Board(POSITIONS[position][0])
+        engine = NegamaxEngine(depth=4, opening_book=False, endgame_table=False)
+        engine.make_move(board)
+        engine.reset_position_keys(board)
+        for move in engine.pv:
+            board.push(move)
+        ply = len(engine.pv)
+        checks = {
+            'is_game_over': lambda: board.is_game_over(),
+            'interior': lambda: engine.is_draw(board, ply),
+            'leaf': lambda: engine.is_draw(board, ply) or not any(board.generate_legal_moves()),
+            }
+        times = {}
+        for name, function in checks.items():
+            t0 = time.perf_counter()
+            for i in range(num_calls):
+                function()
+            times[name] = 1e6 * (time.perf_counter() - t0) / num_calls
+        results.append({
+            'position': position,
+            'ply': ply,
+            'is_game_over_us': round(times['is_game_over'], 3),
+            'interior_node_us': round(times['interior'], 3),
+            'leaf_node_us': round(times['leaf'], 3),
+            'saved_interior_us': round(times['is_game_over'] - times['interior'], 3),
+            'saved_leaf_us': round(times['is_game_over'] - times['leaf'], 3),
+            })
+    return results
+
+
+def bench_pruning(depths, position_names) -> list:
+    """
+    Count the nodes (moves pushed on the board) of fixed-depth searches with the search reductions
+    and report the reduction against NegamaxEngine and NegamaxEngineV9 at the same depth.
+    """
+    results = []
+    for position in position_names:
+        fen = POSITIONS[position][0]
+        for depth in depths:
+            nodes = {}
+            for name, constructor in PRUNING_ENGINES.items():
+                engine = constructor(depth)
+                board = CountingBoard(fen)
+                t0 = time.perf_counter()
+                move = engine.make_move(board)
+                t1 = time.perf_counter()
+                nodes[name] = board.num_pushes
+                results.append({
+                    'engine': str(engine),
+                    'position': position,
+                    'depth': depth,
+                    'move': None if move is None else move.uci(),
+                    'nodes': board.num_pushes,
+                    'time_to_depth': round(t1-t0, 6),
+                    'reduction_vs_negamax': round(1 - board.num_pushes / max(nodes['NegamaxEngine'], 1), 4)
+                                            if 'NegamaxEngine' in nodes else None,
+                    'reduction_vs_v9': round(1 - board.num_pushes / max(nodes['NegamaxEngineV9'], 1), 4),
+                    })
+            print(f'pruning | {position} | depth {depth} | nodes: {nodes}', file=sys.stderr)
+    return results
+
+
+def bench_parallel(depth, worker_counts, position_names) -> list:
+    """
+    Measure the time-to-depth speedup of the parallel search against a single worker.
+    Speedups are only meaningful for worker counts up to the number of available CPUs (reported per result).
+    """
+    results = []
+    cpus = available_cpus()
+    for position in position_names:
+        fen = POSITIONS[position][0]
+        single_time = None
+        for workers in worker_counts:
+            if workers > cpus:
+                print(f'parallel | {workers} workers on {cpus} CPUs, the speedup is not representative', file=sys.stderr)
+            engine = NegamaxEngine(depth=depth, opening_book=False, workers=workers)
+            if workers > 1:
+                engine.start_helpers(chess.Board(), 1) # start processes before timing
+            move, elapsed, nodes = search_position(engine, fen)
+            engine.close()
+            if workers == 1:
+                single_time = elapsed
+            results.append({
+                'engine': str(engine),
+                'position': position,
+                'depth': depth,
+                'workers': workers,
+                'cpus': cpus,
+                'move': None if move is None else move.uci(),
+                'time_to_depth': round(elapsed, 6),
+                'speedup': round(single_time / elapsed, 3) if single_time else None,
+                })
+    return results
+
+
+def available_cpus() -> int:
+    """ Number of CPUs this process may run on. """
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def run_benchmark(engine_names=None, depth=3, perft_depth=4, python_perft_depth=3,
+                  position_names=None, memory=True, worker_counts=None, num_evals=100_000,
+                  pruning_depths=None) -> dict:
+    """ Run the complete benchmark suite and return the results. """
+    engine_names = engine_names or list(ENGINES)
+    position_names = position_names or SEARCH_POSITIONS
+    results = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'platform': platform.platform(),
+            'python': platform.python_version(),
+            'chess': chess.__version__,
+            'numpy': np.__version__,
+            'numba': numba.__version__,
+            'cpus': available_cpus(),
+            },
+        'perft': bench_perft(perft_depth, python_perft_depth),
+        'evaluation': bench_evaluation(num_evals, position_names),
+        'terminal': bench_terminal(num_evals // 10, position_names),
+        'search': bench_search(engine_names, depth, position_names, memory),
+        }
+    if pruning_depths:
+        results['pruning'] = bench_pruning(pruning_depths, position_names)
+    if worker_counts:
+        results['parallel'] = bench_parallel(depth, sorted(set([1] + worker_counts)), position_names)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark move generation and search speed.')
+    parser.add_argument('--depth', type=int, default=3, help='search depth for all engines')
+    parser.add_argument('--perft-depth', type=int, default=4, help='maximum perft depth (numba)')
+    parser.add_argument('--python-perft-depth', type=int, default=3, help='maximum perft depth (python-chess)')
+    parser.add_argument('--engines', nargs='+', choices=list(ENGINES), help='engines to benchmark')
+    parser.add_argument('--positions', nargs='+', choices=list(POSITIONS), help='positions to search')
+    parser.add_argument('--evals', type=int, default=100_000, help='number of calls per evaluator')
+    parser.add_argument('--pruning-depths', type=int, nargs='+',
+                        help='depths for the node count report of PVS, null-move pruning and LMR')
+    parser.add_argument('--workers', type=int, nargs='+', help='worker counts for the parallel search speedup')
+    parser.add_argument('--no-memory', action='store_true', help='skip peak memory measurement')
+    parser.add_argument('--output', help='write JSON to this file instead of stdout')
+    args = parser.parse_args(argv)
+
+    results = run_benchmark(args.engines, args.depth, args.perft_depth, args.python_perft_depth,
+                            args.positions, not args.no_memory, args.workers, args.evals,
+                            args.pruning_depths)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,602 @@
+import chess
+from numba import jit
+import numpy as np
+
+
+# POSITION REPRESENTATION
+
+# A position is stored in three NumPy arrays so it can be searched entirely inside numba:
+#     bb:      int64[2, 7] bitboards per color (0=white, 1=black); index 0 holds all pieces of a color,
+#              indices 1-6 hold the pieces by type (pawn, knight, bishop, rook, queen, king).
+#              Bitboards are kept as int64 (same bits as uint64) to avoid numba's mixed-sign promotions.
+#     squares: int8[64] piece code per square (piece type | color << 3, 0 = empty).
+#     state:   int64[6] side to move, castling rights, en passant square (-1 = none),
+#              halfmove clock, material (positive values favor white) and Zobrist hash.
+# Squares and piece types use the python-chess numbering (a1=0, h8=63, pawn=1, ..., king=6).
+
+SIDE, CASTLING, EP, HALFMOVE, MATERIAL, HASH = range(6)
+
+# Moves are packed into integers: from square | to square << 6 | promotion << 12 | flag << 15
+FLAG_EP = 1
+FLAG_CASTLE = 2
+FLAG_DOUBLE = 4
+
+MAX_PLY = 128 # maximum search depth including the root
+MAX_MOVES = 256 # maximum number of pseudo-legal moves in a position
+MATE = 1_000_000 # checkmate score (reduced by the distance to the root)
+INF = 10_000_000
+
+# Material values indexed by piece type (same values as evaluation.compute_evaluation)
+VALUES = np.array([0, 1, 3, 3, 5, 9, 100], dtype=np.int64)
+
+
+def _to_int64(bitboard) -> int:
+    """ Reinterpret an unsigned 64 bit integer as a signed one. """
+    return bitboard - (1 << 64) if bitboard >= (1 << 63) else bitboard
+
+
+def _make_tables():
+    """ Precompute bit masks, attack tables, rays and Zobrist keys. """
+    bit = np.array([_to_int64(1 << sq) for sq in range(64)], dtype=np.int64)
+    knight = np.zeros(64, dtype=np.int64)
+    king = np.zeros(64, dtype=np.int64)
+    pawn = np.zeros((2, 64), dtype=np.int64)
+    for sq in range(64):
+        knight[sq] = _to_int64(int(chess.BB_KNIGHT_ATTACKS[sq]))
+        king[sq] = _to_int64(int(chess.BB_KING_ATTACKS[sq]))
+        pawn[0, sq] = _to_int64(int(chess.BB_PAWN_ATTACKS[chess.WHITE][sq]))
+        pawn[1, sq] = _to_int64(int(chess.BB_PAWN_ATTACKS[chess.BLACK][sq]))
+    # Rays in the order N, S, E, W (rook) and NE, NW, SE, SW (bishop)
+    directions = ((0, 1), (0, -1), (1, 0), (-1, 0), (1, 1), (-1, 1), (1, -1), (-1, -1))
+    ray_squares = np.zeros((8, 64, 7), dtype=np.int64)
+    ray_length = np.zeros((8, 64), dtype=np.int64)
+    for d, (df, dr) in enumerate(directions):
+        for sq in range(64):
+            f, r = sq % 8 + df, sq // 8 + dr
+            while 0 <= f < 8 and 0 <= r < 8:
+                ray_squares[d, sq, ray_length[d, sq]] = 8 * r + f
+                ray_length[d, sq] += 1
+                f, r = f + df, r + dr
+    # Castling rights kept when a move starts or ends on a square (1=K, 2=Q, 4=k, 8=q)
+    castling_mask = np.full(64, 15, dtype=np.int64)
+    castling_mask[chess.E1], castling_mask[chess.H1], castling_mask[chess.A1] = 12, 14, 13
+    castling_mask[chess.E8], castling_mask[chess.H8], castling_mask[chess.A8] = 3, 11, 7
+    # Zobrist keys (piece code x square, castling rights, en passant file, side to move)
+    rng = np.random.default_rng(2022)
+    info = np.iinfo(np.int64)
+    zobrist_pieces = rng.integers(info.min, info.max, size=(16, 64), dtype=np.int64)
+    zobrist_castling = rng.integers(info.min, info.max, size=16, dtype=np.int64)
+    zobrist_ep = rng.integers(info.min, info.max, size=8, dtype=np.int64)
+    zobrist_side = rng.integers(info.min, info.max, size=2, dtype=np.int64)
+    return (bit, knight, king, pawn, ray_squares, ray_length, castling_mask,
+            zobrist_pieces, zobrist_castling, zobrist_ep, zobrist_side)
+
+
+(BIT, KNIGHT_ATTACKS, KING_ATTACKS, PAWN_ATTACKS, RAY_SQUARES, RAY_LENGTH, CASTLING_MASK,
+ ZOBRIST_PIECES, ZOBRIST_CASTLING, ZOBRIST_EP, ZOBRIST_SIDE) = _make_tables()
+
+DARK_SQUARES = _to_int64(chess.BB_DARK_SQUARES) # for bishops on squares of the same colour
+
+# De Bruijn sequence for finding the index of the least significant bit
+DEBRUIJN = 0x03F79D71B4CB0A89
+DEBRUIJN_INDEX = np.zeros(64, dtype=np.int64)
+for _sq in range(64):
+    DEBRUIJN_INDEX[(((1 << _sq) * DEBRUIJN) % (1 << 64)) >> 58] = _sq
+
+
+# CONVERSION (only used at the root)
+
+def board_to_arrays(board) -> tuple:
+    """ Convert a chess.Board to the array representation used by the numba search. """
+    if board.chess960:
+        raise Exception('Chess960 positions are not supported by the numba backend.')
+    bb = np.zeros((2, 7), dtype=np.int64)
+    squares = np.zeros(64, dtype=np.int8)
+    state = np.zeros(6, dtype=np.int64)
+    # One mask per piece type and color (faster than a loop over the pieces)
+    material = 0
+    for color, occupied in enumerate((board.occupied_co[chess.WHITE], board.occupied_co[chess.BLACK])):
+        bb[color, 0] = _to_int64(occupied)
+        sign = 1 if color == 0 else -1
+        for piece_type in range(1, 7):
+            mask = board.pieces_mask(piece_type, color == 0)
+            bb[color, piece_type] = _to_int64(mask)
+            piece_squares = list(chess.scan_forward(mask))
+            squares[piece_squares] = piece_type | (color << 3)
+            material += sign * int(VALUES[piece_type]) * len(piece_squares)
+    state[MATERIAL] = material
+    state[SIDE] = 0 if board.turn else 1
+    castling = 0
+    for mask, right in ((chess.BB_H1, 1), (chess.BB_A1, 2), (chess.BB_H8, 4), (chess.BB_A8, 8)):
+        if board.castling_rights & mask:
+            castling |= right
+    state[CASTLING] = castling
+    state[EP] = -1 if board.ep_square is None else board.ep_square
+    state[HALFMOVE] = board.halfmove_clock
+    state[HASH] = compute_hash(squares, state)
+    return bb, squares, state
+
+
+@jit(nopython=True, cache=True)
+def compute_hash(squares, state) -> int:
+    """ Compute the Zobrist hash of a position from scratch. """
+    h = ZOBRIST_CASTLING[state[CASTLING]] ^ ZOBRIST_SIDE[state[SIDE]]
+    if state[EP] >= 0:
+        h ^= ZOBRIST_EP[state[EP] & 7]
+    for sq in range(64):
+        if squares[sq] != 0:
+            h ^= ZOBRIST_PIECES[squares[sq], sq]
+    return h
+
+
+def encode_move(board, move) -> int:
+    """ Convert a chess.Move to the packed integer format. """
+    flag = 0
+    if board.is_en_passant(move):
+        flag = FLAG_EP
+    elif board.is_castling(move):
+        flag = FLAG_CASTLE
+    elif board.piece_type_at(move.from_square) == chess.PAWN and abs(move.to_square - move.from_square) == 16:
+        flag = FLAG_DOUBLE
+    return move.from_square | (move.to_square << 6) | ((move.promotion or 0) << 12) | (flag << 15)
+
+
+def decode_move(code):
+    """ Convert a packed integer move to a chess.Move (0 means no move). """
+    if code == 0:
+        return None
+    return chess.Move(code & 63, (code >> 6) & 63, ((code >> 12) & 7) or None)
+
+
+# BITBOARD HELPERS
+
+@jit(nopython=True, cache=True)
+def lsb(bitboard) -> int:
+    """ Index of the least significant set bit. """
+    return DEBRUIJN_INDEX[(((bitboard & -bitboard) * DEBRUIJN) >> 58) & 63]
+
+
+@jit(nopython=True, cache=True)
+def is_attacked(bb, sq, by) -> bool:
+    """ Test if a square is attacked by the given color. """
+    if KNIGHT_ATTACKS[sq] & bb[by, 2]:
+        return True
+    if KING_ATTACKS[sq] & bb[by, 6]:
+        return True
+    if PAWN_ATTACKS[1 - by, sq] & bb[by, 1]:
+        return True
+    occupied = bb[0, 0] | bb[1, 0]
+    rooks = bb[by, 4] | bb[by, 5]
+    bishops = bb[by, 3] | bb[by, 5]
+    for d in range(8):
+        sliders = rooks if d < 4 else bishops
+        if sliders == 0:
+            continue
+        for k in range(RAY_LENGTH[d, sq]):
+            b = BIT[RAY_SQUARES[d, sq, k]]
+            if occupied & b:
+                if sliders & b:
+                    return True
+                break
+    return False
+
+
+@jit(nopython=True, cache=True)
+def in_check(bb, color) -> bool:
+    """ Test if the king of the given color is in check. """
+    return is_attacked(bb, lsb(bb[color, 6]), 1 - color)
+
+
+# MOVE GENERATION
+
+@jit(nopython=True, cache=True)
+def add_pawn_moves(moves, n, frm, to, flag, promotion_rank) -> int:
+    """ Add a pawn move (all four promotions on the last rank). """
+    if to >> 3 == promotion_rank:
+        for promotion in (5, 4, 3, 2):
+            moves[n] = frm | (to << 6) | (promotion << 12)
+            n += 1
+    else:
+        moves[n] = frm | (to << 6) | (flag << 15)
+        n += 1
+    return n
+
+
+@jit(nopython=True, cache=True)
+def generate_moves(bb, squares, state, moves) -> int:
+    """ Write all pseudo-legal moves into the moves buffer and return their number. """
+    us = state[SIDE]
+    them = 1 - us
+    own = bb[us, 0]
+    enemy = bb[them, 0]
+    occupied = own | enemy
+    n = 0
+
+    # Pawns
+    forward = 8 if us == 0 else -8
+    start_rank = 1 if us == 0 else 6
+    promotion_rank = 7 if us == 0 else 0
+    pawns = bb[us, 1]
+    while pawns:
+        frm = lsb(pawns)
+        pawns &= pawns - 1
+        to = frm + forward
+        if not occupied & BIT[to]:
+            n = add_pawn_moves(moves, n, frm, to, 0, promotion_rank)
+            if frm >> 3 == start_rank and not occupied & BIT[to + forward]:
+                moves[n] = frm | ((to + forward) << 6) | (FLAG_DOUBLE << 15)
+                n += 1
+        targets = PAWN_ATTACKS[us, frm] & enemy
+        while targets:
+            to = lsb(targets)
+            targets &= targets - 1
+            n = add_pawn_moves(moves, n, frm, to, 0, promotion_rank)
+        if state[EP] >= 0 and PAWN_ATTACKS[us, frm] & BIT[state[EP]]:
+            moves[n] = frm | (state[EP] << 6) | (FLAG_EP << 15)
+            n += 1
+
+    # Knights and king
+    for piece_type in (2, 6):
+        pieces = bb[us, piece_type]
+        while pieces:
+            frm = lsb(pieces)
+            pieces &= pieces - 1
+            targets = (KNIGHT_ATTACKS[frm] if piece_type == 2 else KING_ATTACKS[frm]) & ~own
+            while targets:
+                to = lsb(targets)
+                targets &= targets - 1
+                moves[n] = frm | (to << 6)
+                n += 1
+
+    # Sliding pieces (bishops, rooks, queens)
+    for piece_type in (3, 4, 5):
+        first = 0 if piece_type == 4 else 4 if piece_type == 3 else 0
+        last = 4 if piece_type == 4 else 8
+        pieces = bb[us, piece_type]
+        while pieces:
+            frm = lsb(pieces)
+            pieces &= pieces - 1
+            for d in range(first, last):
+                for k in range(RAY_LENGTH[d, frm]):
+                    to = RAY_SQUARES[d, frm, k]
+                    if own & BIT[to]:
+                        break
+                    moves[n] = frm | (to << 6)
+                    n += 1
+                    if enemy & BIT[to]:
+                        break
+
+    # Castling (squares between king and rook empty, king not passing through check)
+    rights = state[CASTLING] >> (2 * us)
+    king = 4 if us == 0 else 60
+    if rights & 3 and not is_attacked(bb, king, them):
+        if rights & 1 and not occupied & (BIT[king + 1] | BIT[king + 2]):
+            if not is_attacked(bb, king + 1, them) and not is_attacked(bb, king + 2, them):
+                moves[n] = king | ((king + 2) << 6) | (FLAG_CASTLE << 15)
+                n += 1
+        if rights & 2 and not occupied & (BIT[king - 1] | BIT[king - 2] | BIT[king - 3]):
+            if not is_attacked(bb, king - 1, them) and not is_attacked(bb, king - 2, them):
+                moves[n] = king | ((king - 2) << 6) | (FLAG_CASTLE << 15)
+                n += 1
+
+    return n
+
+
+# MAKE AND UNMAKE
+
+@jit(nopython=True, cache=True)
+def move_piece(bb, squares, state, code, frm, to):
+    """ Move a piece between two squares (target square must be empty). """
+    color = code >> 3
+    mask = BIT[frm] | BIT[to]
+    bb[color, code & 7] ^= mask
+    bb[color, 0] ^= mask
+    squares[frm] = 0
+    squares[to] = code
+    state[HASH] ^= ZOBRIST_PIECES[code, frm] ^ ZOBRIST_PIECES[code, to]
+
+
+@jit(nopython=True, cache=True)
+def toggle_piece(bb, squares, state, code, sq, add):
+    """ Add or remove a piece on a square. """
+    color = code >> 3
+    bb[color, code & 7] ^= BIT[sq]
+    bb[color, 0] ^= BIT[sq]
+    squares[sq] = code if add else 0
+    state[HASH] ^= ZOBRIST_PIECES[code, sq]
+    value = VALUES[code & 7] if color == 0 else -VALUES[code & 7]
+    state[MATERIAL] += value if add else -value
+
+
+@jit(nopython=True, cache=True)
+def make_move(bb, squares, state, undo, move):
+    """ Make a move and save the information needed to unmake it in undo. """
+    frm = move & 63
+    to = (move >> 6) & 63
+    promotion = (move >> 12) & 7
+    flag = move >> 15
+    us = state[SIDE]
+    code = squares[frm]
+    captured = squares[to]
+    undo[0] = captured
+    undo[1] = state[CASTLING]
+    undo[2] = state[EP]
+    undo[3] = state[HALFMOVE]
+    undo[4] = state[MATERIAL]
+    undo[5] = state[HASH]
+
+    # Remove captured piece and move piece
+    if captured:
+        toggle_piece(bb, squares, state, captured, to, False)
+    move_piece(bb, squares, state, code, frm, to)
+    if flag == FLAG_EP:
+        toggle_piece(bb, squares, state, 1 | ((1 - us) << 3), to - 8 if us == 0 else to + 8, False)
+    elif flag == FLAG_CASTLE:
+        if to == 6: move_piece(bb, squares, state, 4 | (us << 3), 7, 5)
+        elif to == 2: move_piece(bb, squares, state, 4 | (us << 3), 0, 3)
+        elif to == 62: move_piece(bb, squares, state, 4 | (us << 3), 63, 61)
+        else: move_piece(bb, squares, state, 4 | (us << 3), 56, 59)
+    if promotion:
+        toggle_piece(bb, squares, state, code, to, False)
+        toggle_piece(bb, squares, state, promotion | (us << 3), to, True)
+
+    # Update castling rights, en passant square, halfmove clock and side to move
+    h = state[HASH] ^ ZOBRIST_CASTLING[state[CASTLING]] ^ ZOBRIST_SIDE[us]
+    state[CASTLING] &= CASTLING_MASK[frm] & CASTLING_MASK[to]
+    h ^= ZOBRIST_CASTLING[state[CASTLING]] ^ ZOBRIST_SIDE[1 - us]
+    if state[EP] >= 0:
+        h ^= ZOBRIST_EP[state[EP] & 7]
+    if flag == FLAG_DOUBLE:
+        state[EP] = (frm + to) >> 1
+        h ^= ZOBRIST_EP[state[EP] & 7]
+    else:
+        state[EP] = -1
+    state[HASH] = h
+    state[HALFMOVE] = 0 if (code & 7) == 1 or captured else state[HALFMOVE] + 1
+    state[SIDE] = 1 - us
+
+
+@jit(nopython=True, cache=True)
+def unmake_move(bb, squares, state, undo, move):
+    """ Unmake a move using the information saved by make_move. """
+    frm = move & 63
+    to = (move >> 6) & 63
+    promotion = (move >> 12) & 7
+    flag = move >> 15
+    us = 1 - state[SIDE]
+    if promotion:
+        toggle_piece(bb, squares, state, promotion | (us << 3), to, False)
+        toggle_piece(bb, squares, state, 1 | (us << 3), to, True)
+    move_piece(bb, squares, state, squares[to], to, frm)
+    if undo[0]:
+        toggle_piece(bb, squares, state, undo[0], to, True)
+    if flag == FLAG_EP:
+        toggle_piece(bb, squares, state, 1 | ((1 - us) << 3), to - 8 if us == 0 else to + 8, True)
+    elif flag == FLAG_CASTLE:
+        if to == 6: move_piece(bb, squares, state, 4 | (us << 3), 5, 7)
+        elif to == 2: move_piece(bb, squares, state, 4 | (us << 3), 3, 0)
+        elif to == 62: move_piece(bb, squares, state, 4 | (us << 3), 61, 63)
+        else: move_piece(bb, squares, state, 4 | (us << 3), 59, 56)
+    state[SIDE] = us
+    state[CASTLING] = undo[1]
+    state[EP] = undo[2]
+    state[HALFMOVE] = undo[3]
+    state[MATERIAL] = undo[4]
+    state[HASH] = undo[5]
+
+
+# PERFT
+
+@jit(nopython=True)
+def perft_arrays(bb, squares, state, moves, undo, ply, depth) -> int:
+    """ Count the leaf nodes of the legal move tree (performance test of move generation). """
+    n = generate_moves(bb, squares, state, moves[ply])
+    us = state[SIDE]
+    count = 0
+    for i in range(n):
+        move = moves[ply, i]
+        make_move(bb, squares, state, undo[ply], move)
+        if not in_check(bb, us):
+            count += 1 if depth == 1 else perft_arrays(bb, squares, state, moves, undo, ply + 1, depth - 1)
+        unmake_move(bb, squares, state, undo[ply], move)
+    return count
+
+
+def perft(board, depth) -> int:
+    """ Count the leaf nodes of the legal move tree of a chess.Board at the given depth. """
+    if depth == 0:
+        return 1
+    bb, squares, state = board_to_arrays(board)
+    moves = np.zeros((MAX_PLY, MAX_MOVES), dtype=np.int64)
+    undo = np.zeros((MAX_PLY, 6), dtype=np.int64)
+    return perft_arrays(bb, squares, state, moves, undo, 0, depth)
+
+
+# ROOT MOVE FEATURES
+
+@jit(nopython=True, cache=True)
+def root_move_features_arrays(bb, squares, state, moves, undo, captures, checks, mobility, count_replies) -> int:
+    """
+    Compact the legal moves of the position into moves[0] and save for each one if it captures, if it gives check
+    and (with count_replies) the number of legal replies of the opponent. Returns the number of legal moves.
+    """
+    n = generate_moves(bb, squares, state, moves[0])
+    us = state[SIDE]
+    count = 0
+    for i in range(n):
+        move = moves[0, i]
+        capture = squares[(move >> 6) & 63] != 0 or (move >> 15) == FLAG_EP
+        make_move(bb, squares, state, undo[0], move)
+        if not in_check(bb, us):
+            moves[0, count] = move # count <= i, the remaining moves are not overwritten
+            captures[count] = capture
+            checks[count] = in_check(bb, 1 - us)
+            if count_replies:
+                m = generate_moves(bb, squares, state, moves[1])
+                replies = 0
+                for j in range(m):
+                    make_move(bb, squares, state, undo[1], moves[1, j])
+                    if not in_check(bb, 1 - us):
+                        replies += 1
+                    unmake_move(bb, squares, state, undo[1], moves[1, j])
+                mobility[count] = replies
+            count += 1
+        unmake_move(bb, squares, state, undo[0], move)
+    return count
+
+
+def root_move_features(board, count_replies=True) -> tuple:
+    """
+    Legal moves of a chess.Board with capture flags, check flags and the opponent's number of legal replies
+    (all -1 without count_replies), computed in one numba call instead of pushing every move on the board.
+    """
+    bb, squares, state = board_to_arrays(board)
+    moves = np.zeros((2, MAX_MOVES), dtype=np.int64)
+    undo = np.zeros((2, 6), dtype=np.int64)
+    captures = np.zeros(MAX_MOVES, dtype=np.bool_)
+    checks = np.zeros(MAX_MOVES, dtype=np.bool_)
+    mobility = np.full(MAX_MOVES, -1, dtype=np.int64)
+    n = root_move_features_arrays(bb, squares, state, moves, undo, captures, checks, mobility, count_replies)
+    return [decode_move(int(code)) for code in moves[0, :n]], captures[:n], checks[:n], mobility[:n]
+
+
+# SEARCH
+
+@jit(nopython=True, cache=True)
+def has_legal_move(bb, squares, state, moves, undo) -> bool:
+    """ Test if the side to move has at least one legal move. """
+    n = generate_moves(bb, squares, state, moves)
+    us = state[SIDE]
+    for i in range(n):
+        make_move(bb, squares, state, undo, moves[i])
+        legal = not in_check(bb, us)
+        unmake_move(bb, squares, state, undo, moves[i])
+        if legal:
+            return True
+    return False
+
+
+@jit(nopython=True, cache=True)
+def is_draw(bb, squares, state, hashes, moves, undo, index) -> bool:
+    """
+    Detect draws by repetition (of any earlier position of the game or the search, compared by hash),
+    the fifty-move rule and insufficient material. hashes[index] holds the current position.
+    """
+    p = index - 2
+    while p >= 0 and p >= index - state[HALFMOVE]:
+        if hashes[p] == state[HASH]:
+            return True
+        p -= 2
+    if state[HALFMOVE] >= 100:
+        # Checkmate takes precedence over the fifty-move rule
+        return not in_check(bb, state[SIDE]) or has_legal_move(bb, squares, state, moves, undo)
+    if bb[0, 1] | bb[1, 1] | bb[0, 4] | bb[1, 4] | bb[0, 5] | bb[1, 5]:
+        return False
+    # Same rule as chess.Board.is_insufficient_material: a single knight, or bishops all on one square colour
+    knights = bb[0, 2] | bb[1, 2]
+    bishops = bb[0, 3] | bb[1, 3]
+    if knights:
+        return bishops == 0 and knights & (knights - 1) == 0
+    return bishops & DARK_SQUARES == 0 or bishops & ~DARK_SQUARES == 0
+
+
+@jit(nopython=True)
+def negamax_arrays(bb, squares, state, moves, scores, undo, hashes, stats, root, ply, depth, alpha, beta, pv_move) -> int:
+    """
+    Negamax search with alpha-beta pruning on the array representation.
+    Moves are ordered lazily: previous best move, then captures (MVV-LVA), then quiet moves.
+    hashes starts with the root number of positions of the game before the root (for repetitions).
+    stats holds the number of nodes, evaluations and prunes.
+    """
+    stats[0] += 1
+    hashes[root + ply] = state[HASH]
+    us = state[SIDE]
+
+    # Check conditions to exit recursion
+    if ply > 0 and is_draw(bb, squares, state, hashes, moves[ply], undo[ply], root + ply):
+        return 0
+    if depth == 0:
+        if not has_legal_move(bb, squares, state, moves[ply], undo[ply]):
+            return -(MATE - ply) if in_check(bb, us) else 0
+        stats[1] += 1
+        return state[MATERIAL] if us == 0 else -state[MATERIAL]
+
+    # Score moves for ordering
+    n = generate_moves(bb, squares, state, moves[ply])
+    for i in range(n):
+        move = moves[ply, i]
+        victim = squares[(move >> 6) & 63] & 7
+        if move == pv_move:
+            scores[ply, i] = 1_000_000
+        elif victim:
+            scores[ply, i] = 1000 * VALUES[victim] - VALUES[squares[move & 63] & 7]
+        elif (move >> 12) & 7:
+            scores[ply, i] = 1000 * VALUES[(move >> 12) & 7]
+        else:
+            scores[ply, i] = 0
+
+    # Loop through moves (selection of the highest scored remaining move)
+    best_eval = -INF
+    best_move = 0
+    for i in range(n):
+        best = i
+        for j in range(i + 1, n):
+            if scores[ply, j] > scores[ply, best]:
+                best = j
+        move = moves[ply, best]
+        moves[ply, best], scores[ply, best] = moves[ply, i], scores[ply, i]
+        moves[ply, i] = move
+        make_move(bb, squares, state, undo[ply], move)
+        if in_check(bb, us):
+            unmake_move(bb, squares, state, undo[ply], move)
+            continue
+        evaluation = -negamax_arrays(bb, squares, state, moves, scores, undo, hashes, stats,
+                                     root, ply + 1, depth - 1, -beta, -alpha, 0)
+        unmake_move(bb, squares, state, undo[ply], move)
+        if evaluation > best_eval:
+            best_eval = evaluation
+            best_move = move
+        # Pruning
+        alpha = max(alpha, best_eval)
+        if alpha >= beta:
+            stats[2] += 1
+            break
+
+    # No legal moves: checkmate or stalemate
+    if best_move == 0:
+        return -(MATE - ply) if in_check(bb, us) else 0
+    if ply == 0:
+        stats[3] = best_move
+    return best_eval
+
+
+def history_hashes(board) -> np.ndarray:
+    """ Hashes of the earlier positions of the game that can still be repeated (since the last irreversible move). """
+    board = board.copy()
+    hashes = []
+    for i in range(min(board.halfmove_clock, len(board.move_stack))):
+        board.pop()
+        hashes.append(board_to_arrays(board)[2][HASH])
+    return np.array(hashes[::-1], dtype=np.int64)
+
+
+def search(board, depth, pv_move=None) -> tuple:
+    """
+    Search a chess.Board to a fixed depth with the numba backend.
+    Returns the evaluation (from the side to move), the best move and the counters (nodes, evals, prunes).
+    """
+    bb, squares, state = board_to_arrays(board)
+    moves = np.zeros((MAX_PLY, MAX_MOVES), dtype=np.int64)
+    scores = np.zeros((MAX_PLY, MAX_MOVES), dtype=np.int64)
+    undo = np.zeros((MAX_PLY, 6), dtype=np.int64)
+    history = history_hashes(board)
+    hashes = np.zeros(len(history) + MAX_PLY, dtype=np.int64)
+    hashes[:len(history)] = history
+    stats = np.zeros(4, dtype=np.int64)
+    pv_code = 0 if pv_move is None else encode_move(board, pv_move)
+    evaluation = negamax_arrays(bb, squares, state, moves, scores, undo, hashes, stats,
+                                len(history), 0, min(depth, MAX_PLY - 1), -INF, INF, pv_code)
+    # Convert checkmate scores to the infinite scores used by the python search
+    if abs(evaluation) >= MATE - MAX_PLY:
+        evaluation = float('Inf') if evaluation > 0 else float('-Inf')
+    return evaluation, decode_move(int(stats[3])), stats[:3]
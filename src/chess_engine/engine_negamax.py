@@ -1,84 +1,776 @@
 import chess
 import chess.polyglot
-import chess.syzygy
 import numpy as np
 
-from .evaluation import request_evaluation
+import multiprocessing as mp
+import threading
+import time
+
+from . import bitboard
+from .position_cache import PositionCache
+from .profiling import SearchProfiler
+from .evaluation import ScratchEvaluation, TaperedEvaluation, IncrementalEvaluation, PIECE_VALUES, EVALUATIONS
+from .resources import EngineResources, BOOK_PATH, TABLEBASE_PATH
+from .transposition import TranspositionTable, EXACT, LOWER, UPPER
+
+
+MAX_DEPTH = 64 # depth limit for time-controlled searches
+MOVES_TO_GO = 30 # assumed number of remaining moves when playing on a clock
+BRANCHING_ESTIMATE = 4 # assumed growth of search time per iteration (numba backend)
+DELTA_MARGIN = 2 # safety margin of delta pruning in quiescence search (in pawns)
+NULL_WINDOW = 0.01 # width of the zero window in principal variation search (in pawns)
+NULL_MOVE_REDUCTION = 2 # depth reduction of the null move search
+LMR_MIN_DEPTH = 3 # late move reductions are only applied from this remaining depth
+LMR_MIN_INDEX = 3 # number of moves searched at full depth before reducing
+MATE = 1_000_000 # score of being checkmated at the root is -MATE, at ply p it is -(MATE - p)
+MATE_BOUND = MATE - 1000 # scores beyond this are checkmate scores
+
+
+class SearchTimeout(Exception):
+    """ Raised inside the search when the time budget of a move is used up. """
+
+
+def score_to_tt(score, ply):
+    """ Store checkmate scores relative to the node instead of the root (same entry at any ply). """
+    if score >= MATE_BOUND:
+        return score + ply
+    if score <= -MATE_BOUND:
+        return score - ply
+    return score
+
+
+def score_from_tt(score, ply):
+    """ Convert a stored checkmate score back to the distance from the root. """
+    if score >= MATE_BOUND:
+        return score - ply
+    if score <= -MATE_BOUND:
+        return score + ply
+    return score
 
 
 class NegamaxEngine:
     """
     Chess engine using a negamax algorithm.
-    Includes alpha-beta pruning and systematic move-ordering.
+    Includes alpha-beta pruning, a transposition table and staged move ordering
+    (hash move, captures by MVV-LVA, killer moves, quiet moves by history heuristic).
     Opening book and endgame tablebase are available.
+    Searches to a fixed depth or, if a time budget is given, with iterative deepening.
+    The backend 'numba' runs the whole search on bitboards in compiled code (see bitboard.py).
+    With workers > 1, helper processes search the same root and share the transposition table (Lazy SMP).
+    Optionally, leaf nodes are resolved with a quiescence search over captures (and checks).
+    Principal variation search, null-move pruning and late move reductions can be enabled independently.
+    With ponder=True, the expected reply is searched in a background thread while the opponent thinks.
+    With a cache_path, search results are kept in a persistent position cache shared across runs.
+    The evaluation is material only ('material') or adds tapered piece-square tables ('pst').
+    With profile=True, time per search phase and statistics per depth are recorded for each move (see profiling.py).
     """
     
-    def __init__(self, depth=1, opening_book=True, endgame_table=True):
+    def __init__(self, depth=1, opening_book=True, endgame_table=True, transposition_table=True, hash_size=16,
+                 incremental_eval=True, move_time=None, backend='python', workers=1,
+                 book_path=BOOK_PATH, tablebase_path=TABLEBASE_PATH, quiescence=False, quiescence_checks=False,
+                 pvs=False, null_move=False, lmr=False, ponder=False, cache_path=None, cache_read_only=False,
+                 evaluation='material', profile=False, profile_path=None):
+        if backend not in ('python', 'numba'):
+            raise Exception(f'No backend named {backend} available.')
+        if evaluation not in EVALUATIONS:
+            raise Exception(f'No evaluation named {evaluation} available.')
+        if evaluation != 'material' and backend != 'python':
+            raise Exception('The numba backend only supports the material evaluation.')
+        if workers > 1 and (backend != 'python' or not transposition_table):
+            raise Exception('Parallel search requires the python backend and a transposition table.')
         self.depth = int(depth)
+        self.move_time = move_time # seconds per move (None = fixed depth)
+        self.backend = backend
         self.color = None # updated for given board (white=1, black=-1)
         self.opening_book = opening_book
         self.endgame_table = endgame_table
+        self.resources = EngineResources(book_path, tablebase_path, opening_book, endgame_table)
+        self.evaluation_name = evaluation
+        # The incremental evaluation only covers material
+        self.evaluator = IncrementalEvaluation() if incremental_eval and evaluation == 'material' else None
+        self.scratch_evaluator = TaperedEvaluation() if evaluation == 'pst' else ScratchEvaluation()
+        self.quiescence = quiescence
+        self.quiescence_checks = quiescence_checks # also search checking moves at the first quiescence ply
+        self.pvs = pvs # search moves after the first with a zero window (re-search if they raise alpha)
+        self.null_move = null_move # prune if passing still fails high on a reduced search
+        self.lmr = lmr # search late quiet moves with reduced depth (re-search if they raise alpha)
+        self.ponder = ponder # search the position after the expected reply on the opponent's time
+        self.ponder_thread = None # background search of the expected position
+        self.ponder_board = None # position after the expected reply
+        self.ponder_result = None # best move found by the background search
+        self.ponder_depth = None # depth limit of the background search
+        self.ponder_start = None # start time of the background search
+        self.num_ponder_hits = 0 # only for statistical purposes
+        self.num_ponder_misses = 0 # only for statistical purposes
+        self.cache = PositionCache(cache_path, cache_read_only) if cache_path else None
+        # Settings that change search results (only results of equal settings are taken from the cache)
+        self.cache_namespace = 'NegamaxEngine' + ''.join(f',{name}' for name, enabled in (
+            ('numba', backend == 'numba'), ('pst', evaluation == 'pst'), ('et', endgame_table), ('qs', quiescence), ('qs_checks', quiescence_checks),
+            ('pvs', pvs), ('nmp', null_move), ('lmr', lmr)) if enabled)
+        self.hash_size = hash_size # in MB
+        self.tt = TranspositionTable(hash_size, shared=workers > 1) if transposition_table else None
+        self.workers = workers
+        self.helpers = [] # helper processes and their task queues (started on the first search)
+        self.search_counter = None # shared id of the current search (helpers stop when it changes)
+        self.search_id = 0 # id of the search a helper is working on
+        self.is_helper = False
+        self.num_nodes = 0 # only for statistical purposes
         self.num_evals = 0 # only for statistical purposes
         self.num_prunes = 0 # only for statistical purposes
+        self.num_qnodes = 0 # only for statistical purposes
+        self.num_tt_hits = 0 # only for statistical purposes
+        self.num_tt_misses = 0 # only for statistical purposes
+        self.num_tt_overwrites = 0 # only for statistical purposes
+        self.num_cutoffs = 0 # only for statistical purposes
+        self.num_first_move_cutoffs = 0 # only for statistical purposes
+        self.killers = {} # two quiet moves per ply that recently caused a cutoff
+        self.history = np.zeros((2, 64, 64), dtype=np.int64) # cutoff scores of quiet moves (color, from, to)
+        self.deadline = None # updated for each time-controlled search
+        self.pending_deadline = None # deadline set before the next time-controlled search started (see set_deadline)
+        self.deadline_active = False # a time-controlled search is running
+        self.deadline_lock = threading.Lock() # the deadline may be changed from other threads
+        self.abortable = False # the running search may be aborted (an iteration has completed)
+        self.stop_requested = False # set by stop() to end an iterative deepening search early
+        self.info_callback = None # called with search information after each completed iteration
+        self.root_ply = 0 # updated for given board
+        self.pv = [] # principal variation of the last completed iteration
+        self.pv_table = {} # principal variation per ply during search
+        self.completed_depth = 0 # depth of the last completed iteration
+        self.position_keys = [] # positions since the last irreversible move before the root, then one per ply
+        self.num_history_keys = 0 # number of positions before the root in position_keys
+        self.profiler = SearchProfiler(self, profile_path) if profile else None # instruments this instance only
+        self.evaluation = None # evaluation of the last completed iteration (infinite for a forced checkmate)
+        self.mate_plies = None # plies to the forced checkmate of the last completed iteration (python backend)
         
     def __str__(self):
-        return f'NegamaxEngine(depth={self.depth})'
-    
-    def make_move(self, board) -> chess.Move:
-        # Check opening book
-        if self.opening_book: 
-                try:
-                    with chess.polyglot.open_reader("polyglot/performance.bin") as reader:
-                        return reader.weighted_choice(board).move
-                except:
-                    self.opening_book = False
+        backend = ',numba' if self.backend == 'numba' else ''
+        backend += f',workers={self.workers}' if self.workers > 1 else ''
+        backend += ',pst' if self.evaluation_name == 'pst' else ''
+        backend += ',qs' if self.quiescence else ''
+        backend += ',pvs' if self.pvs else ''
+        backend += ',nmp' if self.null_move else ''
+        backend += ',lmr' if self.lmr else ''
+        if self.move_time is not None:
+            return f'NegamaxEngine(move_time={self.move_time}{backend})'
+        return f'NegamaxEngine(depth={self.depth}{backend})'
+    
+    def make_move(self, board, clock=None, increment=0) -> chess.Move:
+        """
+        Select a move for the given board.
+        Optionally, the remaining clock time and increment (in seconds) determine the time budget.
+        """
+        start = time.perf_counter()
+        move = self.select_move(board, clock, increment)
+        if self.profiler is not None:
+            self.profiler.record_move(board, move, time.perf_counter() - start)
+        return move
+    
+    def select_move(self, board, clock=None, increment=0) -> chess.Move:
+        """ Select a move from pondering, opening book, position cache or search (see make_move). """
+        budget = self.allocate_time(clock, increment)
+        # Continue the search on the opponent's time if the expected reply was played
+        move = self.stop_pondering(board, budget)
+        if move is None:
+            # Check opening book
+            move = self.resources.book_move(board)
+            if move is not None:
+                self.pv = [] # no search ran, the principal variation is from another position
+                return move
+            # Check persistent cache (results of fixed depth searches only)
+            cached = None
+            if self.cache is not None and budget is None:
+                cached = self.cache.probe(board, self.depth, self.cache_namespace)
+            if cached is not None:
+                move, self.evaluation, self.completed_depth = cached
+                self.pv = [move]
+                self.mate_plies = None
+            else:
+                # Search with time budget or at fixed depth
+                self.stop_requested = False
+                move = self.search(board, budget)
+                if self.cache is not None:
+                    self.cache.store(board, self.completed_depth, move, self.evaluation, self.cache_namespace)
+        if self.ponder:
+            self.start_pondering(board, move, MAX_DEPTH if budget is not None else self.depth)
+        return move
+    
+    def search(self, board, budget=None, max_depth=None) -> chess.Move:
+        """
+        Search the board without consulting the opening book.
+        Without budget and max_depth, negamax is called once at the engine depth.
+        Otherwise iterative deepening runs until the budget is used up, max_depth is reached or stop() is called.
+        """
+        self.check_not_pondering()
         # Determine color
         self.color = 1 if board.turn else -1
-        # Call negamax search algorithm
-        return self.negamax(board, self.color, self.depth, float('-Inf'), float('Inf'))[1]
+        self.root_ply = len(board.move_stack)
+        self.pv = []
+        self.mate_plies = None
+        iterative = budget is not None or max_depth is not None
+        if self.backend == 'numba':
+            return self.search_numba(board, budget, max_depth)
+        # Initialize incremental evaluation at the root
+        if self.evaluator is not None:
+            self.evaluator.reset(board)
+        self.reset_move_ordering()
+        self.reset_position_keys(board)
+        # Let helper processes search the same position
+        if self.workers > 1:
+            self.start_helpers(board, max_depth or (MAX_DEPTH if iterative else self.depth + 1))
+        try:
+            if iterative:
+                best_move = self.iterative_deepening(board, budget, max_depth or MAX_DEPTH)
+            else:
+                # Call negamax search algorithm at fixed depth
+                self.deadline = None
+                if self.profiler is not None:
+                    self.profiler.start_iteration()
+                evaluation, best_move = self.negamax(board, self.color, self.depth, float('-Inf'), float('Inf'))
+                if self.profiler is not None:
+                    self.profiler.end_iteration(self.depth)
+                self.pv = self.pv_table.get(0, [best_move])
+                self.completed_depth = self.depth
+                self.set_evaluation(evaluation)
+        finally:
+            if self.workers > 1:
+                self.stop_helpers()
+        return best_move
+    
+    def stop(self):
+        """ Ask a running iterative deepening search (e.g. in another thread) to return as soon as possible. """
+        self.stop_requested = True
+    
+    def start_pondering(self, board, move, max_depth):
+        """ Search the position after the move and the expected reply (second move of the PV) in the background. """
+        self.check_not_pondering()
+        if move is None or len(self.pv) < 2 or self.pv[0] != move:
+            return
+        ponder_board = board.copy()
+        ponder_board.push(move)
+        if not ponder_board.is_legal(self.pv[1]):
+            return
+        ponder_board.push(self.pv[1])
+        if ponder_board.is_game_over():
+            return
+        self.ponder_board = ponder_board
+        self.ponder_depth = max_depth
+        self.ponder_start = time.perf_counter()
+        self.ponder_result = None
+        self.stop_requested = False
+        self.ponder_thread = threading.Thread(target=self.ponder_search, args=(ponder_board.copy(), max_depth),
+                                              daemon=True)
+        self.ponder_thread.start()
+    
+    def ponder_search(self, board, max_depth):
+        """ Run the background search (until max_depth, a ponder hit with time budget or stop()). """
+        self.ponder_result = self.search(board, None, max_depth)
+    
+    def check_not_pondering(self):
+        """
+        Raise if the background search is running and this is not its thread (it uses the search state of the engine).
+        make_move, new_game and close end the background search first, other callers must call stop_pondering.
+        """
+        thread = self.ponder_thread
+        if thread is not None and thread.is_alive() and threading.current_thread() is not thread:
+            raise Exception('The engine is pondering, call stop_pondering() before searching.')
+    
+    def stop_pondering(self, board=None, budget=None) -> chess.Move:
+        """
+        End the background search. If the board is the expected position (ponder hit),
+        the search continues until the time budget (counted from the start of pondering) is used up
+        or its depth is reached, and its move is returned.
+        Otherwise the search is aborted and None is returned (the transposition table stays warm).
+        """
+        if self.ponder_thread is None:
+            return None
+        # Without time budget, only a search limited to the engine depth can be continued
+        hit = board is not None and board == self.ponder_board and (budget is not None or self.ponder_depth <= self.depth)
+        timer = None
+        if hit:
+            self.num_ponder_hits += 1
+            if budget is not None:
+                timer = threading.Timer(max(budget - (time.perf_counter() - self.ponder_start), 0), self.stop)
+                timer.start()
+        else:
+            self.num_ponder_misses += 1
+            self.stop()
+        self.ponder_thread.join()
+        if timer is not None:
+            timer.cancel()
+        self.ponder_thread = None
+        self.ponder_board = None
+        return self.ponder_result if hit else None
+    
+    def allocate_time(self, clock=None, increment=0, moves_to_go=MOVES_TO_GO):
+        """ Compute the time budget for a move in seconds (None = fixed depth search). """
+        if clock is not None:
+            budget = clock / moves_to_go + increment
+            # Never spend more than half of the remaining clock
+            return min(budget, clock / 2)
+        return self.move_time
+    
+    def iterative_deepening(self, board, budget=None, max_depth=MAX_DEPTH) -> chess.Move:
+        """
+        Search with increasing depth until the time budget is used up (or max_depth is reached).
+        Returns the best move of the last completed iteration.
+        The deadline may be changed while searching (e.g. on a ponder hit, see set_deadline).
+        """
+        start = time.perf_counter()
+        with self.deadline_lock:
+            self.deadline = None if budget is None else start + budget
+            if self.pending_deadline is not None:
+                self.deadline = self.pending_deadline
+                self.pending_deadline = None
+            self.deadline_active = True
+        start_nodes = self.num_nodes + self.num_qnodes
+        best_move = None
+        for depth in range(1, max_depth + 1):
+            # The first iteration always completes so that a move is available
+            self.abortable = depth > 1
+            if self.profiler is not None:
+                self.profiler.start_iteration()
+            try:
+                evaluation, move = self.negamax(board, self.color, depth, float('-Inf'), float('Inf'))
+            except SearchTimeout:
+                # Restore the root position
+                while len(board.move_stack) > self.root_ply:
+                    self.pop_move(board)
+                break
+            best_move = move
+            self.pv = self.pv_table.get(0, [move])
+            self.completed_depth = depth
+            self.set_evaluation(evaluation)
+            if self.profiler is not None:
+                self.profiler.end_iteration(depth)
+            # Report progress
+            if self.info_callback is not None:
+                self.info_callback({'depth': depth, 'score': self.evaluation, 'mate_plies': self.mate_plies,
+                                    'nodes': self.num_nodes + self.num_qnodes - start_nodes,
+                                    'time': time.perf_counter() - start, 'pv': self.pv})
+            # Stop if a forced checkmate was found or the next iteration is unlikely to finish
+            if self.mate_plies is not None:
+                break
+            if self.deadline is not None and time.perf_counter() - start > (self.deadline - start) / 2:
+                break
+        self.abortable = False
+        with self.deadline_lock:
+            self.deadline = None
+            self.deadline_active = False
+        return best_move
+    
+    def set_deadline(self, budget):
+        """
+        Let the running time-controlled search end budget seconds from now (e.g. on a ponder hit, from another thread).
+        If the search has not set up its deadline yet, it starts with this one. budget=None removes a pending deadline.
+        """
+        with self.deadline_lock:
+            deadline = None if budget is None else time.perf_counter() + budget
+            if self.deadline_active and deadline is not None:
+                self.deadline = deadline
+            else:
+                self.pending_deadline = deadline
+    
+    def set_evaluation(self, evaluation):
+        """ Save the root score of a completed search, checkmate scores as infinite scores and the plies to mate. """
+        if abs(evaluation) >= MATE_BOUND:
+            self.mate_plies = int(MATE - abs(evaluation))
+            self.evaluation = float('Inf') if evaluation > 0 else float('-Inf')
+        else:
+            self.mate_plies = None
+            self.evaluation = evaluation
+    
+    def start_helpers(self, board, max_depth):
+        """ Start a new search of the given position in all helper processes. """
+        if not self.helpers:
+            self.search_counter = mp.RawValue('l', 0)
+            settings = {'depth': self.depth, 'opening_book': False, 'endgame_table': self.endgame_table, 
+                        'tablebase_path': self.resources.tablebase_path, 'quiescence': self.quiescence,
+                        'quiescence_checks': self.quiescence_checks,
+                        'evaluation': self.evaluation_name, 'pvs': self.pvs, 'null_move': self.null_move, 'lmr': self.lmr,
+                        'transposition_table': False, 'incremental_eval': self.evaluator is not None}
+            for index in range(1, self.workers):
+                tasks = mp.Queue()
+                process = mp.Process(target=lazy_smp_helper, daemon=True,
+                    args=(index, settings, self.hash_size, self.tt.name, self.search_counter, tasks))
+                process.start()
+                self.helpers.append((process, tasks))
+        self.search_counter.value += 1
+        for process, tasks in self.helpers:
+            tasks.put((self.search_counter.value, board.copy(), max_depth))
+    
+    def stop_helpers(self):
+        """ Abort the current search in all helper processes. """
+        self.search_counter.value += 1
+    
+    def close(self):
+        """ Shut down helper processes, release the shared transposition table and close book and tablebases. """
+        self.stop_pondering()
+        for process, tasks in self.helpers:
+            tasks.put(None)
+        for process, tasks in self.helpers:
+            process.join()
+        self.helpers = []
+        if self.tt is not None:
+            self.tt.close(unlink=True)
+        if self.cache is not None:
+            self.cache.close()
+        self.resources.close()
+    
+    def search_numba(self, board, budget=None, max_depth=None) -> chess.Move:
+        """
+        Search with the numba backend, at fixed depth or with iterative deepening (as search()).
+        Iterations cannot be interrupted, so a new one only starts if it is expected to finish in time
+        (and stop() has not been called).
+        """
+        start = time.perf_counter()
+        best_move = None
+        iterative = budget is not None or max_depth is not None
+        for depth in range(1, (max_depth or MAX_DEPTH) + 1) if iterative else [self.depth]:
+            iteration_start = time.perf_counter()
+            if self.profiler is not None:
+                self.profiler.start_iteration()
+            evaluation, best_move, stats = bitboard.search(board, depth, best_move)
+            self.num_nodes += int(stats[0])
+            self.num_evals += int(stats[1])
+            self.num_prunes += int(stats[2])
+            self.pv = [best_move]
+            self.completed_depth = depth
+            self.evaluation = evaluation
+            if self.profiler is not None:
+                self.profiler.end_iteration(depth)
+            # Stop if a forced checkmate was found or the next iteration is unlikely to finish
+            now = time.perf_counter()
+            if not iterative or abs(evaluation) == float('Inf') or self.stop_requested:
+                break
+            if budget is not None and now - start + BRANCHING_ESTIMATE * (now - iteration_start) > budget:
+                break
+        return best_move
+    
+    def reset_move_ordering(self):
+        """ Clear the killer moves and age the history scores before a new search. """
+        self.killers = {}
+        self.history //= 2
+    
+    def new_game(self, clear_tt=True):
+        """ Forget the results of earlier games (transposition table unless clear_tt=False, move ordering, pondering). """
+        self.stop_pondering()
+        if self.tt is not None and clear_tt:
+            self.tt.clear()
+        self.killers = {}
+        self.history[:] = 0
+        self.pv = []
+    
+    def reset_position_keys(self, board):
+        """ Collect the positions of the game that can still be repeated (since the last irreversible move). """
+        board = board.copy()
+        keys = []
+        for i in range(min(board.halfmove_clock, len(board.move_stack))):
+            board.pop()
+            keys.append(board._transposition_key())
+        self.position_keys = keys[::-1]
+        self.num_history_keys = len(keys)
+    
+    def is_draw(self, board, ply) -> bool:
+        """
+        Detect draws by repetition (of any earlier position, compared by hash), the fifty-move rule
+        and insufficient material. Stores the position in the hash stack at index num_history_keys + ply.
+        """
+        keys = self.position_keys
+        del keys[self.num_history_keys + ply:]
+        # Same hash as python-chess uses for its repetition checks (cheap tuple of bitboards)
+        key = board._transposition_key()
+        keys.append(key)
+        # Earlier positions with the same side to move since the last capture or pawn move
+        n = len(keys)
+        for i in range(n - 3, max(n - 2 - board.halfmove_clock, -1), -2):
+            if keys[i] == key:
+                return True
+        if board.halfmove_clock >= 100 and not board.is_checkmate():
+            return True
+        return board.is_insufficient_material()
+    
+    def first_move_cutoff_rate(self) -> float:
+        """ Percentage of beta cutoffs caused by the first searched move (measures move ordering quality). """
+        if self.num_cutoffs == 0:
+            return None
+        return 100 * self.num_first_move_cutoffs / self.num_cutoffs
     
-    def negamax(self, board, color, depth, alpha, beta):
+    def check_stop(self):
+        """ Abort the search if the time budget is used up, stop() was called or a helper's search was cancelled. """
+        if self.abortable and (self.stop_requested or 
+                               self.deadline is not None and time.perf_counter() > self.deadline):
+            raise SearchTimeout()
+        if self.is_helper and self.search_counter.value != self.search_id:
+            raise SearchTimeout()
+    
+    def evaluate(self, board, color):
+        """ Static evaluation from the perspective of the side to move. """
+        self.num_evals += 1
+        if self.evaluator is not None:
+            return color * self.evaluator.evaluate()
+        return color * self.scratch_evaluator.evaluate(board)
+    
+    def negamax(self, board, color, depth, alpha, beta, null_allowed=True):
         """ Negamax search algorithm recursively calling the evaluation function. """
         
-        # Check conditions to exit recursion
-        if board.is_game_over():
-            if board.is_checkmate(): return (float('-Inf'), None)
-            else: return (0, None) # draw
+        # Check time budget
+        self.check_stop()
+        self.num_nodes += 1
+        ply = len(board.move_stack) - self.root_ply
+        self.pv_table[ply] = []
+        
+        # Check conditions to exit recursion (checkmate and stalemate follow from an empty move list)
+        if self.is_draw(board, ply) and ply > 0:
+            return (0, None)
         if depth == 0:
-            if self.endgame_table: # check endgame table
-                try:
-                    with chess.gaviota.open_tablebase("syzygy") as tablebase:
-                        wdl = tablebase.probe_wdl(board)
-                        return wdl * 100
-                except:
-                    pass
-            self.num_evals += 1
-            return (color * request_evaluation(board), None)
+            if not any(board.generate_legal_moves()):
+                return (-(MATE - ply) if board.is_check() else 0, None)
+            # Check endgame tablebase
+            wdl = self.resources.probe_wdl(board)
+            if wdl is not None:
+                return (wdl * 100, None)
+            if self.quiescence:
+                return (self.quiescence_search(board, color, alpha, beta, 0), None)
+            return (self.evaluate(board, color), None)
+        
+        # Check transposition table (cutoff from stored bounds)
+        tt_move = None
+        if self.tt is not None:
+            key = chess.polyglot.zobrist_hash(board)
+            alpha_orig = alpha
+            entry = self.tt.probe(key)
+            if entry is None:
+                self.num_tt_misses += 1
+            else:
+                self.num_tt_hits += 1
+                tt_depth, tt_score, tt_flag, tt_move = entry
+                tt_score = score_from_tt(tt_score, ply)
+                if tt_depth >= depth and tt_move is not None and ply > 0:
+                    if tt_flag == EXACT:
+                        self.pv_table[ply] = [tt_move]
+                        return (tt_score, tt_move)
+                    elif tt_flag == LOWER:
+                        alpha = max(alpha, tt_score)
+                    elif tt_flag == UPPER:
+                        beta = min(beta, tt_score)
+                    if alpha >= beta:
+                        return (tt_score, tt_move)
         
-        # Systematic move ordering
-        move_options = np.array(list(board.legal_moves))
-        priorities = np.array([0 if board.is_capture(move_option) else 1 for move_option in move_options])
-        sorted_move_options = move_options[priorities.argsort()]
+        # Null-move pruning (not in check, not twice in a row and not with only pawns left against zugzwang)
+        in_check = board.is_check()
+        if self.null_move and null_allowed and ply > 0 and not in_check and depth > NULL_MOVE_REDUCTION \
+                and beta < float('Inf') and self.has_pieces(board):
+            self.push_move(board, chess.Move.null())
+            evaluation = -self.negamax(board, -color, depth-1-NULL_MOVE_REDUCTION, -beta, -beta+NULL_WINDOW,
+                                       null_allowed=False)[0]
+            self.pop_move(board)
+            if evaluation >= beta:
+                self.num_prunes += 1
+                # A mate found after passing is not proven
+                return (beta if evaluation >= MATE_BOUND else evaluation, None)
+        
+        # Principal variation move of the previous iteration (only while following it)
+        pv_move = None
+        if ply < len(self.pv) and board.move_stack[self.root_ply:] == self.pv[:ply]:
+            pv_move = self.pv[ply]
         
-        # Set temporary optimum move and evaluation (random move to avoid NA error before checkmate)
-        best_move=sorted_move_options[0] 
+        # Set temporary optimum move and evaluation (first move is kept to avoid NA error before checkmate)
+        best_move = None
         max_eval = float('-Inf')
         
-        # Loop through sorted move options
-        for move in sorted_move_options:
-            board.push(move)
+        # Loop through move options (generated lazily in order of expected strength)
+        for index, move in enumerate(self.order_moves(board, ply, pv_move, tt_move)):
+            quiet = not move.promotion and not board.is_capture(move)
+            self.push_move(board, move)
+            # Late move reduction (quiet moves late in the ordering, no checks)
+            reduction = 0
+            if self.lmr and quiet and depth >= LMR_MIN_DEPTH and index >= LMR_MIN_INDEX \
+                    and not in_check and not board.is_check():
+                reduction = 1
             # Call negamax recursively as oponent
-            evaluation = -self.negamax(board, -color, depth-1, -beta, -alpha)[0]
+            if index == 0 or alpha == float('-Inf') or not (self.pvs or reduction):
+                evaluation = -self.negamax(board, -color, depth-1, -beta, -alpha)[0]
+            else:
+                # Zero window (and reduced) search, repeated at full depth and full window if it raises alpha
+                window = alpha + NULL_WINDOW if self.pvs else beta
+                evaluation = -self.negamax(board, -color, depth-1-reduction, -window, -alpha)[0]
+                if reduction and evaluation > alpha:
+                    evaluation = -self.negamax(board, -color, depth-1, -window, -alpha)[0]
+                if window < beta and alpha < evaluation < beta:
+                    evaluation = -self.negamax(board, -color, depth-1, -beta, -alpha)[0]
             # Test for new best move and evaluation
-            if evaluation > max_eval:
+            if evaluation > max_eval or best_move is None:
                 max_eval = evaluation
                 best_move = move
-            board.pop()
+                self.pv_table[ply] = [move] + self.pv_table.get(ply + 1, [])
+            self.pop_move(board)
             # Pruning
             alpha = max(alpha, max_eval)
             if alpha >= beta:
                 self.num_prunes += 1
+                self.num_cutoffs += 1
+                if index == 0:
+                    self.num_first_move_cutoffs += 1
+                if quiet:
+                    self.update_quiet_cutoff(board, move, ply, depth)
                 break   
         
+        # No legal moves: checkmate or stalemate
+        if best_move is None:
+            return (-(MATE - ply) if in_check else 0, None)
+        
+        # Save result in transposition table
+        if self.tt is not None:
+            if max_eval <= alpha_orig: flag = UPPER
+            elif max_eval >= beta: flag = LOWER
+            else: flag = EXACT
+            if self.tt.store(key, depth, score_to_tt(max_eval, ply), flag, best_move):
+                self.num_tt_overwrites += 1
+        
         # Return move with highest evaluation
         return (max_eval, best_move)
+    
+    def order_moves(self, board, ply, pv_move=None, tt_move=None):
+        """
+        Yield the legal moves in stages: principal variation and transposition table move,
+        captures by MVV-LVA, killer moves of this ply and the remaining quiet moves by history score.
+        Later stages are only generated when the earlier moves did not cause a cutoff.
+        """
+        searched = []
+        # Hash moves (checked for legality, the table may contain moves of colliding positions)
+        for move in (pv_move, tt_move):
+            if move is not None and move not in searched and board.is_legal(move):
+                searched.append(move)
+                yield move
+        # Captures (most valuable victim, least valuable attacker)
+        for move in sorted(self.generate_captures(board), key=lambda move: self.mvv_lva(board, move)):
+            if move not in searched:
+                yield move
+        # Killer moves
+        for move in self.killers.get(ply, ()):
+            if move not in searched and not board.is_capture(move) and board.is_legal(move):
+                searched.append(move)
+                yield move
+        # Quiet moves
+        history = self.history[int(board.turn)]
+        quiet_moves = [move for move in self.generate_quiet_moves(board) if move not in searched]
+        quiet_moves.sort(key=lambda move: -history[move.from_square, move.to_square])
+        yield from quiet_moves
+    
+    def generate_captures(self, board) -> list:
+        """ Legal captures (including en passant). """
+        return list(board.generate_legal_captures())
+    
+    def generate_quiet_moves(self, board) -> list:
+        """ Legal moves that do not capture (including castling and non-capturing promotions). """
+        return [move for move in board.generate_legal_moves(to_mask=~board.occupied_co[not board.turn])
+                if not board.is_en_passant(move)]
+    
+    def update_quiet_cutoff(self, board, move, ply, depth):
+        """ Remember a quiet move that caused a cutoff as killer move and in the history table. """
+        killers = self.killers.get(ply, [])
+        if move not in killers:
+            self.killers[ply] = [move] + killers[:1]
+        self.history[int(board.turn), move.from_square, move.to_square] += depth * depth
+    
+    def has_pieces(self, board) -> bool:
+        """ Whether the side to move has pieces other than king and pawns (null move is unsafe otherwise). """
+        return bool(board.occupied_co[board.turn] & ~(board.pawns | board.kings))
+    
+    def mvv_lva(self, board, move) -> int:
+        """ Sort key of a capture: most valuable victim first, then least valuable attacker. """
+        return -10 * self.captured_value(board, move) + PIECE_VALUES[board.piece_type_at(move.from_square)]
+    
+    def quiescence_search(self, board, color, alpha, beta, qply):
+        """
+        Search captures (and optionally checks) until the position is quiet.
+        Uses the static evaluation as stand-pat score and skips captures that cannot raise alpha (delta pruning).
+        """
+        self.check_stop()
+        self.num_qnodes += 1
+        
+        # In check, all evasions are searched (no stand-pat)
+        in_check = board.is_check()
+        if in_check:
+            move_options = list(board.legal_moves)
+            if not move_options:
+                return -(MATE - (len(board.move_stack) - self.root_ply)) # checkmate
+            max_eval = float('-Inf')
+        else:
+            # Stand pat
+            stand_pat = self.evaluate(board, color)
+            if stand_pat >= beta:
+                return stand_pat
+            alpha = max(alpha, stand_pat)
+            max_eval = stand_pat
+            # Captures ordered by most valuable victim, least valuable attacker (MVV-LVA)
+            move_options = sorted(board.generate_legal_captures(), key=lambda move: self.mvv_lva(board, move))
+            if self.quiescence_checks and qply == 0:
+                move_options += [move for move in board.generate_legal_moves() 
+                                 if not board.is_capture(move) and board.gives_check(move)]
+        
+        # Loop through moves
+        for move in move_options:
+            # Delta pruning (the capture cannot raise the score to alpha)
+            if not in_check and not move.promotion and not board.gives_check(move) and \
+                    stand_pat + self.captured_value(board, move) + DELTA_MARGIN < alpha:
+                continue
+            self.push_move(board, move)
+            evaluation = -self.quiescence_search(board, -color, -beta, -alpha, qply + 1)
+            self.pop_move(board)
+            max_eval = max(max_eval, evaluation)
+            alpha = max(alpha, evaluation)
+            if alpha >= beta:
+                self.num_prunes += 1
+                break
+        
+        return max_eval
+    
+    def captured_value(self, board, move) -> int:
+        """ Material value of the piece captured by a move. """
+        if board.is_en_passant(move):
+            return PIECE_VALUES[chess.PAWN]
+        return PIECE_VALUES[board.piece_type_at(move.to_square) or 0]
+    
+    def push_move(self, board, move):
+        """ Make a move, updating the incremental evaluation if enabled. """
+        if self.evaluator is not None:
+            self.evaluator.push(board, move)
+        else:
+            board.push(move)
+    
+    def pop_move(self, board):
+        """ Unmake a move, restoring the incremental evaluation if enabled. """
+        if self.evaluator is not None:
+            return self.evaluator.pop(board)
+        return board.pop()
+
+
+def lazy_smp_helper(index, settings, hash_size, tt_name, search_counter, tasks):
+    """
+    Helper process of the parallel search (Lazy SMP).
+    Searches each root position it receives with iterative deepening until the search id changes,
+    filling the shared transposition table. Every other helper starts one ply deeper.
+    """
+    engine = NegamaxEngine(**settings)
+    engine.tt = TranspositionTable(hash_size, name=tt_name)
+    engine.is_helper = True
+    engine.search_counter = search_counter
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        engine.search_id, board, max_depth = task
+        engine.color = 1 if board.turn else -1
+        engine.root_ply = len(board.move_stack)
+        if engine.evaluator is not None:
+            engine.evaluator.reset(board)
+        engine.reset_move_ordering()
+        engine.reset_position_keys(board)
+        try:
+            for depth in range(1 + index % 2, max_depth + 1):
+                engine.negamax(board, engine.color, depth, float('-Inf'), float('Inf'))
+        except SearchTimeout:
+            pass
+    engine.tt.close()
+    engine.resources.close()
@@ -2,6 +2,7 @@ import chess
 
 import random
 
+from . import bitboard
 from .utils import select_best_move
 
 
@@ -9,10 +10,14 @@ class SimpleEngine:
     """
     A simple engine that makes moves based on simple heuristics.
     Possible heuristics are 'random', 'attacking', and 'limiting'.
+    With fast=True, checks, captures and the opponent's mobility are computed by the numba bitboard
+    move generator in one call per move instead of pushing every legal move on the board
+    (same candidate moves, standard chess only).
     """
     
-    def __init__(self, heuristic='random'):
+    def __init__(self, heuristic='random', fast=True):
         self.heuristic = heuristic
+        self.fast = fast
     
     def __str__(self):
         return self.heuristic+'Engine'
@@ -33,6 +38,11 @@ class SimpleEngine:
         
     def attacking_move(self, board) -> chess.Move:
         """ Make a legal attacking move (checkmate > check > capture). """
+        if self.fast and not board.chess960:
+            # A random check or capture, otherwise a random move (as the shuffled search below)
+            legal_moves, captures, checks, _ = bitboard.root_move_features(board, count_replies=False)
+            attacking_moves = [move for move, capture, check in zip(legal_moves, captures, checks) if capture or check]
+            return random.choice(attacking_moves or legal_moves)
         legal_moves = list(board.legal_moves)
         random.shuffle(legal_moves)
         for move in legal_moves:
@@ -51,6 +61,9 @@ class SimpleEngine:
     
     def limiting_move(self, board) -> chess.Move:
         """ Make a move that limits opponents number of legal move. """
+        if self.fast and not board.chess960:
+            legal_moves, _, _, mobility = bitboard.root_move_features(board)
+            return select_best_move({move: -int(replies) for move, replies in zip(legal_moves, mobility)})
         options = {}
         for move in board.legal_moves:
             board.push(move)
@@ -2,7 +2,97 @@ import chess
 from numba import jit
 import numpy as np
 
-from .utils import make_board_numeric
+from .utils import make_board_numeric, make_boards_numeric
+
+
+# Material values indexed by piece type (same values as compute_evaluation)
+PIECE_VALUES = (0, 1, 3, 3, 5, 9, 100)
+
+# Material values indexed by signed piece type + 6 (black king, ..., empty, ..., white king)
+CODE_VALUES = np.array([-100, -9, -5, -3, -3, -1, 0, 1, 3, 3, 5, 9, 100], dtype=np.int64)
+
+
+def make_table(ranks) -> np.array:
+    """ Convert a piece-square table written from rank 8 to rank 1 (in centipawns) to square order a1..h8 (in pawns). """
+    return np.array(ranks, dtype=np.float64).reshape(8, 8)[::-1].reshape(64) / 100
+
+
+# Piece-square tables for white (black squares are mirrored), indexed by piece type - 1 and square
+# Source: Simplified Evaluation Function (Tomasz Michniewski), endgame pawn and king tables adjusted
+PST_MIDDLEGAME = np.array([
+    make_table([  0,  0,  0,  0,  0,  0,  0,  0,
+                 50, 50, 50, 50, 50, 50, 50, 50,
+                 10, 10, 20, 30, 30, 20, 10, 10,
+                  5,  5, 10, 25, 25, 10,  5,  5,
+                  0,  0,  0, 20, 20,  0,  0,  0,
+                  5, -5,-10,  0,  0,-10, -5,  5,
+                  5, 10, 10,-20,-20, 10, 10,  5,
+                  0,  0,  0,  0,  0,  0,  0,  0]), # pawn
+    make_table([-50,-40,-30,-30,-30,-30,-40,-50,
+                -40,-20,  0,  0,  0,  0,-20,-40,
+                -30,  0, 10, 15, 15, 10,  0,-30,
+                -30,  5, 15, 20, 20, 15,  5,-30,
+                -30,  0, 15, 20, 20, 15,  0,-30,
+                -30,  5, 10, 15, 15, 10,  5,-30,
+                -40,-20,  0,  5,  5,  0,-20,-40,
+                -50,-40,-30,-30,-30,-30,-40,-50]), # knight
+    make_table([-20,-10,-10,-10,-10,-10,-10,-20,
+                -10,  0,  0,  0,  0,  0,  0,-10,
+                -10,  0,  5, 10, 10,  5,  0,-10,
+                -10,  5,  5, 10, 10,  5,  5,-10,
+                -10,  0, 10, 10, 10, 10,  0,-10,
+                -10, 10, 10, 10, 10, 10, 10,-10,
+                -10,  5,  0,  0,  0,  0,  5,-10,
+                -20,-10,-10,-10,-10,-10,-10,-20]), # bishop
+    make_table([  0,  0,  0,  0,  0,  0,  0,  0,
+                  5, 10, 10, 10, 10, 10, 10,  5,
+                 -5,  0,  0,  0,  0,  0,  0, -5,
+                 -5,  0,  0,  0,  0,  0,  0, -5,
+                 -5,  0,  0,  0,  0,  0,  0, -5,
+                 -5,  0,  0,  0,  0,  0,  0, -5,
+                 -5,  0,  0,  0,  0,  0,  0, -5,
+                  0,  0,  0,  5,  5,  0,  0,  0]), # rook
+    make_table([-20,-10,-10, -5, -5,-10,-10,-20,
+                -10,  0,  0,  0,  0,  0,  0,-10,
+                -10,  0,  5,  5,  5,  5,  0,-10,
+                 -5,  0,  5,  5,  5,  5,  0, -5,
+                  0,  0,  5,  5,  5,  5,  0, -5,
+                -10,  5,  5,  5,  5,  5,  0,-10,
+                -10,  0,  5,  0,  0,  0,  0,-10,
+                -20,-10,-10, -5, -5,-10,-10,-20]), # queen
+    make_table([-30,-40,-40,-50,-50,-40,-40,-30,
+                -30,-40,-40,-50,-50,-40,-40,-30,
+                -30,-40,-40,-50,-50,-40,-40,-30,
+                -30,-40,-40,-50,-50,-40,-40,-30,
+                -20,-30,-30,-40,-40,-30,-30,-20,
+                -10,-20,-20,-20,-20,-20,-20,-10,
+                 20, 20,  0,  0,  0,  0, 20, 20,
+                 20, 30, 10,  0,  0, 10, 30, 20]), # king
+    ])
+PST_ENDGAME = PST_MIDDLEGAME.copy()
+PST_ENDGAME[0] = make_table([  0,  0,  0,  0,  0,  0,  0,  0,
+                              80, 80, 80, 80, 80, 80, 80, 80,
+                              50, 50, 50, 50, 50, 50, 50, 50,
+                              30, 30, 30, 30, 30, 30, 30, 30,
+                              15, 15, 15, 15, 15, 15, 15, 15,
+                               5,  5,  5,  5,  5,  5,  5,  5,
+                               0,  0,  0,  0,  0,  0,  0,  0,
+                               0,  0,  0,  0,  0,  0,  0,  0]) # pawn (advanced pawns)
+PST_ENDGAME[5] = make_table([-50,-40,-30,-20,-20,-30,-40,-50,
+                             -30,-20,-10,  0,  0,-10,-20,-30,
+                             -30,-10, 20, 30, 30, 20,-10,-30,
+                             -30,-10, 30, 40, 40, 30,-10,-30,
+                             -30,-10, 30, 40, 40, 30,-10,-30,
+                             -30,-10, 20, 30, 30, 20,-10,-30,
+                             -30,-30,  0,  0,  0,  0,-30,-30,
+                             -50,-30,-30,-30,-30,-30,-30,-50]) # king (centralized)
+
+# Game phase: weight of each piece type (pawn to king), 24 with all pieces on the board
+PHASE_WEIGHTS = np.array([0, 1, 1, 2, 4, 0], dtype=np.int64)
+MAX_PHASE = 24
+
+# Evaluation functions selectable in NegamaxEngine
+EVALUATIONS = ('material', 'pst')
 
 
 def request_evaluation(board) -> int:
@@ -26,6 +116,110 @@ def compute_evaluation(numeric_board) -> int:
     return evaluation
 
 
+def request_evaluations(boards) -> np.array:
+    """
+    Request evaluations for many boards in one numba call.
+    Accepts a list of boards or an N x 64 array of numeric boards.
+    """
+    if isinstance(boards, np.ndarray):
+        numeric_boards = boards.astype(np.int8).reshape(-1, 64)
+    else:
+        numeric_boards = make_boards_numeric(boards)
+    return compute_evaluations(numeric_boards)
+
+
+@jit(nopython=True)
+def compute_evaluations(numeric_boards) -> np.array:
+    """ Compute evaluations for an N x 64 int8 array of numeric boards with numba. """
+    evaluations = np.zeros(numeric_boards.shape[0], dtype=np.int64)
+    for i in range(numeric_boards.shape[0]):
+        evaluation = 0
+        for sq in range(64):
+            evaluation += CODE_VALUES[numeric_boards[i, sq] + 6]
+        evaluations[i] = evaluation
+    return evaluations
+
+
+# Kernels taking the eight piece and colour bitboards of a board (explicit uint64 arguments, since
+# bitboards with the top bit set do not fit the int64 numba would otherwise infer) and the int8 board
+BITBOARD_ARGUMENTS = 'uint64, ' * 8 + 'int8[:]'
+
+
+class ScratchEvaluation:
+    """
+    Material evaluation that reuses a preallocated int8 board. The board's own piece and colour bitboards
+    are passed straight into the numba kernel (no new Python ints are built), so the only allocation per
+    leaf is the 48 bytes the numba dispatcher uses to unbox the array argument (freed when the call returns,
+    see benchmark.bench_evaluation). Gives the same scores as request_evaluation.
+    """
+    
+    def __init__(self):
+        self.numeric_board = np.zeros(64, dtype=np.int8)
+    
+    def evaluate(self, board) -> int:
+        """ Evaluate a board (positive values favor white). """
+        return compute_evaluation_int8(board.pawns, board.knights, board.bishops, board.rooks, board.queens,
+                                       board.kings, board.occupied_co[chess.WHITE], board.occupied_co[chess.BLACK],
+                                       self.numeric_board)
+
+
+@jit('int64(' + BITBOARD_ARGUMENTS + ')', nopython=True)
+def compute_evaluation_int8(pawns, knights, bishops, rooks, queens, kings, white, black, numeric_board) -> int:
+    """
+    Fill a reused int8 board from the piece and colour bitboards and sum the piece values
+    in the same pass (values from the CODE_VALUES lookup table).
+    """
+    pieces = (np.uint64(pawns), np.uint64(knights), np.uint64(bishops),
+              np.uint64(rooks), np.uint64(queens), np.uint64(kings))
+    colours = (np.uint64(white), np.uint64(black))
+    numeric_board[:] = 0
+    evaluation = 0
+    for k in range(12):
+        mask = pieces[k % 6] & colours[k // 6]
+        code = k + 1 if k < 6 else 5 - k
+        value = CODE_VALUES[code + 6]
+        for sq in range(64):
+            if (mask >> np.uint64(sq)) & np.uint64(1):
+                numeric_board[sq] = code
+                evaluation += value
+    return evaluation
+
+
+class TaperedEvaluation(ScratchEvaluation):
+    """
+    Material plus piece-square tables, interpolated between middlegame and endgame tables
+    by the remaining non-pawn material. Uses the same reused board as ScratchEvaluation.
+    """
+    
+    def evaluate(self, board) -> float:
+        """ Evaluate a board in pawns (positive values favor white). """
+        return compute_tapered_evaluation(board.pawns, board.knights, board.bishops, board.rooks, board.queens,
+                                          board.kings, board.occupied_co[chess.WHITE], board.occupied_co[chess.BLACK],
+                                          self.numeric_board)
+
+
+@jit('float64(' + BITBOARD_ARGUMENTS + ')', nopython=True)
+def compute_tapered_evaluation(pawns, knights, bishops, rooks, queens, kings, white, black, numeric_board) -> float:
+    """ Compute material and tapered piece-square evaluation (table lookups per occupied square) with numba. """
+    material = compute_evaluation_int8(pawns, knights, bishops, rooks, queens, kings, white, black, numeric_board)
+    middlegame = 0.0
+    endgame = 0.0
+    phase = 0
+    for sq in range(64):
+        code = numeric_board[sq]
+        if code > 0:
+            middlegame += PST_MIDDLEGAME[code - 1, sq]
+            endgame += PST_ENDGAME[code - 1, sq]
+            phase += PHASE_WEIGHTS[code - 1]
+        elif code < 0:
+            mirrored = sq ^ 56
+            middlegame -= PST_MIDDLEGAME[-code - 1, mirrored]
+            endgame -= PST_ENDGAME[-code - 1, mirrored]
+            phase += PHASE_WEIGHTS[-code - 1]
+    phase = min(phase, MAX_PHASE)
+    return material + (middlegame * phase + endgame * (MAX_PHASE - phase)) / MAX_PHASE
+
+
 def request_evaluation_nonumba(board) -> int:
     """ Request evaluation for numeric board without numba (for analysis only). """
     numeric_board = make_board_numeric(board)
@@ -44,3 +238,51 @@ def compute_evaluation_nonumba(numeric_board) -> int:
     numeric_board[numeric_board==-2] = -3
     evaluation = np.sum(numeric_board)
     return evaluation
+
+
+class IncrementalEvaluation:
+    """
+    Material evaluation that is updated on make/unmake of each move instead of recomputed at every leaf.
+    Gives the same scores as compute_evaluation (positive values favor white).
+    """
+    
+    def __init__(self):
+        self.score = 0
+        self.stack = [] # scores before each pushed move
+    
+    def reset(self, board):
+        """ Compute the score of the root position from scratch. """
+        self.score = 0
+        self.stack = []
+        for piece_type in chess.PIECE_TYPES:
+            self.score += PIECE_VALUES[piece_type] * len(board.pieces(piece_type, chess.WHITE))
+            self.score -= PIECE_VALUES[piece_type] * len(board.pieces(piece_type, chess.BLACK))
+    
+    def push(self, board, move):
+        """ Update the score for a move and make it on the board. """
+        self.stack.append(self.score)
+        if not move: # null move
+            board.push(move)
+            return
+        delta = 0
+        # Captured piece (the captured pawn is not on the target square for en passant)
+        if board.is_en_passant(move):
+            delta += PIECE_VALUES[chess.PAWN]
+        else:
+            captured = board.piece_type_at(move.to_square)
+            if captured and board.color_at(move.to_square) != board.turn:
+                delta += PIECE_VALUES[captured]
+        # Promoted pawn
+        if move.promotion:
+            delta += PIECE_VALUES[move.promotion] - PIECE_VALUES[chess.PAWN]
+        self.score += delta if board.turn else -delta
+        board.push(move)
+    
+    def pop(self, board):
+        """ Unmake the last move and restore the previous score. """
+        self.score = self.stack.pop()
+        return board.pop()
+    
+    def evaluate(self) -> int:
+        """ Return the current evaluation in O(1). """
+        return self.score
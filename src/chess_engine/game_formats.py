@@ -1,25 +1,42 @@
 import chess
 import chess.pgn
+import numpy as np
+
+import json
+import math
+import os
+import random
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 from .utils import find_stoppage_reason
 
 
-def game(player_white, player_black, verbose=True) -> chess.Board:
-    """ Play a single game of chess. """
+def game(player_white, player_black, verbose=True, move_times=None, profile_path=None, board=None) -> chess.Board:
+    """
+    Play a single game of chess. Optionally, the thinking time of each move is appended to move_times.
+    With a profile_path, the profiling summaries of engines with a profiler are appended as a JSON line
+    (and the profilers start a new game). Without, the move records stay in the profilers for the caller.
+    The game starts from a copy of the given board (e.g. after opening moves) or the standard position.
+    """
     
     # Instantiate board
-    board=chess.Board()
+    board = chess.Board() if board is None else board.copy()
     
     # Play game
     while not board.is_game_over(claim_draw=True):
+        start = time.perf_counter()
         # White to move
         if board.turn:
             move = player_white.make_move(board)
         # Black to move
         else:
             move = player_black.make_move(board)
+        if move_times is not None:
+            move_times.append(time.perf_counter() - start)
         # Check for resignation
-        if move == 'resign': return board
+        if move == 'resign': break
         # Print game progress information
         if verbose:
             side = 'White' if board.turn else 'Black'
@@ -27,18 +44,56 @@ def game(player_white, player_black, verbose=True) -> chess.Board:
         # Make the selected move
         board.push(move)
     
+    # End background searches of pondering engines
+    for player in (player_white, player_black):
+        if hasattr(player, 'stop_pondering'):
+            player.stop_pondering()
+    
+    # Summarize profiled engines (game_summary resets the move records, so only if the summary is written)
+    summaries = {}
+    if profile_path is not None:
+        summaries = {side: player.profiler.game_summary() for side, player in (('white', player_white), ('black', player_black))
+                     if getattr(player, 'profiler', None) is not None}
+    if summaries:
+        summaries['result'] = board.result(claim_draw=True)
+        summaries['num_moves'] = board.fullmove_number
+        with open(profile_path, 'a') as f:
+            f.write(json.dumps(summaries) + '\n')
+    
     return board
 
 
-def match(player_white, player_black, num_games=1, verbose=True) -> dict:
+def match(player_white, player_black, num_games=1, verbose=True, archive=None, keep_pgns=True) -> dict:
     """
     Play a match of chess between two players.
     The number of games in the match can be specified.
     One player has the white pieces in all games.
+    With an archive (see PgnArchive), each game is written to disk as soon as it is finished
+    and games already in a resumed archive are counted without playing them again.
+    With keep_pgns=False, the games are not kept in memory (match_result['PGNs'] is None).
     """
     
     # Create placeholder for match results
-    match_result = {
+    match_result = new_match_result(player_white, player_black, num_games, keep_pgns)
+    
+    # Play games
+    for i in range(num_games):
+        # Skip games that were already played
+        if archive is not None and archive.record_archived(match_result, i+1):
+            continue
+        move_times = []
+        current_game = game(player_white, player_black, verbose=False, move_times=move_times)
+        result, ending = record_game(match_result, current_game, i+1, move_times, archive)
+        # Print match progress updates
+        if verbose:
+            print(f'Game {i+1}: {result}, {current_game.fullmove_number} moves, {ending}')
+    
+    return match_result
+
+
+def new_match_result(player_white, player_black, num_games, keep_pgns=True) -> dict:
+    """ Create placeholder for match results. """
+    return {
         'player_white': str(player_white),
         'player_black': str(player_black), 
         'num_games': num_games, 
@@ -52,31 +107,267 @@ def match(player_white, player_black, num_games=1, verbose=True) -> dict:
             'threefold_rep': 0, 
             'resign': 0
             }, 
-        'PGNs': []
+        'PGNs': [] if keep_pgns else None
         }
-    
-    # Play games
-    for i in range(num_games):
-        current_game = game(player_white, player_black, verbose=False)
-        result = current_game.result(claim_draw=True)
-        ending = find_stoppage_reason(current_game)
-        # Save results in dictionary
-        match_result['num_moves'] += current_game.fullmove_number
-        match_result['results'][result] += 1
+
+
+def record_game(match_result, board, game_round=None, move_times=None, archive=None) -> tuple:
+    """ Save the outcome of a finished game in the match results (and the archive). Returns result and ending. """
+    result = board.result(claim_draw=True)
+    ending = find_stoppage_reason(board)
+    record_outcome(match_result, result, ending, board.fullmove_number)
+    if match_result['PGNs'] is not None or archive is not None:
+        pgn = make_pgn(board, match_result, game_round, ending, move_times)
+        if match_result['PGNs'] is not None:
+            match_result['PGNs'].append(pgn)
+        if archive is not None:
+            archive.write(pgn)
+    return result, ending
+
+
+def record_outcome(match_result, result, ending, num_moves):
+    """ Count result, ending and number of moves of a game. """
+    match_result['num_moves'] += num_moves
+    match_result['results'][result] += 1
+    if ending in match_result['endings']:
         match_result['endings'][ending] +=1
-        match_result['PGNs'].append(chess.pgn.Game.from_board(current_game))
-        # Print match progress updates
-        if verbose:
-            print(f'Game {i+1}: {result}, {current_game.fullmove_number} moves, {ending}')
+
+
+def make_pgn(board, match_result, game_round=None, ending=None, move_times=None) -> chess.pgn.Game:
+    """ Create the PGN of a finished game with player names, result, ending and thinking time per move. """
+    pgn = chess.pgn.Game.from_board(board)
+    pgn.headers['White'] = match_result['player_white']
+    pgn.headers['Black'] = match_result['player_black']
+    pgn.headers['Round'] = str(game_round or '?')
+    pgn.headers['Result'] = board.result(claim_draw=True)
+    pgn.headers['PlyCount'] = str(len(board.move_stack))
+    pgn.headers['Ending'] = ending or find_stoppage_reason(board)
+    if move_times:
+        # Elapsed move time as %emt comment, total thinking time per side as header
+        # (moves before the first timed move are opening moves that were given)
+        offset = len(board.move_stack) - len(move_times)
+        for node, move_time in zip(list(pgn.mainline())[offset:], move_times):
+            node.set_emt(move_time)
+        white_first = board.root().turn == (offset % 2 == 0)
+        pgn.headers['WhiteThinkTime'] = f'{sum(move_times[0 if white_first else 1::2]):.3f}'
+        pgn.headers['BlackThinkTime'] = f'{sum(move_times[1 if white_first else 0::2]):.3f}'
+    return pgn
+
+
+class PgnArchive:
+    """
+    Appends finished games to a PGN file as soon as they are recorded (nothing is lost if the process dies).
+    With resume=True, the headers of the games already in the file are read,
+    so that matches can skip these games and count their results instead.
+    A game left incomplete by an interrupted run is removed from the end of the file.
+    Games are written with '\n' line endings on all platforms (files with '\r\n' line endings can be resumed).
+    """
     
-    return match_result
+    def __init__(self, path, resume=False):
+        self.path = path
+        self.archived = {} # (white, black, round) -> headers of games already in the file
+        if resume and os.path.isfile(path):
+            truncate_incomplete_game(path)
+            with open(path) as f:
+                while True:
+                    headers = chess.pgn.read_headers(f)
+                    if headers is None:
+                        break
+                    self.archived[(headers.get('White'), headers.get('Black'), headers.get('Round'))] = headers
+        self.file = open(path, 'a', newline='\n')
+        # Separate the first new game from a last game that is not followed by an empty line (e.g. written by another tool)
+        if self.file.tell():
+            with open(path, 'rb') as f:
+                f.seek(-min(self.file.tell(), 4), os.SEEK_END)
+                ending = f.read()
+            if not re.search(rb'\n\r?\n$', ending):
+                self.file.write('\n' if ending.endswith(b'\n') else '\n\n')
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *args):
+        self.close()
+    
+    def write(self, pgn):
+        """ Append a game and flush it to disk. """
+        self.file.write(str(pgn) + '\n\n')
+        self.file.flush()
+        os.fsync(self.file.fileno())
+    
+    def record_archived(self, match_result, game_round) -> bool:
+        """ Count an archived game in the match results. Returns False if the game is not in the archive. """
+        headers = self.archived.get((match_result['player_white'], match_result['player_black'], str(game_round)))
+        if headers is None:
+            return False
+        num_moves = int(headers.get('PlyCount', 0)) // 2 + 1
+        record_outcome(match_result, headers.get('Result', '*'), headers.get('Ending'), num_moves)
+        return True
+    
+    def close(self):
+        """ Close the archive file. """
+        self.file.close()
 
 
-def tournament(players_list, num_games=1, verbose=True) -> dict:
+# End of a game (result token terminating the movetext, at the end of a line)
+GAME_END = re.compile(rb'(?:^|\s)(?:1-0|0-1|1/2-1/2|\*)[ \t]*(?:\r?\n|\Z)', re.MULTILINE)
+
+
+def truncate_incomplete_game(path) -> bool:
+    """
+    Cut a PGN file after its last complete game (any line endings). Only trailing text that is not terminated
+    by a result token (e.g. a game whose writing was interrupted) is removed. Returns True if text was removed.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    end = max((match.end() for match in GAME_END.finditer(data)), default=0)
+    if not data[end:].strip():
+        return False
+    with open(path, 'r+b') as f:
+        f.truncate(end)
+    return True
+
+
+# Sequential probability ratio test (SPRT) defaults: Elo differences of the hypotheses and error probabilities
+SPRT_ELO0 = 0
+SPRT_ELO1 = 10
+SPRT_ALPHA = 0.05
+SPRT_BETA = 0.05
+SPRT_PRIOR = 0.5 # pseudo-count of each pentanomial outcome in the LLR estimate
+PAIR_SCORES = (0, 0.5, 1, 1.5, 2) # possible scores of a pair of games
+OPENING_PLIES = 4 # random moves of generated openings
+
+
+def sprt_match(player_a, player_b, elo0=SPRT_ELO0, elo1=SPRT_ELO1, alpha=SPRT_ALPHA, beta=SPRT_BETA,
+               max_games=1000, openings=None, seed=None, verbose=True, keep_pgns=True) -> dict:
+    """
+    Play pairs of games between two players until a sequential probability ratio test accepts
+    H0 (player_a is at most elo0 stronger than player_b) or H1 (player_a is at least elo1 stronger),
+    or max_games are played. Both games of a pair start from the same opening with colours swapped.
+    Openings (boards or FENs) are used in turn, by default random openings of OPENING_PLIES moves are played.
+    The log-likelihood ratio (LLR) of the pair scores is printed after each pair.
+    Returns the test summary and the match results of both colour assignments (as in match()).
+    """
+    lower, upper = sprt_bounds(alpha, beta)
+    rng = random.Random(seed)
+    match_results = [new_match_result(player_a, player_b, max_games // 2, keep_pgns),
+                     new_match_result(player_b, player_a, max_games // 2, keep_pgns)]
+    pair_scores = [] # score of player_a per pair (0, 0.5, 1, 1.5 or 2)
+    wins, draws, losses = 0, 0, 0 # of player_a
+    llr = 0.0
+    decision = None
+    for pair in range(max_games // 2):
+        if openings:
+            opening = openings[pair % len(openings)]
+            opening = chess.Board(opening) if isinstance(opening, str) else opening
+        else:
+            opening = random_opening(rng)
+        pair_score = 0
+        for a_white, match_result in ((True, match_results[0]), (False, match_results[1])):
+            white, black = (player_a, player_b) if a_white else (player_b, player_a)
+            move_times = []
+            current_game = game(white, black, verbose=False, move_times=move_times, board=opening)
+            record_game(match_result, current_game, pair+1, move_times)
+            score = game_score(current_game) if a_white else 1 - game_score(current_game)
+            wins += score == 1
+            draws += score == 0.5
+            losses += score == 0
+            pair_score += score
+        pair_scores.append(pair_score)
+        llr = sprt_llr(pair_scores, elo0, elo1)
+        if verbose:
+            print(f'Pair {pair+1}: +{wins} ={draws} -{losses}, LLR {llr:.2f} ({lower:.2f}, {upper:.2f})')
+        if llr >= upper:
+            decision = 'H1'
+            break
+        if llr <= lower:
+            decision = 'H0'
+            break
+
+    num_games = 2 * len(pair_scores)
+    score = (wins + draws / 2) / num_games if num_games else None
+    summary = {
+        'player_a': str(player_a),
+        'player_b': str(player_b),
+        'elo0': elo0, 'elo1': elo1, 'alpha': alpha, 'beta': beta,
+        'decision': decision, # None if max_games were played without decision
+        'llr': llr,
+        'bounds': (lower, upper),
+        'num_games': num_games,
+        'wins': wins, 'draws': draws, 'losses': losses,
+        'pentanomial': [pair_scores.count(s) for s in PAIR_SCORES],
+        'elo': score_to_elo(score) if score is not None else None,
+        'match_results': match_results,
+        }
+    if verbose:
+        print(f"SPRT [{elo0}, {elo1}]: {decision or 'no decision'} after {num_games} games, "
+              f"+{wins} ={draws} -{losses}, Elo {summary['elo']}")
+    return summary
+
+
+def game_score(board) -> float:
+    """ Score of white in a finished game (an unfinished game was resigned by the side to move). """
+    result = board.result(claim_draw=True)
+    if result == '*':
+        return 0.0 if board.turn else 1.0
+    return {'1-0': 1.0, '1/2-1/2': 0.5, '0-1': 0.0}[result]
+
+
+def random_opening(rng=random, plies=OPENING_PLIES) -> chess.Board:
+    """ Board after random legal moves from the starting position (never a finished game). """
+    while True:
+        board = chess.Board()
+        for i in range(plies):
+            board.push(rng.choice(list(board.legal_moves)))
+            if board.is_game_over():
+                break
+        if not board.is_game_over():
+            return board
+
+
+def elo_to_score(elo) -> float:
+    """ Expected score for an Elo difference (logistic model). """
+    return 1 / (1 + 10 ** (-elo / 400))
+
+
+def score_to_elo(score) -> float:
+    """ Elo difference for an expected score (infinite for a score of 0 or 1). """
+    if score <= 0 or score >= 1:
+        return float('Inf') if score >= 1 else float('-Inf')
+    return -400 * math.log10(1 / score - 1)
+
+
+def sprt_bounds(alpha=SPRT_ALPHA, beta=SPRT_BETA) -> tuple:
+    """ LLR bounds to accept H0 (lower) and H1 (upper) for the error probabilities alpha and beta. """
+    return math.log(beta / (1 - alpha)), math.log((1 - beta) / alpha)
+
+
+def sprt_llr(pair_scores, elo0=SPRT_ELO0, elo1=SPRT_ELO1, prior=SPRT_PRIOR) -> float:
+    """
+    Log-likelihood ratio of H1 against H0 for the pair scores (normal approximation of the pentanomial model):
+    n * (s1 - s0) * (2 * mean - s0 - s1) / (2 * variance) with s0, s1 the expected scores of elo0, elo1.
+    Mean and variance are estimated from the pentanomial counts plus a prior count per outcome, so that
+    one-sided results (e.g. only wins or only draws) have a variance and few pairs cannot give extreme ratios.
+    """
+    n = len(pair_scores)
+    if n == 0:
+        return 0.0
+    outcomes = np.array(PAIR_SCORES) / 2
+    counts = np.array([pair_scores.count(s) for s in PAIR_SCORES]) + prior
+    frequencies = counts / counts.sum()
+    mean = frequencies @ outcomes
+    variance = frequencies @ (outcomes - mean) ** 2
+    s0, s1 = elo_to_score(elo0), elo_to_score(elo1)
+    return float(n * (s1 - s0) * (2 * mean - s0 - s1) / (2 * variance))
+
+
+def tournament(players_list, num_games=1, verbose=True, workers=1, seed=None, archive=None, keep_pgns=True) -> dict:
     """
     Play a tournament between specified players.
     Each two players play two matches against another so each one has the white pieces once.
     The number of games per match can be specified.
+    With workers > 1, individual games are distributed across a process pool (see parallel_matches).
+    Games are streamed to the archive and kept in memory as in match().
     """
     
     # Setup placeholder for tournament results
@@ -86,18 +377,25 @@ def tournament(players_list, num_games=1, verbose=True) -> dict:
     total_results = {str(k):[0,0,0,0] for k in players_list}
     
     # Let each player play a match against all other players
-    for player_white in players_list:
-        for player_black in players_list:
-            # Start a match
-            #print(f'\nNew Match: {str(player_white)} vs {str(player_black)}')
-            match_result = match(player_white, player_black, num_games, verbose=False)
-            mr = list(match_result['results'].values())
-            print(f'Match: {str(player_white)} vs {str(player_black)}: {mr}')
-            # Append match results to tournament results
-            tournament_result.append(match_result)
-            for i in range(4):
-                white_results[str(player_white)][i] += mr[i]
-                black_results[str(player_black)][i] += mr[i]
+    if workers > 1:
+        tournament_result = parallel_matches(players_list, num_games, workers, seed, verbose, archive, keep_pgns)
+    else:
+        for player_white in players_list:
+            for player_black in players_list:
+                # Start a match
+                #print(f'\nNew Match: {str(player_white)} vs {str(player_black)}')
+                match_result = match(player_white, player_black, num_games, verbose=False,
+                                     archive=archive, keep_pgns=keep_pgns)
+                mr = list(match_result['results'].values())
+                print(f'Match: {str(player_white)} vs {str(player_black)}: {mr}')
+                tournament_result.append(match_result)
+    
+    # Append match results to tournament results
+    for match_result in tournament_result:
+        mr = list(match_result['results'].values())
+        for i in range(4):
+            white_results[match_result['player_white']][i] += mr[i]
+            black_results[match_result['player_black']][i] += mr[i]
                 
     # Combine white and black results for each player
     for k in total_results.keys():
@@ -114,3 +412,72 @@ def tournament(players_list, num_games=1, verbose=True) -> dict:
     # Return detailed outcomes of all games or summarized results
     # return tournament_result 
     return total_results
+
+
+# Players of the current worker process (set once per worker by init_worker)
+worker_players = None
+
+
+def init_worker(players_list):
+    """ Store the players in a pool worker so they are not sent with every game. """
+    global worker_players
+    worker_players = players_list
+
+
+def play_seeded_game(white_index, black_index, game_seed) -> tuple:
+    """
+    Play a single game in a pool worker with its own random seed. Returns the board and the move times.
+    Engines start each game without state from earlier games, so the game does not depend on which worker plays it.
+    """
+    random.seed(game_seed)
+    np.random.seed(game_seed % 2**32)
+    for player in (worker_players[white_index], worker_players[black_index]):
+        if hasattr(player, 'new_game'):
+            player.new_game()
+    move_times = []
+    board = game(worker_players[white_index], worker_players[black_index], verbose=False, move_times=move_times)
+    return board, move_times
+
+
+def parallel_matches(players_list, num_games=1, workers=2, seed=None, verbose=True, archive=None, keep_pgns=True) -> list:
+    """
+    Play all matches of a tournament with games distributed across a process pool.
+    Each game gets its own seed (seed + game index) and engines are reset before each game, so runs are reproducible
+    (for engines without time limits).
+    Progress is printed as games finish. Returns the match results in tournament order.
+    Games are streamed to the archive as they finish, games already in a resumed archive are skipped.
+    """
+    
+    # Create placeholders for all matches (same order as the serial tournament)
+    pairings = [(w, b) for w in range(len(players_list)) for b in range(len(players_list))]
+    match_results = [new_match_result(players_list[w], players_list[b], num_games, keep_pgns) for w, b in pairings]
+    games_left = [num_games] * len(pairings)
+    if seed is None:
+        seed = random.randrange(2**32)
+    
+    # Submit every game as a separate task
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(players_list,)) as pool:
+        futures = {}
+        for m, (w, b) in enumerate(pairings):
+            for i in range(num_games):
+                if archive is not None and archive.record_archived(match_results[m], i+1):
+                    games_left[m] -= 1
+                    continue
+                future = pool.submit(play_seeded_game, w, b, seed + m * num_games + i)
+                futures[future] = (m, i+1)
+        
+        # Collect games as they finish
+        for future in as_completed(futures):
+            m, game_round = futures[future]
+            current_game, move_times = future.result()
+            result, ending = record_game(match_results[m], current_game, game_round, move_times, archive)
+            games_left[m] -= 1
+            if verbose:
+                print('Game: {white} vs {black}: {result}, {moves} moves, {ending}'.format(
+                    white=match_results[m]['player_white'], black=match_results[m]['player_black'], 
+                    result=result, moves=current_game.fullmove_number, ending=ending))
+            if games_left[m] == 0:
+                mr = list(match_results[m]['results'].values())
+                print(f"Match: {match_results[m]['player_white']} vs {match_results[m]['player_black']}: {mr}")
+    
+    return match_results
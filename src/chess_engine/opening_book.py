@@ -0,0 +1,263 @@
+"""
+Polyglot opening books held as sorted NumPy arrays, and a builder for books from PGN game archives.
+
+The entries of a Polyglot book are converted once into an index file next to the book (keys and packed
+move/weight/learn values as native uint64 arrays). The index is memory-mapped read-only, so probes are a
+binary search in memory and all processes using the book share the same pages.
+
+Usage (from the project root):
+    python -m src.chess_engine.opening_book build games.pgn more_games.pgn --output own_book.bin --max-ply 20 --min-games 3
+    python -m src.chess_engine.opening_book stats res/polyglot_opening_book/performance.bin
+"""
+
+import chess
+import chess.pgn
+import chess.polyglot
+import numpy as np
+
+import argparse
+import json
+import os
+import random
+import time
+from collections import defaultdict
+
+
+# Entry layout of Polyglot book files (16 bytes, big-endian, sorted by key)
+POLYGLOT_DTYPE = np.dtype([('key', '>u8'), ('move', '>u2'), ('weight', '>u2'), ('learn', '>u4')])
+INDEX_SUFFIX = '.index.npy'
+BOOK_PLIES = 20 # default depth of built books
+MIN_GAMES = 2 # default number of games a move needs to be included in a built book
+MAX_WEIGHT = 0xFFFF # largest weight of a Polyglot entry
+RESULT_POINTS = {'1-0': (2, 0), '1/2-1/2': (1, 1), '0-1': (0, 2)} # weight of a move for (white, black)
+POLYGLOT_HASHER = chess.polyglot.ZobristHasher(chess.polyglot.POLYGLOT_RANDOM_ARRAY)
+
+
+class IndexedBook:
+    """
+    Polyglot opening book probed by binary search over a memory-mapped index (see module docstring).
+    The index is (re)written when it is missing or older than the book, or kept in memory only if its
+    directory is not writable. Provides find_all and weighted_choice like the chess.polyglot readers.
+    """
+
+    def __init__(self, path, index_path=None):
+        self.path = path
+        self.index_path = index_path or path + INDEX_SUFFIX
+        index = load_index(path, self.index_path)
+        size = len(index) // 2
+        self.keys = index[:size] # Zobrist hashes, sorted
+        self.values = index[size:] # move | weight << 16 | learn << 32
+
+    def __len__(self):
+        return len(self.keys)
+
+    def find_all(self, board, minimum_weight=1, exclude_moves=()):
+        """ Yield the entries (chess.polyglot.Entry) of the legal book moves of the board. """
+        key = polyglot_hash(board)
+        lo = np.searchsorted(self.keys, np.uint64(key), 'left')
+        hi = np.searchsorted(self.keys, np.uint64(key), 'right')
+        for value in self.values[lo:hi].tolist():
+            raw_move, weight, learn = value & 0xFFFF, (value >> 16) & 0xFFFF, value >> 32
+            if weight < minimum_weight:
+                continue
+            move = decode_polyglot_move(board, raw_move)
+            if move in exclude_moves or not board.is_legal(move):
+                continue
+            yield chess.polyglot.Entry(key, raw_move, weight, learn, move)
+
+    def weighted_choice(self, board, exclude_moves=(), random=random):
+        """ Select a random entry of the board with probability proportional to its weight. Raises IndexError if out of book. """
+        entries = list(self.find_all(board, exclude_moves=exclude_moves))
+        total_weight = sum(entry.weight for entry in entries)
+        if not total_weight:
+            raise IndexError()
+        choice = random.randint(0, total_weight - 1)
+        for entry in entries:
+            choice -= entry.weight
+            if choice < 0:
+                return entry
+
+    def memory(self) -> int:
+        """ Size of the index in bytes (shared between processes when memory-mapped). """
+        return self.keys.nbytes + self.values.nbytes
+
+    def close(self):
+        """ Release the memory map. """
+        self.keys = self.values = np.zeros(0, dtype=np.uint64)
+
+
+def load_index(book_path, index_path) -> np.ndarray:
+    """ Memory-map the index of a Polyglot book (written first if missing or outdated). """
+    if os.path.isfile(index_path) and os.path.getmtime(index_path) >= os.path.getmtime(book_path):
+        return np.load(index_path, mmap_mode='r')
+    index = make_index(book_path)
+    try:
+        # Write under a temporary name so that other processes never map a partial file
+        temporary_path = f'{index_path}.{os.getpid()}.tmp'
+        with open(temporary_path, 'wb') as f:
+            np.save(f, index)
+        os.replace(temporary_path, index_path)
+    except OSError:
+        return index
+    return np.load(index_path, mmap_mode='r')
+
+
+def make_index(book_path) -> np.ndarray:
+    """ Keys followed by packed values of all entries of a Polyglot book file, sorted by key. """
+    entries = np.fromfile(book_path, dtype=POLYGLOT_DTYPE)
+    # Books should be sorted already, a stable sort keeps the order of the moves of a position
+    entries = entries[np.argsort(entries['key'], kind='stable')]
+    values = (entries['move'].astype(np.uint64) | (entries['weight'].astype(np.uint64) << np.uint64(16))
+              | (entries['learn'].astype(np.uint64) << np.uint64(32)))
+    return np.concatenate([entries['key'].astype(np.uint64), values])
+
+
+def polyglot_hash(board) -> int:
+    """ Same key as chess.polyglot.zobrist_hash, with the pieces hashed per piece mask instead of per square (faster). """
+    if board.chess960:
+        return POLYGLOT_HASHER(board)
+    array = chess.polyglot.POLYGLOT_RANDOM_ARRAY
+    key = POLYGLOT_HASHER.hash_ep_square(board) ^ POLYGLOT_HASHER.hash_turn(board)
+    castling_rights = board.clean_castling_rights()
+    for i, rook_square in enumerate((chess.BB_H1, chess.BB_A1, chess.BB_H8, chess.BB_A8)):
+        if castling_rights & rook_square:
+            key ^= array[768 + i]
+    for piece_index, mask in enumerate((board.pawns, board.knights, board.bishops, board.rooks, board.queens, board.kings)):
+        # Polyglot piece kinds: black pawn, white pawn, black knight, ...
+        for color in (chess.BLACK, chess.WHITE):
+            offset = 64 * (2 * piece_index + color)
+            for square in chess.scan_forward(mask & board.occupied_co[color]):
+                key ^= array[offset + square]
+    return key
+
+
+def decode_polyglot_move(board, raw_move) -> chess.Move:
+    """ Convert a Polyglot move (castling as king takes rook) to a chess.Move of the board. """
+    to_square = raw_move & 63
+    from_square = (raw_move >> 6) & 63
+    promotion = (raw_move >> 12) & 7
+    if not promotion and from_square in (chess.E1, chess.E8) and board.kings & chess.BB_SQUARES[from_square]:
+        if to_square == from_square + 3:
+            return chess.Move(from_square, from_square + 2)
+        if to_square == from_square - 4:
+            return chess.Move(from_square, from_square - 2)
+    return chess.Move(from_square, to_square, promotion + 1 if promotion else None)
+
+
+def encode_polyglot_move(board, move) -> int:
+    """ Convert a chess.Move to the Polyglot format (castling as king takes rook). """
+    to_square = move.to_square
+    if board.is_castling(move):
+        rook_file = 7 if chess.square_file(move.to_square) > chess.square_file(move.from_square) else 0
+        to_square = chess.square(rook_file, chess.square_rank(move.from_square))
+    return to_square | (move.from_square << 6) | ((move.promotion - 1 if move.promotion else 0) << 12)
+
+
+def build_book(pgn_paths, output_path, max_ply=BOOK_PLIES, min_games=MIN_GAMES, max_weight=MAX_WEIGHT) -> dict:
+    """
+    Build a Polyglot book from the main lines of the games in PGN files.
+    Every move of the first max_ply plies gets weight 2 for each win and 1 for each draw of the side that played it.
+    Moves played in fewer than min_games games or without weight are left out, weights are scaled to at most max_weight.
+    Returns the number of games, positions and entries.
+    """
+    moves = defaultdict(lambda: [0, 0]) # (key, move) -> [games, weight]
+    num_games = 0
+    for path in pgn_paths:
+        with open(path) as f:
+            while True:
+                game = chess.pgn.read_game(f)
+                if game is None:
+                    break
+                points = RESULT_POINTS.get(game.headers.get('Result'))
+                board = game.board()
+                if points is None or board.chess960:
+                    continue
+                num_games += 1
+                for ply, move in enumerate(game.mainline_moves()):
+                    if ply >= max_ply:
+                        break
+                    entry = moves[(polyglot_hash(board), encode_polyglot_move(board, move))]
+                    entry[0] += 1
+                    entry[1] += points[0 if board.turn else 1]
+                    board.push(move)
+
+    # Keep frequent moves with weight, sorted by key and decreasing weight
+    entries = [(key, move, weight) for (key, move), (games, weight) in moves.items() if games >= min_games and weight > 0]
+    book = np.zeros(len(entries), dtype=POLYGLOT_DTYPE)
+    if entries:
+        keys, raw_moves, weights = (np.array(column, dtype=np.float64 if i == 2 else np.uint64)
+                                    for i, column in enumerate(zip(*entries)))
+        if weights.max() > max_weight:
+            weights = np.maximum(weights * max_weight / weights.max(), 1)
+        order = np.lexsort((-weights, keys))
+        book['key'] = keys[order]
+        book['move'] = raw_moves[order]
+        book['weight'] = weights[order].astype(np.uint16)
+    book.tofile(output_path)
+    return {'games': num_games, 'positions': len(np.unique(book['key'])), 'entries': len(book)}
+
+
+def book_stats(path, num_positions=1000, seed=0) -> dict:
+    """
+    Size and memory of a book and the average time to find all moves of a position (in microseconds)
+    with the index compared to the chess.polyglot reader, over positions reached by random book moves.
+    """
+    book = IndexedBook(path)
+    rng = random.Random(seed)
+    boards = []
+    for i in range(num_positions):
+        board = chess.Board()
+        for ply in range(rng.randrange(BOOK_PLIES)):
+            try:
+                board.push(book.weighted_choice(board, random=rng).move)
+            except IndexError:
+                break
+        boards.append(board)
+
+    def probe_time(reader) -> float:
+        start = time.perf_counter()
+        for board in boards:
+            list(reader.find_all(board))
+        return 1e6 * (time.perf_counter() - start) / len(boards)
+
+    with chess.polyglot.open_reader(path) as reader:
+        probe_time(reader) # warm up the page cache
+        polyglot_time = probe_time(reader)
+    indexed_time = probe_time(book)
+    stats = {
+        'path': path,
+        'entries': len(book),
+        'positions': int(np.count_nonzero(np.diff(book.keys.astype(np.uint64))) + 1) if len(book) else 0,
+        'file_bytes': os.path.getsize(path),
+        'index_bytes': book.memory(),
+        'in_book': sum(1 for board in boards if any(True for entry in book.find_all(board))) / len(boards),
+        'indexed_probe_us': round(indexed_time, 3),
+        'polyglot_probe_us': round(polyglot_time, 3),
+        }
+    book.close()
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build Polyglot opening books from PGN files and measure book lookups.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build = subparsers.add_parser('build', help='build a Polyglot book from PGN files')
+    build.add_argument('pgn', nargs='+', help='PGN files with finished games')
+    build.add_argument('--output', required=True, help='Polyglot book file to write')
+    build.add_argument('--max-ply', type=int, default=BOOK_PLIES, help='number of plies of each game in the book')
+    build.add_argument('--min-games', type=int, default=MIN_GAMES, help='games a move must be played in to be included')
+    build.add_argument('--max-weight', type=int, default=MAX_WEIGHT, help='largest entry weight (weights are scaled)')
+    stats = subparsers.add_parser('stats', help='report size, memory and lookup latency of a book')
+    stats.add_argument('book', help='Polyglot book file')
+    stats.add_argument('--positions', type=int, default=1000, help='number of probed positions')
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        result = build_book(args.pgn, args.output, args.max_ply, args.min_games, min(args.max_weight, MAX_WEIGHT))
+    else:
+        result = book_stats(args.book, args.positions)
+    print(json.dumps(result, indent=4))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+import chess
+import chess.polyglot
+
+import os
+import sqlite3
+import time
+
+
+# Default limits of the cache file
+MAX_ENTRIES = 1_000_000 # least recently used entries are evicted beyond this number
+EVICTION_BATCH = 0.1 # fraction of entries removed at once when the cache is full
+EVICTION_INTERVAL = 1000 # stores between two checks of the cache size (counting the entries scans the table)
+
+
+class PositionCache:
+    """
+    Persistent cache of search results in a SQLite file, keyed by Zobrist hash and engine settings.
+    Only the deepest result of a position is kept. Beyond max_entries, the least recently used entries are
+    evicted (the size is checked every EVICTION_INTERVAL stores, so the cache may briefly hold more entries),
+    and entries unused for more than max_age seconds are removed when the cache is opened for writing.
+    With read_only=True, many processes can share the file (connections are opened lazily in each process).
+    """
+
+    def __init__(self, path, read_only=False, max_entries=MAX_ENTRIES, max_age=None):
+        self.path = path
+        self.read_only = read_only
+        self.max_entries = max_entries
+        self.max_age = max_age # seconds since last use (None = no age limit)
+        self.connection = None
+        self.num_probes = 0 # only for statistical purposes
+        self.num_hits = 0 # only for statistical purposes
+        self.num_stores = 0 # only for statistical purposes
+        self.stores_since_eviction = 0 # stores since the last size check
+        if not read_only:
+            self.connect()
+
+    def __getstate__(self):
+        # Connections cannot be shared between processes (reopened on first use)
+        state = self.__dict__.copy()
+        state['connection'] = None
+        return state
+
+    def connect(self):
+        """ Open the database (created with its table if writable). """
+        if self.read_only:
+            if not os.path.isfile(self.path):
+                return None
+            self.connection = sqlite3.connect(f'file:{self.path}?mode=ro', uri=True, isolation_level=None)
+            return self.connection
+        self.connection = sqlite3.connect(self.path, isolation_level=None)
+        # Write-ahead logging lets readers in other processes work while a writer stores results
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('''CREATE TABLE IF NOT EXISTS positions (
+            engine TEXT, key INTEGER, depth INTEGER, move TEXT, score REAL, last_used REAL,
+            PRIMARY KEY (engine, key))''')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS positions_last_used ON positions (last_used)')
+        if self.max_age is not None:
+            self.connection.execute('DELETE FROM positions WHERE last_used < ?', (time.time() - self.max_age,))
+        return self.connection
+
+    def probe(self, board, depth, engine='') -> tuple:
+        """ Return (move, score, depth) of a stored search of at least the given depth, or None. """
+        connection = self.connection or self.connect()
+        if connection is None:
+            return None
+        self.num_probes += 1
+        key = position_key(board)
+        row = connection.execute('SELECT move, score, depth FROM positions WHERE engine = ? AND key = ? AND depth >= ?',
+                                 (engine, key, depth)).fetchone()
+        if row is None:
+            return None
+        move = chess.Move.from_uci(row[0])
+        if not board.is_legal(move): # hash collision
+            return None
+        self.num_hits += 1
+        if not self.read_only:
+            connection.execute('UPDATE positions SET last_used = ? WHERE engine = ? AND key = ?',
+                               (time.time(), engine, key))
+        return move, row[1], row[2]
+
+    def store(self, board, depth, move, score, engine=''):
+        """ Save a search result (a shallower result never replaces a deeper one). """
+        if self.read_only or move is None:
+            return
+        connection = self.connection or self.connect()
+        self.num_stores += 1
+        connection.execute('''INSERT INTO positions VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (engine, key) DO UPDATE SET depth = excluded.depth, move = excluded.move,
+            score = excluded.score, last_used = excluded.last_used WHERE excluded.depth >= positions.depth''',
+            (engine, position_key(board), depth, move.uci(), float(score), time.time()))
+        self.stores_since_eviction += 1
+        if self.stores_since_eviction >= min(EVICTION_INTERVAL, max(self.max_entries // 10, 1)):
+            self.evict()
+
+    def evict(self):
+        """ Remove the least recently used entries if the cache is full. """
+        self.stores_since_eviction = 0
+        num_entries = len(self)
+        if num_entries <= self.max_entries:
+            return
+        num_evicted = num_entries - self.max_entries + int(EVICTION_BATCH * self.max_entries)
+        self.connection.execute('''DELETE FROM positions WHERE rowid IN
+            (SELECT rowid FROM positions ORDER BY last_used LIMIT ?)''', (num_evicted,))
+
+    def __len__(self):
+        connection = self.connection or self.connect()
+        if connection is None:
+            return 0
+        return connection.execute('SELECT COUNT(*) FROM positions').fetchone()[0]
+
+    def close(self):
+        """ Close the database connection of this process. """
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+def position_key(board) -> int:
+    """ Zobrist hash of the board as signed 64 bit integer (SQLite integer range). """
+    key = chess.polyglot.zobrist_hash(board)
+    return key - 2**64 if key >= 2**63 else key
@@ -0,0 +1,154 @@
+import json
+import time
+
+
+# Engine methods timed by the profiler: phase name -> attribute names (on the engine or its components)
+PHASES = {
+    'move_generation': ['generate_captures', 'generate_quiet_moves'],
+    'ordering': ['order_moves'], # without the move generation inside
+    'make_unmake': ['push_move', 'pop_move'],
+    'evaluation': ['evaluate'],
+    'quiescence': ['quiescence_search'], # without the phases inside
+    'transposition_table': ['tt.probe', 'tt.store'],
+    'book': ['resources.book_move'],
+    'tablebase': ['resources.probe_wdl'],
+    'cache': ['cache.probe', 'cache.store'],
+    }
+
+# Engine counters reported per move (differences between the end of two moves)
+COUNTERS = ['num_nodes', 'num_qnodes', 'num_evals', 'num_prunes', 'num_cutoffs', 'num_first_move_cutoffs',
+            'num_tt_hits', 'num_tt_misses', 'num_ponder_hits', 'num_ponder_misses']
+
+
+class SearchProfiler:
+    """
+    Opt-in instrumentation of a NegamaxEngine.
+    The timed methods are replaced by wrappers on the engine instance only, so an engine without profiler
+    runs unchanged code. Times are exclusive (time spent in nested timed phases is not counted twice).
+    Each move is recorded with phase times, counters and the nodes, time and cutoffs of each search depth,
+    and optionally appended as a JSON line to a file. Records include searches on the opponent's time (pondering).
+    """
+
+    def __init__(self, engine, path=None):
+        self.engine = engine
+        self.path = path # JSON lines file for the move records (None = keep in memory only)
+        self.times = {phase: 0.0 for phase in PHASES}
+        self.calls = {phase: 0 for phase in PHASES}
+        self.child_times = [0.0] # time of timed calls nested in the currently running timed call
+        self.iterations = [] # statistics per completed search depth of the current move
+        self.iteration_start = None
+        self.moves = [] # records of the current game
+        self.counters = self.read_counters()
+        for phase, names in PHASES.items():
+            for name in names:
+                owner_name, _, method_name = name.rpartition('.')
+                owner = getattr(engine, owner_name) if owner_name else engine
+                if owner is None:
+                    continue
+                method = getattr(owner, method_name)
+                if method_name == 'order_moves':
+                    setattr(owner, method_name, self.wrap_generator(phase, method))
+                else:
+                    setattr(owner, method_name, self.wrap(phase, method))
+
+    def wrap(self, phase, function):
+        """ Return a function that adds its exclusive run time to the phase. """
+        def timed(*args, **kwargs):
+            self.child_times.append(0.0)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                self.times[phase] += elapsed - self.child_times.pop()
+                self.calls[phase] += 1
+                self.child_times[-1] += elapsed
+        return timed
+
+    def wrap_generator(self, phase, function):
+        """ Return a generator function that adds the time spent producing each item to the phase. """
+        def timed(*args, **kwargs):
+            generator = function(*args, **kwargs)
+            next_item = self.wrap(phase, lambda: next(generator, StopIteration))
+            while True:
+                item = next_item()
+                if item is StopIteration:
+                    return
+                yield item
+        return timed
+
+    def read_counters(self) -> dict:
+        """ Current values of the engine counters. """
+        return {name: getattr(self.engine, name) for name in COUNTERS}
+
+    def start_iteration(self):
+        """ Remember the counters at the start of a search depth. """
+        self.iteration_start = (time.perf_counter(), self.engine.num_nodes, self.engine.num_qnodes,
+                                self.engine.num_cutoffs, self.engine.num_first_move_cutoffs)
+
+    def end_iteration(self, depth):
+        """ Save the nodes, time and cutoffs of a completed search depth. """
+        start, nodes, qnodes, cutoffs, first_move_cutoffs = self.iteration_start
+        self.iterations.append({
+            'depth': depth,
+            'nodes': self.engine.num_nodes - nodes,
+            'qnodes': self.engine.num_qnodes - qnodes,
+            'time': round(time.perf_counter() - start, 6),
+            'cutoffs': self.engine.num_cutoffs - cutoffs,
+            'first_move_cutoffs': self.engine.num_first_move_cutoffs - first_move_cutoffs,
+            })
+
+    def record_move(self, board, move, elapsed) -> dict:
+        """ Save the record of a move (phase times and counters since the previous move). """
+        counters = self.read_counters()
+        deltas = {name[4:]: counters[name] - self.counters[name] for name in COUNTERS}
+        self.counters = counters
+        timed = sum(self.times.values())
+        # Effective branching factor between the last two completed depths
+        branching = None
+        if len(self.iterations) > 1 and self.iterations[-2]['nodes'] > 0:
+            branching = round(self.iterations[-1]['nodes'] / self.iterations[-2]['nodes'], 3)
+        record = {
+            'fen': board.fen(),
+            'move': None if move is None else move.uci(),
+            'time': round(elapsed, 6),
+            'phases': {phase: round(t, 6) for phase, t in self.times.items()},
+            'calls': dict(self.calls),
+            'other': round(max(elapsed - timed, 0), 6), # search bookkeeping outside the timed phases
+            'counters': deltas,
+            'depths': self.iterations,
+            'branching_factor': branching,
+            'first_move_cutoff_rate': round(100 * deltas['first_move_cutoffs'] / deltas['cutoffs'], 2)
+                                      if deltas['cutoffs'] else None,
+            }
+        self.moves.append(record)
+        if self.path is not None:
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(record) + '\n')
+        self.times = {phase: 0.0 for phase in PHASES}
+        self.calls = {phase: 0 for phase in PHASES}
+        self.iterations = []
+        return record
+
+    def game_summary(self, reset=True) -> dict:
+        """ Summarize the recorded moves (totals, time share per phase, averages); optionally start a new game. """
+        total_time = sum(record['time'] for record in self.moves)
+        phases = {phase: sum(record['phases'][phase] for record in self.moves) for phase in PHASES}
+        phases['other'] = sum(record['other'] for record in self.moves)
+        counters = {name[4:]: sum(record['counters'][name[4:]] for record in self.moves) for name in COUNTERS}
+        branching = [record['branching_factor'] for record in self.moves if record['branching_factor']]
+        summary = {
+            'engine': str(self.engine),
+            'num_moves': len(self.moves),
+            'time': round(total_time, 6),
+            'phases': {phase: round(t, 6) for phase, t in phases.items()},
+            'phase_share': {phase: round(t / total_time, 4) if total_time else None for phase, t in phases.items()},
+            'counters': counters,
+            'nps': round((counters['nodes'] + counters['qnodes']) / total_time) if total_time else None,
+            'mean_branching_factor': round(sum(branching) / len(branching), 3) if branching else None,
+            'first_move_cutoff_rate': round(100 * counters['first_move_cutoffs'] / counters['cutoffs'], 2)
+                                      if counters['cutoffs'] else None,
+            }
+        if reset:
+            self.moves = []
+        return summary
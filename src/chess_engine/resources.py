@@ -0,0 +1,75 @@
+import chess
+import chess.syzygy
+
+import os
+
+from .opening_book import IndexedBook
+
+
+# Default locations of the optional data (see ./res/ for download sources)
+BOOK_PATH = 'res/polyglot_opening_book/performance.bin'
+TABLEBASE_PATH = 'res/syzygy_endgame_tablebases'
+
+
+class EngineResources:
+    """
+    Opens the opening book (as IndexedBook) and the Syzygy endgame tablebases once and keeps them
+    (memory-mapped) for the lifetime of an engine.
+    Missing files simply disable the corresponding feature.
+    """
+
+    def __init__(self, book_path=BOOK_PATH, tablebase_path=TABLEBASE_PATH, opening_book=True, endgame_table=True):
+        self.book_path = book_path
+        self.tablebase_path = tablebase_path
+        self.book = None
+        self.tablebase = None
+        self.tablebase_pieces = 0 # largest number of pieces covered by the tablebase
+        self.num_book_probes = 0 # only for statistical purposes
+        self.num_book_hits = 0 # only for statistical purposes
+        self.num_tb_probes = 0 # only for statistical purposes
+        self.num_tb_hits = 0 # only for statistical purposes
+        # Open opening book
+        if opening_book and book_path and os.path.isfile(book_path):
+            self.book = IndexedBook(book_path)
+        # Open endgame tablebases (only if the directory contains tables)
+        if endgame_table and tablebase_path and os.path.isdir(tablebase_path):
+            tablebase = chess.syzygy.open_tablebase(tablebase_path)
+            if tablebase.wdl:
+                self.tablebase = tablebase
+                self.tablebase_pieces = max(len(name) - 1 for name in tablebase.wdl) # e.g. 'KQvKR' -> 4
+            else:
+                tablebase.close()
+
+    def book_move(self, board):
+        """ Return a weighted random book move for the board, or None if out of book. """
+        if self.book is None:
+            return None
+        self.num_book_probes += 1
+        try:
+            move = self.book.weighted_choice(board).move
+        except IndexError:
+            return None
+        self.num_book_hits += 1
+        return move
+
+    def probe_wdl(self, board):
+        """
+        Probe the win/draw/loss value for the side to move (2 win, 0 draw, -2 loss).
+        Returns None if the position is not covered by the tablebase.
+        """
+        if self.tablebase is None or chess.popcount(board.occupied) > self.tablebase_pieces:
+            return None
+        self.num_tb_probes += 1
+        wdl = self.tablebase.get_wdl(board)
+        if wdl is not None:
+            self.num_tb_hits += 1
+        return wdl
+
+    def close(self):
+        """ Close all open files. """
+        if self.book is not None:
+            self.book.close()
+            self.book = None
+        if self.tablebase is not None:
+            self.tablebase.close()
+            self.tablebase = None
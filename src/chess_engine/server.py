@@ -0,0 +1,438 @@
+"""
+Local HTTP service answering 'bestmove' and 'analyse' requests with a pool of warm engine processes.
+
+Each worker process creates its NegamaxEngine once (opening book and tablebases opened, numba evaluation
+compiled by a warm-up search) and then takes requests from a queue. Every request has a deadline:
+requests still queued at their deadline are dropped, running searches get the remaining time as budget.
+Requests with a session id (e.g. one per ongoing game) always run on the same worker and keep their own
+transposition table there. Queue depth, latency percentiles and worker utilisation are served as metrics.
+
+Usage (from the project root):
+    python -m src.chess_engine.server --port 8000 --workers 4 --depth 4
+
+Requests (JSON):
+    POST /bestmove  {"fen": ..., "moves": ["e2e4", ...], "depth": 4, "move_time": 0.5, "session": "game1", "timeout": 5}
+    POST /analyse   same fields, answered with score, depth, principal variation and nodes (no book moves)
+    DELETE /sessions/<session>   release the transposition table of a finished game
+    GET /metrics    GET /health
+"""
+
+import chess
+import numpy as np
+
+import argparse
+import json
+import multiprocessing as mp
+import threading
+import time
+from collections import OrderedDict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .analysis import format_score
+from .engine_negamax import NegamaxEngine, MAX_DEPTH
+from .transposition import TranspositionTable
+
+
+COMMANDS = ('bestmove', 'analyse')
+DEFAULT_SETTINGS = {'depth': 3, 'hash_size': 16}
+DEFAULT_TIMEOUT = 10 # seconds from submission to answer (if the request has no timeout)
+DEADLINE_MARGIN = 0.05 # seconds of the deadline reserved for transport (not given to the search)
+DEADLINE_GRACE = 0.5 # seconds a client waits past the deadline for a running search to return
+MAX_QUEUE = 64 # queued requests beyond this number are rejected
+MAX_SESSIONS = 8 # transposition tables kept per worker (least recently used sessions are ended)
+LATENCY_WINDOW = 1000 # number of recent requests used for latency percentiles
+
+
+class ServiceError(Exception):
+    """ Error answered to the client with the given HTTP status. """
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class Job:
+    """ A queued or running request and its result. """
+
+    def __init__(self, job_id, request, deadline):
+        self.id = job_id
+        self.request = request
+        self.session = request['session']
+        self.deadline = deadline
+        self.submitted = time.time()
+        self.worker = None
+        self.status = None
+        self.result = None
+        self.abandoned = False # the client stopped waiting (result not counted)
+        self.done = threading.Event()
+
+
+class EngineService:
+    """
+    Pool of warm engine processes with a shared request queue (see module docstring).
+    The settings are NegamaxEngine arguments used by every worker. Requests are dispatched in order,
+    except that a session request waits for the worker of its session while later requests may go ahead.
+    """
+
+    def __init__(self, settings=None, workers=2, max_queue=MAX_QUEUE, timeout=DEFAULT_TIMEOUT):
+        self.settings = dict(DEFAULT_SETTINGS, **(settings or {}))
+        self.num_workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.lock = threading.Condition()
+        self.queue = deque() # jobs waiting for a worker
+        self.running = {} # job id -> job
+        self.idle = [] # indices of ready workers without a job
+        self.sessions = OrderedDict() # session -> worker index (least recently used first)
+        self.next_id = 0
+        self.start = time.time()
+        self.busy_times = [0.0] * workers # seconds spent searching per worker
+        self.latencies = deque(maxlen=LATENCY_WINDOW) # seconds from submission to answer
+        self.num_completed = 0 # only for statistical purposes
+        self.num_failed = 0 # only for statistical purposes
+        self.num_expired = 0 # only for statistical purposes
+        self.num_rejected = 0 # only for statistical purposes
+        self.results = mp.Queue()
+        self.workers = []
+        for index in range(workers):
+            tasks = mp.Queue()
+            process = mp.Process(target=serve_worker, args=(index, self.settings, tasks, self.results), daemon=True)
+            process.start()
+            self.workers.append((process, tasks))
+        self.collector = threading.Thread(target=self.collect_results, daemon=True)
+        self.collector.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def wait_ready(self, timeout=None) -> bool:
+        """ Wait until all workers have finished their warm-up search. """
+        with self.lock:
+            return self.lock.wait_for(lambda: len(self.idle) + len(self.running) == self.num_workers, timeout)
+
+    def submit(self, request) -> Job:
+        """ Validate a request and queue it. Raises ServiceError if it is invalid or the queue is full. """
+        request = parse_request(request)
+        timeout = request.pop('timeout') or self.timeout
+        with self.lock:
+            if len(self.queue) >= self.max_queue:
+                self.num_rejected += 1
+                raise ServiceError(503, 'request queue is full')
+            job = Job(self.next_id, request, time.time() + timeout)
+            request['deadline'] = job.deadline
+            self.next_id += 1
+            self.queue.append(job)
+            self.dispatch()
+        return job
+
+    def run(self, request) -> dict:
+        """ Submit a request and wait for its result. Raises ServiceError on failure or deadline expiry. """
+        job = self.submit(request)
+        if not job.done.wait(max(job.deadline - time.time(), 0) + DEADLINE_GRACE):
+            with self.lock:
+                if job in self.queue:
+                    self.queue.remove(job)
+                job.abandoned = True
+                self.num_expired += 1
+            raise ServiceError(504, 'deadline exceeded')
+        if job.status != 200:
+            raise ServiceError(job.status, job.result['error'])
+        return job.result
+
+    def dispatch(self):
+        """ Assign queued jobs to idle workers and drop expired ones (called with the lock held). """
+        now = time.time()
+        for job in list(self.queue):
+            if now >= job.deadline:
+                self.queue.remove(job)
+                self.num_expired += 1
+                self.finish(job, 504, {'error': 'deadline exceeded'})
+                continue
+            if not self.idle:
+                break
+            worker = self.sessions.get(job.session)
+            if worker is None:
+                worker = self.idle[0]
+            elif worker not in self.idle:
+                continue # wait for the worker holding the session's transposition table
+            if job.session is not None:
+                self.pin_session(job.session, worker)
+            self.queue.remove(job)
+            self.idle.remove(worker)
+            job.worker = worker
+            self.running[job.id] = job
+            self.workers[worker][1].put(('search', job.id, job.request))
+
+    def pin_session(self, session, worker):
+        """
+        Assign a session to a worker. Beyond MAX_SESSIONS sessions on the worker, its least recently used
+        sessions are ended (the worker only drops transposition tables of ended sessions).
+        """
+        self.sessions[session] = worker
+        self.sessions.move_to_end(session)
+        worker_sessions = [pinned for pinned, index in self.sessions.items() if index == worker]
+        for pinned in worker_sessions[:-MAX_SESSIONS]:
+            self.end_session(pinned)
+
+    def end_session(self, session) -> bool:
+        """ Release the transposition table of a session. Returns False for unknown sessions. """
+        with self.lock:
+            worker = self.sessions.pop(session, None)
+            if worker is None:
+                return False
+            self.workers[worker][1].put(('end_session', None, session))
+            return True
+
+    def finish(self, job, status, result):
+        """ Store the result of a job and wake up its client (called with the lock held). """
+        job.status = status
+        job.result = result
+        if job.abandoned:
+            pass
+        elif status == 200:
+            self.num_completed += 1
+            self.latencies.append(time.time() - job.submitted)
+        elif status != 504:
+            self.num_failed += 1
+        job.done.set()
+
+    def collect_results(self):
+        """ Receive results and ready messages from the workers (runs in a background thread). """
+        while True:
+            message = self.results.get()
+            if message is None:
+                break
+            kind, index, job_id, result, busy_time = message
+            with self.lock:
+                self.idle.append(index)
+                if kind == 'done':
+                    self.busy_times[index] += busy_time
+                    job = self.running.pop(job_id)
+                    self.finish(job, result.pop('status', 500 if 'error' in result else 200), result)
+                self.dispatch()
+                self.lock.notify_all()
+
+    def metrics(self) -> dict:
+        """ Queue depth, request counts, latency percentiles (seconds) and worker utilisation. """
+        with self.lock:
+            uptime = time.time() - self.start
+            latencies = np.array(self.latencies)
+            utilisation = [round(busy / uptime, 4) for busy in self.busy_times]
+            return {
+                'uptime': round(uptime, 3),
+                'workers': self.num_workers,
+                'ready': len(self.idle) + len(self.running) == self.num_workers,
+                'queue_depth': len(self.queue),
+                'running': len(self.running),
+                'sessions': len(self.sessions),
+                'requests': {'completed': self.num_completed, 'failed': self.num_failed,
+                             'expired': self.num_expired, 'rejected': self.num_rejected},
+                'latency': {name: round(float(np.percentile(latencies, q)), 6) if len(latencies) else None
+                            for name, q in (('p50', 50), ('p90', 90), ('p99', 99), ('max', 100))},
+                'utilisation': utilisation,
+                'mean_utilisation': round(sum(utilisation) / len(utilisation), 4),
+                }
+
+    def close(self):
+        """ Stop the workers and the result collector. """
+        for process, tasks in self.workers:
+            tasks.put(None)
+        for process, tasks in self.workers:
+            process.join()
+        self.workers = []
+        self.results.put(None)
+        self.collector.join()
+
+
+def parse_request(request) -> dict:
+    """ Check the fields of a request. Raises ServiceError (400) for invalid requests. """
+    if not isinstance(request, dict):
+        raise ServiceError(400, 'request must be a JSON object')
+    command = request.get('command', 'bestmove')
+    if command not in COMMANDS:
+        raise ServiceError(400, f'No command named {command} available.')
+    fen = request.get('fen', chess.STARTING_FEN)
+    moves = request.get('moves', [])
+    try:
+        board = chess.Board(fen)
+        for move in moves:
+            board.push_uci(move)
+    except (ValueError, TypeError) as e:
+        raise ServiceError(400, f'invalid position: {e}')
+    depth = request.get('depth')
+    if depth is not None and (not isinstance(depth, int) or not 1 <= depth <= MAX_DEPTH):
+        raise ServiceError(400, f'depth must be an integer between 1 and {MAX_DEPTH}')
+    for name in ('move_time', 'timeout'):
+        value = request.get(name)
+        if value is not None and (not isinstance(value, (int, float)) or value <= 0):
+            raise ServiceError(400, f'{name} must be a positive number of seconds')
+    session = request.get('session')
+    return {'command': command, 'fen': fen, 'moves': list(moves), 'depth': depth, 'move_time': request.get('move_time'),
+            'session': None if session is None else str(session), 'timeout': request.get('timeout')}
+
+
+def serve_worker(index, settings, tasks, results):
+    """ Create and warm up an engine, then answer requests until None is received (runs in a worker process). """
+    engine = NegamaxEngine(**settings)
+    # Compile the numba evaluation and touch the opening book before the first request
+    engine.resources.book_move(chess.Board())
+    engine.search(chess.Board(), None, 2)
+    default_tt = engine.tt
+    sessions = {} # session -> transposition table
+    results.put(('ready', index, None, None, 0.0))
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        kind, job_id, request = task
+        if kind == 'end_session':
+            sessions.pop(request, None)
+            continue
+        start = time.perf_counter()
+        try:
+            result = run_request(engine, request, sessions, default_tt)
+        except Exception as e:
+            result = {'error': f'{type(e).__name__}: {e}'}
+        result['worker'] = index
+        results.put(('done', index, job_id, result, time.perf_counter() - start))
+    engine.tt = default_tt
+    engine.close()
+
+
+def run_request(engine, request, sessions, default_tt) -> dict:
+    """ Search the position of a request within its deadline using the session's transposition table. """
+    board = chess.Board(request['fen'])
+    for move in request['moves']:
+        board.push_uci(move)
+    if engine.tt is not None:
+        session = request['session']
+        if session is None:
+            # Requests without session are independent
+            engine.tt = default_tt
+            engine.tt.clear()
+        else:
+            # Tables are only dropped when the service ends the session (at most MAX_SESSIONS per worker)
+            if session not in sessions:
+                sessions[session] = TranspositionTable(engine.hash_size)
+            engine.tt = sessions[session]
+
+    # Search until depth, move time or deadline (whichever comes first)
+    budget = request['deadline'] - time.time() - DEADLINE_MARGIN
+    if budget <= 0:
+        return {'error': 'deadline exceeded', 'status': 504}
+    if request['move_time'] is not None:
+        budget = min(budget, request['move_time'])
+    max_depth = request['depth'] or (engine.depth if request['move_time'] is None else MAX_DEPTH)
+    start = time.perf_counter()
+    start_nodes = engine.num_nodes + engine.num_qnodes
+    if request['command'] == 'bestmove' and not board.is_game_over():
+        move = engine.resources.book_move(board)
+        if move is not None:
+            return {'best_move': move.uci(), 'source': 'book', 'time': round(time.perf_counter() - start, 6)}
+    engine.stop_requested = False
+    move = engine.search(board, budget, max_depth)
+    result = {
+        'best_move': None if move is None else move.uci(),
+        'source': 'search',
+        'score': format_score(engine.evaluation),
+        'depth': engine.completed_depth,
+        'nodes': engine.num_nodes + engine.num_qnodes - start_nodes,
+        'time': round(time.perf_counter() - start, 6),
+        }
+    if request['command'] == 'analyse':
+        result['pv'] = [move.uci() for move in engine.pv if move is not None]
+    return result
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    """ JSON over HTTP front-end of the EngineService of its server. """
+
+    def do_GET(self):
+        service = self.server.service
+        if self.path == '/metrics':
+            self.send_json(200, service.metrics())
+        elif self.path == '/health':
+            ready = service.metrics()['ready']
+            self.send_json(200 if ready else 503, {'status': 'ok' if ready else 'warming up'})
+        else:
+            self.send_json(404, {'error': f'unknown path {self.path}'})
+
+    def do_POST(self):
+        command = self.path.strip('/')
+        if command not in COMMANDS:
+            self.send_json(404, {'error': f'unknown path {self.path}'})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length) or b'{}')
+            if isinstance(request, dict):
+                request['command'] = command
+            self.send_json(200, self.server.service.run(request))
+        except json.JSONDecodeError as e:
+            self.send_json(400, {'error': f'invalid JSON: {e}'})
+        except ServiceError as e:
+            self.send_json(e.status, {'error': str(e)})
+
+    def do_DELETE(self):
+        prefix, _, session = self.path.rpartition('/')
+        if prefix != '/sessions' or not session:
+            self.send_json(404, {'error': f'unknown path {self.path}'})
+        elif self.server.service.end_session(session):
+            self.send_json(200, {'session': session, 'status': 'ended'})
+        else:
+            self.send_json(404, {'error': f'unknown session {session}'})
+
+    def send_json(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def make_server(service, host='127.0.0.1', port=8000, verbose=False) -> ThreadingHTTPServer:
+    """ Create an HTTP server for the service (port 0 picks a free port, see server.server_address). """
+    server = ThreadingHTTPServer((host, port), ServiceHandler)
+    server.daemon_threads = True
+    server.service = service
+    server.verbose = verbose
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve engine requests over HTTP with a pool of warm engines.')
+    parser.add_argument('--host', default='127.0.0.1', help='address to listen on')
+    parser.add_argument('--port', type=int, default=8000, help='port to listen on')
+    parser.add_argument('--workers', type=int, default=2, help='number of engine processes')
+    parser.add_argument('--depth', type=int, default=3, help='search depth of requests without depth and move_time')
+    parser.add_argument('--hash', type=int, default=16, help='transposition table size per session in MB')
+    parser.add_argument('--quiescence', action='store_true', help='resolve captures at the leaves')
+    parser.add_argument('--evaluation', choices=['material', 'pst'], default='material', help='evaluation function')
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT, help='default request deadline in seconds')
+    parser.add_argument('--max-queue', type=int, default=MAX_QUEUE, help='maximum number of queued requests')
+    parser.add_argument('--verbose', action='store_true', help='log every request')
+    args = parser.parse_args(argv)
+
+    settings = {'depth': args.depth, 'hash_size': args.hash, 'quiescence': args.quiescence, 'evaluation': args.evaluation}
+    with EngineService(settings, args.workers, args.max_queue, args.timeout) as service:
+        server = make_server(service, args.host, args.port, args.verbose)
+        service.wait_ready()
+        print(f'Serving {args.workers} engines on http://{args.host}:{server.server_address[1]}')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+
+
+if __name__ == '__main__':
+    main()
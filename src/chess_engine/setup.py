@@ -25,6 +25,10 @@ def setup_game():
         theme=theme
         )
     
+    # Let the engine think on the human's time (only here, pondering would skew engine-vs-engine games)
+    if isinstance(engine, NegamaxEngine):
+        engine.ponder = True
+    
     # Return players
     if color == 'white':
         return human, engine
@@ -0,0 +1,138 @@
+import chess
+import numpy as np
+
+from multiprocessing import shared_memory
+
+
+# Bound types of stored scores
+EXACT = 0
+LOWER = 1 # score is a lower bound (fail-high, beta cutoff)
+UPPER = 2 # score is an upper bound (fail-low, no move improved alpha)
+
+# Bytes per entry: key (8) + score (8) + move (2) + depth (1) + flag (1)
+ENTRY_SIZE = 20
+MASK_64 = 2**64 - 1
+CHECKSUM_FACTOR = 0x9E3779B97F4A7C15 # spreads the packed depth, flag and move over 64 bits
+
+
+def encode_move(move) -> int:
+    """ Pack a move into 16 bits (from square, to square, promotion piece). """
+    if move is None:
+        return 0
+    return move.from_square | (move.to_square << 6) | ((move.promotion or 0) << 12)
+
+
+def decode_move(code):
+    """ Unpack a 16 bit move code (0 means no move). """
+    if code == 0:
+        return None
+    return chess.Move(code & 63, (code >> 6) & 63, (code >> 12) or None)
+
+
+def checksum(depth, score_bits, flag, move_code) -> int:
+    """ 64 bit checksum of the data of an entry (stored XORed into the key). """
+    packed = move_code | (flag << 16) | ((depth & 0xFF) << 24)
+    return score_bits ^ ((packed * CHECKSUM_FACTOR) & MASK_64)
+
+
+class TranspositionTable:
+    """
+    Fixed-size transposition table keyed on Zobrist hashes.
+    Each bucket holds two entries: a depth-preferred slot and an always-replace slot.
+    With shared=True the entries live in shared memory, and other processes can attach to the
+    table by passing its name (used by the parallel search). Entries are written without locks,
+    so the key is stored XORed with a checksum of the data: an entry whose fields were written
+    by different processes at the same time does not match its key and is ignored.
+    """
+
+    def __init__(self, hash_size=16, shared=False, name=None):
+        self.hash_size = hash_size # memory budget in MB
+        self.num_buckets = max(1, int(hash_size * 2**20) // (2 * ENTRY_SIZE))
+        size = 2 * self.num_buckets
+        self.shm = None
+        if shared or name is not None:
+            # Create or attach to a shared memory block holding all entry arrays
+            self.shm = shared_memory.SharedMemory(name=name, create=name is None, size=size * ENTRY_SIZE)
+            buffer = self.shm.buf
+            self.keys = np.ndarray(size, dtype=np.uint64, buffer=buffer, offset=0)
+            self.scores = np.ndarray(size, dtype=np.float64, buffer=buffer, offset=8 * size)
+            self.moves = np.ndarray(size, dtype=np.uint16, buffer=buffer, offset=16 * size)
+            self.depths = np.ndarray(size, dtype=np.int8, buffer=buffer, offset=18 * size)
+            self.flags = np.ndarray(size, dtype=np.int8, buffer=buffer, offset=19 * size)
+            if name is None:
+                self.depths[:] = -1 # -1 marks an empty slot
+        else:
+            self.keys = np.zeros(size, dtype=np.uint64)
+            self.scores = np.zeros(size, dtype=np.float64)
+            self.moves = np.zeros(size, dtype=np.uint16)
+            self.depths = np.full(size, -1, dtype=np.int8) # -1 marks an empty slot
+            self.flags = np.zeros(size, dtype=np.int8)
+
+    @property
+    def name(self):
+        """ Name of the shared memory block (None if not shared). """
+        return None if self.shm is None else self.shm.name
+
+    def close(self, unlink=False):
+        """ Release the shared memory block (unlink=True removes it for all processes). """
+        if self.shm is None:
+            return
+        del self.keys, self.scores, self.moves, self.depths, self.flags
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+        self.shm = None
+
+    def __len__(self):
+        return int(np.count_nonzero(self.depths >= 0))
+
+    def clear(self):
+        """ Remove all entries. """
+        self.keys[:] = 0
+        self.depths[:] = -1
+
+    def entry_key(self, i) -> int:
+        """ Key of the position stored in slot i (None if empty or inconsistent). """
+        return self.read(i)[0]
+
+    def read(self, i) -> tuple:
+        """ Read slot i once. Returns (key, depth, score, flag, move code), the key is None if empty or inconsistent. """
+        depth = int(self.depths[i])
+        if depth < 0:
+            return (None, depth, 0.0, 0, 0)
+        score = self.scores[i]
+        flag = int(self.flags[i])
+        move_code = int(self.moves[i])
+        key = int(self.keys[i])
+        return (key ^ checksum(depth, int(score.view(np.uint64)), flag, move_code), depth, score, flag, move_code)
+
+    def probe(self, key):
+        """ Look up a position. Returns (depth, score, flag, move) or None. """
+        slot = 2 * (key % self.num_buckets)
+        for i in (slot, slot + 1):
+            entry_key, depth, score, flag, move_code = self.read(i)
+            if entry_key == key:
+                return (depth, float(score), flag, decode_move(move_code))
+        return None
+
+    def store(self, key, depth, score, flag, move):
+        """
+        Store a search result using a depth-preferred plus always-replace policy.
+        Returns True if an entry of a different position was overwritten.
+        """
+        slot = 2 * (key % self.num_buckets)
+        # Depth-preferred slot: take it if empty, same position or not searched deeper
+        slot_key, slot_depth = self.read(slot)[:2]
+        if slot_key is None or slot_key == key or depth >= slot_depth:
+            i, entry_key = slot, slot_key
+        # Otherwise always replace the second slot
+        else:
+            i, entry_key = slot + 1, self.entry_key(slot + 1)
+        overwrite = entry_key is not None and entry_key != key
+        move_code = encode_move(move)
+        self.depths[i] = depth
+        self.scores[i] = score
+        self.flags[i] = flag
+        self.moves[i] = move_code
+        self.keys[i] = key ^ checksum(depth, int(np.float64(score).view(np.uint64)), flag, move_code)
+        return overwrite
@@ -0,0 +1,250 @@
+"""
+Universal Chess Interface (UCI) front-end for the NegamaxEngine.
+
+The search runs in a background thread so that 'stop' is answered immediately with the best move
+of the last completed iteration.
+
+Usage (from the project root):
+    python -m src.chess_engine.uci
+"""
+
+import chess
+
+import sys
+import threading
+
+from .engine_negamax import NegamaxEngine
+
+
+ENGINE_NAME = 'NegamaxEngine'
+ENGINE_AUTHOR = 'Jens Mueller'
+
+# UCI options: name -> (type, default, min, max)
+OPTIONS = {
+    'Hash': ('spin', 16, 1, 4096),
+    'Threads': ('spin', 1, 1, 64),
+    'OwnBook': ('check', True, None, None),
+    'Quiescence': ('check', True, None, None),
+    'Ponder': ('check', False, None, None), # pondering itself is driven by the GUI ('go ponder', 'ponderhit')
+    }
+
+
+class UciInterface:
+    """ Reads UCI commands from an input stream and answers on an output stream. """
+
+    def __init__(self, input_stream=sys.stdin, output_stream=sys.stdout):
+        self.input_stream = input_stream
+        self.output_stream = output_stream
+        self.output_lock = threading.Lock()
+        self.options = {name: option[1] for name, option in OPTIONS.items()}
+        self.engine = None
+        self.board = chess.Board()
+        self.search_thread = None
+        self.pondering = False
+        self.ponder_budget = None # time budget to use after a ponder hit
+        self.release = threading.Event() # set when an infinite or ponder search may report its move
+
+    def run(self):
+        """ Process commands until 'quit' or end of input. """
+        for line in self.input_stream:
+            if not self.handle(line.strip()):
+                break
+        self.stop_search()
+        if self.engine is not None:
+            self.engine.close()
+
+    def send(self, message):
+        """ Write a line to the GUI. """
+        with self.output_lock:
+            self.output_stream.write(message + '\n')
+            self.output_stream.flush()
+
+    def create_engine(self):
+        """ (Re)create the engine with the current option values. """
+        if self.engine is not None:
+            self.engine.close()
+        self.engine = NegamaxEngine(opening_book=self.options['OwnBook'], hash_size=self.options['Hash'],
+                                    workers=self.options['Threads'], quiescence=self.options['Quiescence'])
+        self.engine.info_callback = self.send_info
+
+    def handle(self, line) -> bool:
+        """ Handle one command (invalid commands are ignored). Returns False on 'quit'. """
+        tokens = line.split()
+        if not tokens:
+            return True
+        try:
+            return self.handle_command(tokens[0], tokens[1:])
+        except ValueError as error: # e.g. illegal moves, invalid FENs or option values
+            self.send(f'info string ignored {line!r}: {error}')
+            return True
+
+    def handle_command(self, command, args) -> bool:
+        """ Handle one command (see handle). """
+        if command == 'uci':
+            self.send(f'id name {ENGINE_NAME}')
+            self.send(f'id author {ENGINE_AUTHOR}')
+            for name, (kind, default, low, high) in OPTIONS.items():
+                if kind == 'spin':
+                    self.send(f'option name {name} type spin default {default} min {low} max {high}')
+                else:
+                    self.send(f'option name {name} type check default {str(default).lower()}')
+            self.send('uciok')
+        elif command == 'isready':
+            if self.engine is None:
+                self.create_engine()
+            self.send('readyok')
+        elif command == 'setoption':
+            self.set_option(args)
+        elif command == 'ucinewgame':
+            self.stop_search()
+            if self.engine is not None and self.engine.tt is not None:
+                self.engine.tt.clear()
+        elif command == 'position':
+            self.stop_search()
+            self.set_position(args)
+        elif command == 'go':
+            self.stop_search()
+            self.go(args)
+        elif command == 'stop':
+            self.stop_search()
+        elif command == 'ponderhit':
+            self.ponder_hit()
+        elif command == 'quit':
+            return False
+        return True
+
+    def set_option(self, args):
+        """ Handle 'setoption name <name> value <value>'. """
+        if 'name' not in args:
+            return
+        value_index = args.index('value') if 'value' in args else len(args)
+        name = ' '.join(args[args.index('name') + 1:value_index])
+        value = ' '.join(args[value_index + 1:])
+        if name not in OPTIONS:
+            return
+        kind, default, low, high = OPTIONS[name]
+        if kind == 'spin':
+            self.options[name] = min(max(int(value), low), high)
+        else:
+            self.options[name] = value.lower() == 'true'
+        self.stop_search()
+        self.create_engine()
+
+    def set_position(self, args):
+        """ Handle 'position [startpos | fen <fen>] [moves <move1> ...]'. """
+        moves_index = args.index('moves') if 'moves' in args else len(args)
+        if args and args[0] == 'fen':
+            board = chess.Board(' '.join(args[1:moves_index]))
+        else:
+            board = chess.Board()
+        for move in args[moves_index + 1:]:
+            board.push_uci(move)
+        # Only a valid position replaces the current one
+        self.board = board
+
+    def go(self, args):
+        """ Handle 'go' with depth, movetime, wtime/btime/winc/binc/movestogo, infinite and ponder. """
+        if self.engine is None:
+            self.create_engine()
+        params = {}
+        for i, token in enumerate(args):
+            if token in ('depth', 'movetime', 'wtime', 'btime', 'winc', 'binc', 'movestogo') and i + 1 < len(args):
+                params[token] = int(args[i + 1])
+        infinite = 'infinite' in args
+        self.pondering = 'ponder' in args
+
+        # Determine time budget (in seconds) and depth limit
+        budget = None
+        clock = params.get('wtime' if self.board.turn else 'btime')
+        if 'movetime' in params:
+            budget = params['movetime'] / 1000
+        elif clock is not None:
+            increment = params.get('winc' if self.board.turn else 'binc', 0)
+            budget = self.engine.allocate_time(clock / 1000, increment / 1000, params.get('movestogo', 30))
+        max_depth = params.get('depth')
+        if budget is None and max_depth is None and not self.pondering:
+            infinite = True
+
+        # While pondering, search without time limit until 'ponderhit' or 'stop'
+        self.ponder_budget = budget
+        if self.pondering:
+            budget = None
+
+        self.release.clear()
+        if not (infinite or self.pondering):
+            self.release.set()
+        self.engine.stop_requested = False
+        self.engine.set_deadline(None) # forget a ponder hit that arrived after the previous search
+        self.search_thread = threading.Thread(target=self.search, args=(self.board.copy(), budget, max_depth),
+                                              daemon=True)
+        self.search_thread.start()
+
+    def search(self, board, budget, max_depth):
+        """ Run the search (in a background thread) and report the best move. """
+        best_move = None
+        if self.options['OwnBook'] and not self.pondering:
+            best_move = self.engine.resources.book_move(board)
+            if best_move is not None:
+                self.engine.pv = [] # no search ran, the principal variation is from another position
+        if best_move is None:
+            best_move = self.engine.search(board, budget, max_depth or (None if budget is not None else 64))
+        # Infinite and ponder searches report their move only after 'stop' or 'ponderhit'
+        self.release.wait()
+        ponder_move = self.ponder_move(board, best_move)
+        if best_move is None:
+            self.send('bestmove 0000')
+        elif ponder_move is not None:
+            self.send(f'bestmove {best_move.uci()} ponder {ponder_move.uci()}')
+        else:
+            self.send(f'bestmove {best_move.uci()}')
+
+    def ponder_move(self, board, best_move):
+        """ Expected reply to the best move from the principal variation (None if the variation does not start with it). """
+        pv = self.engine.pv
+        if best_move is None or len(pv) < 2 or pv[0] != best_move or pv[1] is None:
+            return None
+        board = board.copy()
+        board.push(best_move)
+        return pv[1] if board.is_legal(pv[1]) else None
+
+    def stop_search(self):
+        """ Stop a running search and wait until its best move is reported. """
+        if self.search_thread is None:
+            return
+        self.engine.stop()
+        self.release.set()
+        self.search_thread.join()
+        self.search_thread = None
+
+    def ponder_hit(self):
+        """ The expected move was played: continue the search with the normal time budget. """
+        if self.search_thread is None or not self.pondering:
+            return
+        self.pondering = False
+        if self.ponder_budget is not None:
+            # Applied even if the search thread has not set up its deadline yet
+            self.engine.set_deadline(self.ponder_budget)
+        self.release.set()
+
+    def send_info(self, info):
+        """ Report a completed iteration ('info depth ... score ... nodes ... nps ... pv ...'). """
+        score = info['score']
+        if abs(score) == float('Inf'):
+            # Moves (not plies) to the checkmate, negative if the engine is mated (the PV may be cut by table hits)
+            mate = ((info.get('mate_plies') or len(info['pv'])) + 1) // 2
+            score_text = f'mate {mate if score > 0 else -mate}'
+        else:
+            score_text = f'cp {int(round(100 * score))}'
+        nps = int(info['nodes'] / max(info['time'], 1e-6))
+        pv = ' '.join(move.uci() for move in info['pv'] if move is not None)
+        self.send('info depth {depth} score {score} nodes {nodes} nps {nps} time {time} pv {pv}'.format(
+            depth=info['depth'], score=score_text, nodes=info['nodes'], nps=nps,
+            time=int(1000 * info['time']), pv=pv))
+
+
+def main():
+    UciInterface().run()
+
+
+if __name__ == '__main__':
+    main()
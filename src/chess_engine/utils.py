@@ -1,4 +1,5 @@
 import chess
+from numba import jit
 import numpy as np
 
 import random
@@ -20,16 +21,46 @@ def find_stoppage_reason(board) -> str:
         return 'resign'
     
 
+def piece_masks(board) -> list:
+    """ Bitboards of the twelve piece kinds (white pawn to king, then black pawn to king). """
+    white = board.occupied_co[chess.WHITE]
+    black = board.occupied_co[chess.BLACK]
+    return [board.pawns & white, board.knights & white, board.bishops & white, 
+            board.rooks & white, board.queens & white, board.kings & white, 
+            board.pawns & black, board.knights & black, board.bishops & black, 
+            board.rooks & black, board.queens & black, board.kings & black]
+
+
+@jit(nopython=True)
+def unpack_piece_masks(masks, numeric_board):
+    """ Write the piece type of each square (negative for black) from the twelve piece bitboards. """
+    for k in range(12):
+        mask = masks[k]
+        code = k + 1 if k < 6 else 5 - k
+        for sq in range(64):
+            if (mask >> np.uint64(sq)) & np.uint64(1):
+                numeric_board[sq] = code
+    return numeric_board
+
+
+@jit(nopython=True)
+def unpack_piece_masks_batch(masks, numeric_boards):
+    """ Unpack the piece bitboards of many boards (N x 12) into an N x 64 array. """
+    for i in range(masks.shape[0]):
+        unpack_piece_masks(masks[i], numeric_boards[i])
+    return numeric_boards
+
+
 def make_board_numeric(board) -> np.array:
     """ Convert the board object to a Numpy array for fast evaluation. """
-    numeric_board = np.zeros(64)
-    # Add white pieces
-    for sq in chess.scan_reversed(board.occupied_co[chess.WHITE]):
-        numeric_board[sq] = board.piece_type_at(sq)
-    # Add black pieces
-    for sq in chess.scan_reversed(board.occupied_co[chess.BLACK]):
-        numeric_board[sq] = -board.piece_type_at(sq)
-    return numeric_board
+    masks = np.array(piece_masks(board), dtype=np.uint64)
+    return unpack_piece_masks(masks, np.zeros(64))
+
+
+def make_boards_numeric(boards) -> np.array:
+    """ Convert many board objects at once to an N x 64 int8 array (piece type, negative for black). """
+    masks = np.array([piece_masks(board) for board in boards], dtype=np.uint64).reshape(-1, 12)
+    return unpack_piece_masks_batch(masks, np.zeros((len(masks), 64), dtype=np.int8))
     
 
 def select_best_move(options) -> chess.Move:
@@ -0,0 +1,5 @@
+# Make the project root importable (tests import the engine as src.chess_engine, like tests.ipynb)
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,84 @@
+import csv
+import json
+
+import chess
+import pytest
+
+from src.chess_engine import NegamaxEngine
+from src.chess_engine.analysis import analyse, count_completed, read_positions
+
+
+EPD = '''rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - id "start";
+6k1/5ppp/8/8/8/8/5PPP/3R2K1 w - - id "mate";
+r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq -
+'''
+SETTINGS = {'depth': 2, 'opening_book': False, 'endgame_table': False}
+
+
+@pytest.fixture
+def epd_path(tmp_path):
+    path = tmp_path / 'positions.epd'
+    path.write_text(EPD)
+    return str(path)
+
+
+def read_csv(path):
+    with open(path, newline='') as f:
+        return list(csv.reader(f))
+
+
+def test_read_positions(epd_path, tmp_path):
+    assert [position_id for position_id, fen in read_positions(epd_path)] == ['start', 'mate', '3']
+    pgn_path = tmp_path / 'game.pgn'
+    pgn_path.write_text('[Result "*"]\n\n1. e4 e5 *\n')
+    positions = list(read_positions(str(pgn_path)))
+    assert [position_id for position_id, fen in positions] == ['1:0', '1:1', '1:2']
+    assert positions[-1][1] == chess.Board('rnbqkbnr/pppp1ppp/8/4p3/4P3/8/PPPP1PPP/RNBQKBNR w KQkq - 0 2').fen()
+
+
+def test_analyse_jsonl(epd_path, tmp_path):
+    output = str(tmp_path / 'analysis.jsonl')
+    summary = analyse(epd_path, output, SETTINGS, verbose=False)
+    assert summary['positions'] == 3
+    with open(output) as f:
+        results = [json.loads(line) for line in f]
+    assert [result['index'] for result in results] == [0, 1, 2]
+    assert results[1]['best_move'] == 'd1d8' and results[1]['score'] == 'mate'
+
+
+def test_resume_jsonl(epd_path, tmp_path):
+    output = tmp_path / 'analysis.jsonl'
+    analyse(epd_path, str(output), SETTINGS, verbose=False)
+    lines = output.read_text().splitlines(keepends=True)
+    # Interrupted while writing the second result
+    output.write_text(lines[0] + lines[1][:20])
+    summary = analyse(epd_path, str(output), SETTINGS, resume=True, verbose=False)
+    assert summary == {**summary, 'positions': 2, 'skipped': 1}
+    assert [json.loads(line)['index'] for line in output.read_text().splitlines()] == [0, 1, 2]
+
+
+@pytest.mark.parametrize('num_done', [0, 1])
+def test_resume_csv(epd_path, tmp_path, num_done):
+    output = tmp_path / 'analysis.csv'
+    analyse(epd_path, str(output), SETTINGS, output_format='csv', verbose=False)
+    rows = read_csv(output)
+    # Keep the header (and the first result)
+    output.write_text(''.join(line + '\r\n' for line in output.read_text().splitlines()[:1 + num_done]))
+    assert count_completed(str(output), 'csv') == num_done
+    analyse(epd_path, str(output), SETTINGS, output_format='csv', resume=True, verbose=False)
+    resumed = read_csv(output)
+    assert resumed[0] == rows[0] == ['index', 'id', 'fen', 'best_move', 'score', 'depth', 'nodes', 'time']
+    assert [row[0] for row in resumed[1:]] == ['0', '1', '2']
+    assert count_completed(str(output), 'csv') == 3
+
+
+def test_new_game_keeps_tt():
+    engine = NegamaxEngine(depth=2, opening_book=False, endgame_table=False)
+    engine.search(chess.Board())
+    engine.update_quiet_cutoff(chess.Board(), chess.Move.from_uci('e2e4'), 1, 2)
+    num_entries = len(engine.tt)
+    engine.new_game(clear_tt=False)
+    assert len(engine.tt) == num_entries > 0
+    assert not engine.killers and not engine.history.any()
+    engine.new_game()
+    assert len(engine.tt) == 0
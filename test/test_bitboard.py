@@ -0,0 +1,114 @@
+import random
+
+import chess
+import numpy as np
+import pytest
+
+from src.chess_engine import NegamaxEngine, bitboard
+from src.chess_engine.benchmark import POSITIONS
+from src.chess_engine.evaluation import request_evaluation
+
+
+PERFT_CASES = [(name, fen, depth, count) for name, (fen, counts) in POSITIONS.items()
+               for depth, count in enumerate(counts[:3], 1)]
+
+
+def numba_is_draw(board) -> bool:
+    """ Draw detection of the numba backend for a single position (without earlier positions). """
+    bb, squares, state = bitboard.board_to_arrays(board)
+    hashes = np.array([state[bitboard.HASH]], dtype=np.int64)
+    moves = np.zeros(bitboard.MAX_MOVES, dtype=np.int64)
+    undo = np.zeros(6, dtype=np.int64)
+    return bitboard.is_draw(bb, squares, state, hashes, moves, undo, 0)
+
+
+def searched(board, **kwargs):
+    """ Evaluation and best move of a fixed-depth search without book and tablebases. """
+    engine = NegamaxEngine(opening_book=False, endgame_table=False, **kwargs)
+    move = engine.search(board)
+    return engine.evaluation, move
+
+
+@pytest.mark.parametrize('name,fen,depth,count', PERFT_CASES)
+def test_perft(name, fen, depth, count):
+    board = chess.Board(fen)
+    assert bitboard.perft(board, depth) == count
+    assert board.fen() == fen # the board is not changed
+
+
+def test_perft_deeper():
+    fen, counts = POSITIONS['kiwipete']
+    assert bitboard.perft(chess.Board(fen), 4) == counts[3]
+
+
+def test_incremental_state():
+    # The numba backend updates material and hash on make/unmake, compare with a conversion from scratch
+    rng = random.Random(2)
+    undo = np.zeros((bitboard.MAX_PLY, 6), dtype=np.int64)
+    for i in range(5):
+        board = chess.Board()
+        bb, squares, state = bitboard.board_to_arrays(board)
+        codes = []
+        while not board.is_game_over() and len(codes) < bitboard.MAX_PLY - 1:
+            move = rng.choice(list(board.legal_moves))
+            codes.append(bitboard.encode_move(board, move))
+            bitboard.make_move(bb, squares, state, undo[len(codes)], codes[-1])
+            board.push(move)
+            expected_bb, expected_squares, expected_state = bitboard.board_to_arrays(board)
+            assert state[bitboard.MATERIAL] == request_evaluation(board)
+            assert state[bitboard.HASH] == expected_state[bitboard.HASH]
+            assert np.array_equal(bb, expected_bb) and np.array_equal(squares, expected_squares)
+        while codes:
+            bitboard.unmake_move(bb, squares, state, undo[len(codes)], codes.pop())
+        assert np.array_equal(state, bitboard.board_to_arrays(chess.Board())[2])
+
+
+@pytest.mark.parametrize('fen,draw', [
+    ('8/8/4k3/8/8/3K4/8/8 w - - 0 1', True), # kings only
+    ('8/8/4k3/8/8/3K4/8/6N1 w - - 0 1', True), # single knight
+    ('8/8/4k3/8/8/3K4/8/5B2 w - - 0 1', True), # single bishop
+    ('8/8/4k3/3b4/8/3K4/8/5B2 w - - 0 1', True), # bishops on light squares
+    ('8/8/4k3/2b5/8/3K4/8/5B2 w - - 0 1', False), # bishops on different colours
+    ('8/8/4k3/8/8/3K4/8/2B2B2 w - - 0 1', False), # bishop pair
+    ('8/8/1b2k3/8/8/3K4/8/2B3B1 w - - 0 1', True), # three bishops on dark squares
+    ('8/8/4k3/8/8/3K4/8/5NN1 w - - 0 1', False), # two knights
+    ('8/8/4k1n1/8/8/3K4/8/6N1 w - - 0 1', False), # knight against knight
+    ('8/8/4k3/8/8/3K4/8/5BN1 w - - 0 1', False), # bishop and knight
+    ('8/8/4k1b1/8/8/3K4/8/6N1 w - - 0 1', False), # knight against bishop
+    ('8/8/4k3/8/8/3K4/4P3/8 w - - 0 1', False), # pawn
+    ('8/8/4k3/8/8/3K4/8/4R3 w - - 0 1', False), # rook
+    ])
+def test_insufficient_material(fen, draw):
+    board = chess.Board(fen)
+    assert board.is_insufficient_material() == draw
+    assert numba_is_draw(board) == draw
+
+
+def test_insufficient_material_matches_python_chess():
+    # Kings with random sets of minor pieces (and occasionally a pawn) on random squares
+    rng = random.Random(4)
+    for i in range(2000):
+        board = chess.Board(None)
+        squares = rng.sample(range(8, 56), 8)
+        board.set_piece_at(squares.pop(), chess.Piece(chess.KING, chess.WHITE))
+        board.set_piece_at(squares.pop(), chess.Piece(chess.KING, chess.BLACK))
+        for sq in squares[:rng.randint(0, 4)]:
+            piece_type = rng.choice([chess.KNIGHT, chess.BISHOP, chess.BISHOP, chess.PAWN] if i % 4 == 0
+                                    else [chess.KNIGHT, chess.BISHOP, chess.BISHOP])
+            board.set_piece_at(sq, chess.Piece(piece_type, rng.random() < 0.5))
+        assert numba_is_draw(board) == board.is_insufficient_material(), board.fen()
+
+
+@pytest.mark.parametrize('fen', [fen for fen, counts in POSITIONS.values()]
+                         + ['8/8/4k3/2b5/8/3K4/8/5B2 w - - 0 1', '8/8/4k3/3b4/8/3K4/8/5B2 w - - 0 1'])
+def test_backends_agree(fen):
+    board = chess.Board(fen)
+    python_evaluation, python_move = searched(board, depth=2, transposition_table=False)
+    numba_evaluation, numba_move = searched(board, depth=2, backend='numba')
+    assert numba_evaluation == python_evaluation
+
+
+def test_mate_in_one():
+    evaluation, move = searched(chess.Board('6k1/5ppp/8/8/8/8/5PPP/3R2K1 w - - 0 1'), depth=2, backend='numba')
+    assert move == chess.Move.from_uci('d1d8')
+    assert evaluation == float('Inf')
@@ -0,0 +1,131 @@
+import random
+
+import chess
+import numpy as np
+import pytest
+
+from src.chess_engine import benchmark
+from src.chess_engine.benchmark import POSITIONS, bytes_allocated
+from src.chess_engine.evaluation import (IncrementalEvaluation, ScratchEvaluation, TaperedEvaluation,
+                                         request_evaluation, request_evaluation_nonumba, request_evaluations)
+from src.chess_engine.utils import make_board_numeric, make_boards_numeric
+
+
+def random_positions(seed, num_games=20, max_plies=200):
+    """ Boards of random games (including captures, promotions, en passant and castling). """
+    rng = random.Random(seed)
+    boards = []
+    for i in range(num_games):
+        board = chess.Board()
+        for ply in range(max_plies):
+            if board.is_game_over():
+                break
+            board.push(rng.choice(list(board.legal_moves)))
+            boards.append(board.copy(stack=False))
+    return boards
+
+
+@pytest.mark.parametrize('fen', [fen for fen, counts in POSITIONS.values()])
+def test_evaluations_agree(fen):
+    board = chess.Board(fen)
+    expected = request_evaluation_nonumba(board)
+    assert request_evaluation(board) == expected
+    assert ScratchEvaluation().evaluate(board) == expected
+    evaluator = IncrementalEvaluation()
+    evaluator.reset(board)
+    assert evaluator.evaluate() == expected
+
+
+def test_board_encoding():
+    boards = random_positions(seed=6, num_games=3)
+    for board in boards:
+        expected = [0 if board.piece_at(sq) is None else
+                    board.piece_type_at(sq) * (1 if board.color_at(sq) else -1) for sq in range(64)]
+        assert make_board_numeric(board).tolist() == expected
+    assert np.array_equal(make_boards_numeric(boards), np.array([make_board_numeric(board) for board in boards]))
+
+
+def test_batch_evaluation():
+    boards = random_positions(seed=0, num_games=5)
+    expected = [request_evaluation(board) for board in boards]
+    assert request_evaluations(boards).tolist() == expected
+    # Numeric boards are accepted as well
+    assert request_evaluations(make_boards_numeric(boards)).tolist() == expected
+    assert request_evaluations([]).tolist() == []
+
+
+def test_scratch_evaluation_reuses_buffer():
+    # One evaluator for all positions, pieces on h8 set the top bit of the bitboards
+    scratch = ScratchEvaluation()
+    boards = random_positions(seed=3) + [chess.Board('6qk/8/8/8/8/8/8/K5RR w - - 0 1')]
+    for board in boards:
+        assert scratch.evaluate(board) == request_evaluation(board)
+
+
+def test_scratch_evaluation_allocation():
+    # Only the transient unboxing of the reused int8 board remains (no Python ints or arrays per leaf)
+    scratch = ScratchEvaluation()
+    board = chess.Board(POSITIONS['kiwipete'][0])
+    assert bytes_allocated(scratch.evaluate, board) <= 64
+
+
+def test_incremental_matches_full_evaluation():
+    # Follow random games move by move, then take all moves back
+    rng = random.Random(1)
+    evaluator = IncrementalEvaluation()
+    num_special = 0
+    for i in range(30):
+        board = chess.Board()
+        evaluator.reset(board)
+        scores = [evaluator.evaluate()]
+        while not board.is_game_over() and len(board.move_stack) < 300:
+            move = rng.choice(list(board.legal_moves))
+            num_special += bool(move.promotion) or board.is_en_passant(move)
+            evaluator.push(board, move)
+            assert evaluator.evaluate() == request_evaluation(board)
+            scores.append(evaluator.evaluate())
+        while board.move_stack:
+            scores.pop()
+            evaluator.pop(board)
+            assert evaluator.evaluate() == scores[-1]
+        assert evaluator.evaluate() == 0
+    assert num_special > 0 # promotions and en passant captures were covered
+
+
+def test_incremental_null_move():
+    board = chess.Board(POSITIONS['kiwipete'][0])
+    evaluator = IncrementalEvaluation()
+    evaluator.reset(board)
+    evaluator.push(board, chess.Move.null())
+    assert evaluator.evaluate() == request_evaluation(board)
+    evaluator.pop(board)
+    assert board.fen() == POSITIONS['kiwipete'][0]
+
+
+def test_tapered_evaluation_is_symmetric():
+    tapered = TaperedEvaluation()
+    assert tapered.evaluate(chess.Board()) == 0
+    for board in random_positions(seed=5, num_games=5):
+        assert tapered.evaluate(board.mirror()) == pytest.approx(-tapered.evaluate(board))
+
+
+def test_tapered_evaluation_phases():
+    tapered = TaperedEvaluation()
+    # Same material, a central knight is better than one on the rim
+    assert tapered.evaluate(chess.Board('4k3/8/8/8/3N4/8/8/4K3 w - - 0 1')) > 3 > \
+        tapered.evaluate(chess.Board('4k3/8/8/8/8/8/8/N3K3 w - - 0 1'))
+    # Without pieces the endgame table applies: the central king is better
+    assert tapered.evaluate(chess.Board('7k/8/8/8/3K4/8/8/8 w - - 0 1')) > 0
+    # With all pieces on the board the middlegame table applies: the central king is worse
+    assert tapered.evaluate(chess.Board('rnbqkbnr/pppppppp/8/8/3K4/8/PPPPPPPP/RNBQ1BNR w kq - 0 1')) < 0
+
+
+def test_bench_evaluation_compares_with_default():
+    results = benchmark.bench_evaluation(100, ['kiwipete'])
+    entries = {result['evaluator']: result for result in results}
+    assert benchmark.default_evaluator() == 'incremental' # NegamaxEngine evaluates incrementally by default
+    tapered = entries['tapered_pst']
+    assert tapered['default_evaluator'] == 'incremental'
+    expected = entries['incremental']['evals_per_sec'] / tapered['evals_per_sec']
+    assert tapered['cost_vs_default'] == pytest.approx(expected, rel=0.01)
+    assert tapered['within_budget'] == (tapered['cost_vs_default'] <= benchmark.EVAL_COST_BUDGET)
@@ -0,0 +1,122 @@
+import json
+
+import chess
+import chess.pgn
+import pytest
+
+from src.chess_engine import NegamaxEngine, SimpleEngine
+from src.chess_engine.game_formats import PgnArchive, game, match, truncate_incomplete_game
+
+
+class ResigningEngine:
+    """ Player that resigns on its first move. """
+
+    def make_move(self, board):
+        return 'resign'
+
+    def __str__(self):
+        return 'resigningEngine'
+
+
+def read_games(path):
+    """ Round, result and number of moves of all games in a PGN file. """
+    games = []
+    with open(path, newline='') as f:
+        while True:
+            game = chess.pgn.read_game(f)
+            if game is None:
+                return games
+            games.append((game.headers['Round'], game.headers['Result'], len(list(game.mainline_moves()))))
+
+
+@pytest.fixture
+def archive_path(tmp_path):
+    """ Archive with three finished games. """
+    path = str(tmp_path / 'games.pgn')
+    with PgnArchive(path) as archive:
+        match(SimpleEngine('attacking'), SimpleEngine('random'), 3, verbose=False, archive=archive)
+    return path
+
+
+def play_resumed(path, num_games=3):
+    with PgnArchive(path, resume=True) as archive:
+        archived = sorted(game_round for white, black, game_round in archive.archived)
+        result = match(SimpleEngine('attacking'), SimpleEngine('random'), num_games, verbose=False, archive=archive)
+    return archived, result
+
+
+def test_archive_uses_lf(archive_path):
+    with open(archive_path, 'rb') as f:
+        data = f.read()
+    assert b'\r' not in data
+    assert data.endswith(b'\n\n')
+
+
+def test_resume_complete_archive(archive_path):
+    games = read_games(archive_path)
+    archived, result = play_resumed(archive_path)
+    assert archived == ['1', '2', '3']
+    assert sum(result['results'].values()) == 3
+    assert read_games(archive_path) == games # nothing was played again
+
+
+def test_resume_truncates_incomplete_game(archive_path):
+    games = read_games(archive_path)
+    with open(archive_path) as f:
+        data = f.read()
+    last_game = data.rindex('[Event')
+    with open(archive_path, 'w') as f:
+        f.write(data[:last_game + (len(data) - last_game) // 2])
+    archived, result = play_resumed(archive_path)
+    assert archived == ['1', '2']
+    assert read_games(archive_path)[:2] == games[:2]
+    assert [game[0] for game in read_games(archive_path)] == ['1', '2', '3']
+
+
+def test_resume_crlf_archive(archive_path):
+    with open(archive_path, 'rb') as f:
+        data = f.read()
+    with open(archive_path, 'wb') as f:
+        f.write(data.replace(b'\n', b'\r\n'))
+    assert not truncate_incomplete_game(archive_path)
+    archived, result = play_resumed(archive_path, 4)
+    assert archived == ['1', '2', '3']
+    assert [game[0] for game in read_games(archive_path)] == ['1', '2', '3', '4']
+
+
+@pytest.mark.parametrize('ending', ['\n', ''])
+def test_resume_game_without_empty_line(archive_path, ending):
+    # Last game written by another tool (one or no newline after the result)
+    with open(archive_path) as f:
+        data = f.read()
+    with open(archive_path, 'w') as f:
+        f.write(data.rstrip() + ending)
+    assert not truncate_incomplete_game(archive_path)
+    archived, result = play_resumed(archive_path, 4)
+    assert archived == ['1', '2', '3']
+    assert [game[0] for game in read_games(archive_path)] == ['1', '2', '3', '4']
+
+
+def test_truncate_only_incomplete_game(tmp_path):
+    path = tmp_path / 'partial.pgn'
+    path.write_text('[Event "?"]\n[Result "1-0"]\n\n1. e4 e5 2. Qh5')
+    assert truncate_incomplete_game(str(path))
+    assert path.read_text() == ''
+
+
+def test_profiler_records_kept_without_profile_path():
+    engine = NegamaxEngine(depth=1, opening_book=False, endgame_table=False, profile=True)
+    board = game(engine, ResigningEngine(), verbose=False)
+    assert board.result(claim_draw=True) == '*' # black resigned
+    assert len(engine.profiler.moves) == 1
+    game(engine, ResigningEngine(), verbose=False)
+    assert engine.profiler.game_summary()['num_moves'] == 2
+
+
+def test_profile_summary_written(tmp_path):
+    path = tmp_path / 'profile.jsonl'
+    engine = NegamaxEngine(depth=1, opening_book=False, endgame_table=False, profile=True)
+    game(engine, ResigningEngine(), verbose=False, profile_path=str(path))
+    summary = json.loads(path.read_text())
+    assert summary['white']['num_moves'] == 1 and 'black' not in summary
+    assert engine.profiler.moves == []
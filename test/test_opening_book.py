@@ -0,0 +1,112 @@
+import os
+import random
+
+import chess
+import chess.pgn
+import chess.polyglot
+import pytest
+
+from src.chess_engine.benchmark import POSITIONS
+from src.chess_engine.opening_book import (IndexedBook, build_book, decode_polyglot_move, encode_polyglot_move,
+                                           polyglot_hash)
+
+
+def positions(seed=0, num_games=10):
+    """ Benchmark positions and positions of random games. """
+    boards = [chess.Board(fen) for fen, counts in POSITIONS.values()]
+    rng = random.Random(seed)
+    for i in range(num_games):
+        board = chess.Board()
+        while not board.is_game_over() and len(board.move_stack) < 150:
+            board.push(rng.choice(list(board.legal_moves)))
+            boards.append(board.copy())
+    return boards
+
+
+def test_polyglot_hash():
+    for board in positions():
+        assert polyglot_hash(board) == chess.polyglot.zobrist_hash(board)
+
+
+@pytest.mark.parametrize('fen,castling,promotion', [
+    (POSITIONS['kiwipete'][0], True, False),
+    ('n1n5/PPPk4/8/8/8/8/4Kppp/5N1N w - - 0 1', False, True),
+    ('n1n5/PPPk4/8/8/8/8/4Kppp/5N1N b - - 0 1', False, True),
+    (POSITIONS['position5'][0], True, True),
+    ('r3k2r/8/8/8/8/8/8/R3K2R b KQkq - 0 1', True, False),
+    ])
+def test_move_round_trip(fen, castling, promotion):
+    board = chess.Board(fen)
+    moves = list(board.legal_moves)
+    assert any(board.is_castling(move) for move in moves) == castling
+    assert any(move.promotion for move in moves) == promotion
+    for move in moves:
+        raw_move = encode_polyglot_move(board, move)
+        assert decode_polyglot_move(board, raw_move) == move
+        # Castling is encoded as king takes rook
+        if board.is_castling(move):
+            assert chess.BB_SQUARES[raw_move & 63] & board.rooks
+
+
+def test_round_trip_random_games():
+    for board in positions(seed=1):
+        for move in board.legal_moves:
+            assert decode_polyglot_move(board, encode_polyglot_move(board, move)) == move
+
+
+@pytest.fixture
+def book_path(tmp_path):
+    """ Book built from random games with decided results. """
+    rng = random.Random(2)
+    pgn_path = tmp_path / 'games.pgn'
+    with open(pgn_path, 'w') as f:
+        for i in range(60):
+            board = chess.Board()
+            for ply in range(8):
+                moves = sorted(board.legal_moves, key=str)[:3] # few moves, so that positions repeat
+                board.push(rng.choice(moves))
+            game = chess.pgn.Game.from_board(board)
+            game.headers['Result'] = rng.choice(['1-0', '0-1', '1/2-1/2'])
+            f.write(str(game) + '\n\n')
+    path = str(tmp_path / 'book.bin')
+    stats = build_book([str(pgn_path)], path, max_ply=8, min_games=2)
+    assert stats['games'] == 60
+    assert stats['entries'] > 0
+    return path
+
+
+def test_indexed_book_matches_polyglot_reader(book_path):
+    book = IndexedBook(book_path)
+    num_found = 0
+    with chess.polyglot.open_reader(book_path) as reader:
+        for board in positions(seed=3, num_games=5) + [chess.Board()]:
+            expected = sorted((entry.move.uci(), entry.weight) for entry in reader.find_all(board))
+            found = sorted((entry.move.uci(), entry.weight) for entry in book.find_all(board))
+            assert found == expected
+            num_found += bool(found)
+        board = chess.Board()
+        assert book.weighted_choice(board, random=random.Random(0)).move in [entry.move for entry in reader.find_all(board)]
+    assert num_found > 0
+    book.close()
+
+
+def test_out_of_book(book_path):
+    book = IndexedBook(book_path)
+    with pytest.raises(IndexError):
+        book.weighted_choice(chess.Board(POSITIONS['kiwipete'][0]))
+
+
+def test_index_file(book_path):
+    book = IndexedBook(book_path)
+    index_path = book_path + '.index.npy'
+    assert os.path.isfile(index_path)
+    assert not book.keys.flags.writeable # memory-mapped read-only
+    assert list(book.keys) == sorted(book.keys)
+    modified = os.path.getmtime(index_path)
+    assert len(IndexedBook(book_path)) == len(book)
+    assert os.path.getmtime(index_path) == modified # reused, not rewritten
+    # An index older than the book is rewritten
+    os.utime(index_path, (modified - 10, modified - 10))
+    assert len(IndexedBook(book_path)) == len(book)
+    assert os.path.getmtime(index_path) > modified - 10
+    book.close()
@@ -0,0 +1,30 @@
+import chess
+import pytest
+
+from src.chess_engine import benchmark
+from src.chess_engine.benchmark import POSITIONS, perft_python
+
+
+CASES = [(name, fen, depth, count) for name, (fen, counts) in POSITIONS.items()
+         for depth, count in enumerate(counts[:3], 1)]
+
+
+@pytest.mark.parametrize('name,fen,depth,count', CASES)
+def test_perft_python(name, fen, depth, count):
+    board = chess.Board(fen)
+    assert perft_python(board, depth) == count
+    assert board.fen() == fen
+
+
+def test_bench_perft():
+    results = benchmark.bench_perft(2, 1)
+    assert all(result['correct'] for result in results)
+    assert {(result['generator'], result['depth']) for result in results} == \
+        {('python-chess', 1), ('numba', 1), ('numba', 2)}
+
+
+def test_bench_search():
+    results = benchmark.bench_search(['NegamaxEngine', 'NegamaxEngine_numba'], 2, ['start'], memory=False)
+    for result in results:
+        assert chess.Move.from_uci(result['move']) in chess.Board().legal_moves
+        assert result['nodes'] > 20 and result['depth'] == 2
@@ -0,0 +1,70 @@
+import builtins
+
+import chess
+import pytest
+
+from src.chess_engine import NegamaxEngine, setup_game
+from src.chess_engine.player_human import HumanPlayer
+
+
+def pondering_engine():
+    """ Engine with a time budget, so the background search runs until it is stopped. """
+    return NegamaxEngine(move_time=0.05, ponder=True, opening_book=False, endgame_table=False)
+
+
+def test_ponder_hit():
+    engine = pondering_engine()
+    board = chess.Board()
+    engine.make_move(board)
+    assert engine.ponder_thread is not None
+    board = engine.ponder_board.copy() # after the move and the expected reply
+    reply = engine.make_move(board)
+    assert engine.num_ponder_hits == 1 and engine.num_ponder_misses == 0
+    assert reply in board.legal_moves
+    engine.close()
+
+
+def test_ponder_miss():
+    engine = pondering_engine()
+    board = chess.Board()
+    engine.make_move(board)
+    board = engine.ponder_board.copy()
+    expected_reply = board.pop()
+    board.push(next(reply for reply in board.legal_moves if reply != expected_reply))
+    assert engine.make_move(board) in board.legal_moves
+    assert engine.num_ponder_hits == 0 and engine.num_ponder_misses == 1
+    engine.close()
+
+
+def test_search_while_pondering_raises():
+    engine = pondering_engine()
+    board = chess.Board()
+    engine.make_move(board)
+    assert engine.ponder_thread.is_alive()
+    with pytest.raises(Exception, match='pondering'):
+        engine.search(board, max_depth=1)
+    assert engine.stop_pondering() is None
+    assert engine.search(board, max_depth=1) in board.legal_moves
+    engine.make_move(board)
+    engine.new_game() # stops the background search
+    assert engine.ponder_thread is None
+    engine.close()
+
+
+def test_no_ponder_after_book_move():
+    engine = NegamaxEngine(depth=1, ponder=True, endgame_table=False)
+    engine.make_move(chess.Board())
+    assert engine.ponder_thread is None
+    engine.close()
+
+
+@pytest.mark.parametrize('answers,ponder', [
+    (['4', '2', '2', '1', '2'], True), # NegamaxEngine at depth 2, human plays black
+    (['2', '1', '1', '2'], None), # AttackingEngine, human plays white
+    ])
+def test_setup_game_ponders_against_human(monkeypatch, answers, ponder):
+    answers = iter(answers)
+    monkeypatch.setattr(builtins, 'input', lambda *args: next(answers))
+    white, black = setup_game()
+    engine = white if isinstance(black, HumanPlayer) else black
+    assert getattr(engine, 'ponder', None) is ponder
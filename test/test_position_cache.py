@@ -0,0 +1,124 @@
+import itertools
+import pickle
+import random
+
+import chess
+import pytest
+
+from src.chess_engine import NegamaxEngine, position_cache
+from src.chess_engine.position_cache import PositionCache, position_key
+
+
+E4 = chess.Move.from_uci('e2e4')
+D4 = chess.Move.from_uci('d2d4')
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """ Strictly increasing time.time() of the cache (entries are ordered by last use). """
+    ticks = itertools.count(1_000_000)
+    monkeypatch.setattr(position_cache.time, 'time', lambda: float(next(ticks)))
+
+
+def positions(n):
+    """ n different positions of a random game. """
+    rng = random.Random(0)
+    board = chess.Board()
+    boards = []
+    while len(boards) < n:
+        board.push(rng.choice(list(board.legal_moves)))
+        boards.append(board.copy())
+    return boards
+
+
+def test_store_and_probe(tmp_path):
+    cache = PositionCache(str(tmp_path / 'cache.db'))
+    board = chess.Board()
+    assert cache.probe(board, 1) is None
+    cache.store(board, 3, E4, 0.5)
+    assert cache.probe(board, 3) == (E4, 0.5, 3)
+    assert cache.probe(board, 2) == (E4, 0.5, 3) # a deeper result serves shallower requests
+    assert cache.probe(board, 4) is None
+    assert cache.probe(board, 3, engine='other settings') is None
+    assert (cache.num_probes, cache.num_hits, cache.num_stores) == (5, 2, 1)
+
+
+def test_deepest_result_is_kept(tmp_path):
+    cache = PositionCache(str(tmp_path / 'cache.db'))
+    board = chess.Board()
+    cache.store(board, 4, E4, 0.5)
+    cache.store(board, 2, D4, 0.0)
+    assert cache.probe(board, 1) == (E4, 0.5, 4)
+    cache.store(board, 5, D4, 0.25)
+    assert cache.probe(board, 1) == (D4, 0.25, 5)
+    assert len(cache) == 1
+
+
+def test_least_recently_used_are_evicted(tmp_path, clock):
+    cache = PositionCache(str(tmp_path / 'cache.db'), max_entries=10)
+    boards = positions(15)
+    for board in boards[:10]:
+        cache.store(board, 1, next(iter(board.legal_moves)), 0.0)
+    cache.probe(boards[0], 1) # used again: now the most recently used entry
+    for board in boards[10:]:
+        cache.store(board, 1, next(iter(board.legal_moves)), 0.0)
+    kept = [cache.probe(board, 1) is not None for board in boards]
+    assert len(cache) <= 10
+    assert kept[0] and all(kept[10:]) # the recently used entries survive
+    assert not kept[1] # the oldest unused entry is gone
+
+
+def test_old_entries_are_removed_on_open(tmp_path, clock):
+    path = str(tmp_path / 'cache.db')
+    cache = PositionCache(path)
+    old, recent = positions(2)
+    cache.store(old, 1, next(iter(old.legal_moves)), 0.0)
+    for i in range(100):
+        cache.store(recent, 1, next(iter(recent.legal_moves)), 0.0)
+    cache.close()
+    cache = PositionCache(path, max_age=50)
+    assert cache.probe(old, 1) is None and cache.probe(recent, 1) is not None
+
+
+def test_read_only(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    missing = PositionCache(path, read_only=True)
+    assert missing.probe(chess.Board(), 1) is None and len(missing) == 0
+    assert not (tmp_path / 'cache.db').exists()
+    writer = PositionCache(path)
+    writer.store(chess.Board(), 2, E4, 0.5)
+    reader = PositionCache(path, read_only=True)
+    reader = pickle.loads(pickle.dumps(reader)) # as sent to a worker process
+    assert reader.probe(chess.Board(), 2) == (E4, 0.5, 2)
+    reader.store(chess.Board(), 5, D4, 1.0) # ignored
+    assert writer.probe(chess.Board(), 2) == (E4, 0.5, 2)
+
+
+def test_illegal_move_is_a_miss(tmp_path):
+    # A stored move that is illegal in the probed position means a hash collision
+    cache = PositionCache(str(tmp_path / 'cache.db'))
+    board = chess.Board()
+    cache.store(board, 2, chess.Move.from_uci('e2e5'), 0.0)
+    assert cache.probe(board, 1) is None
+
+
+def test_position_key_range():
+    boards = positions(10)
+    assert all(-2**63 <= position_key(board) < 2**63 for board in boards)
+    assert len({position_key(board) for board in boards}) == 10
+
+
+def test_engine_uses_cache(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    board = chess.Board('r1bqkb1r/pppp1ppp/2n2n2/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4')
+    engine = NegamaxEngine(depth=3, opening_book=False, endgame_table=False, cache_path=path)
+    move = engine.make_move(board)
+    evaluation = engine.evaluation
+    engine = NegamaxEngine(depth=3, opening_book=False, endgame_table=False, cache_path=path, cache_read_only=True)
+    assert engine.make_move(board) == move and engine.evaluation == evaluation
+    assert engine.cache.num_hits == 1 and engine.num_nodes == 0
+    # Deeper searches and other settings do not use the result
+    for settings in ({'depth': 4}, {'depth': 3, 'quiescence': True}):
+        engine = NegamaxEngine(opening_book=False, endgame_table=False, cache_path=path, **settings)
+        engine.make_move(board)
+        assert engine.cache.num_hits == 0 and engine.num_nodes > 0
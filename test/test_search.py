@@ -0,0 +1,257 @@
+import random
+import time
+
+import chess
+import pytest
+
+from src.chess_engine import NegamaxEngine
+from src.chess_engine.benchmark import POSITIONS
+from src.chess_engine.engine_negamax import MATE
+from src.chess_engine.evaluation import request_evaluation
+
+
+FENS = [fen for name, (fen, counts) in POSITIONS.items()]
+MATE_IN_ONE = '6k1/5ppp/8/8/8/8/5PPP/3R2K1 w - - 0 1'
+
+
+def searched(board, **kwargs):
+    """ Evaluation and best move of a fixed-depth search without book and tablebases. """
+    engine = NegamaxEngine(opening_book=False, endgame_table=False, **kwargs)
+    move = engine.search(board)
+    return engine.evaluation, move
+
+
+@pytest.mark.parametrize('fen', FENS)
+def test_incremental_evaluation_search(fen):
+    board = chess.Board(fen)
+    assert searched(board, depth=2, incremental_eval=True) == searched(board, depth=2, incremental_eval=False)
+    assert board.fen() == fen
+
+
+@pytest.mark.parametrize('backend', ['python', 'numba'])
+def test_max_depth(backend):
+    engine = NegamaxEngine(depth=5, opening_book=False, endgame_table=False, backend=backend)
+    engine.search(chess.Board(), max_depth=2)
+    assert engine.completed_depth == 2
+
+
+@pytest.mark.parametrize('backend', ['python', 'numba'])
+def test_time_budget(backend):
+    engine = NegamaxEngine(opening_book=False, endgame_table=False, backend=backend)
+    board = chess.Board(POSITIONS['kiwipete'][0])
+    engine.search(board, max_depth=1) # compile the numba search outside the measurement
+    start = time.perf_counter()
+    move = engine.search(board, budget=0.3)
+    assert time.perf_counter() - start < 0.6
+    assert move in board.legal_moves and engine.completed_depth >= 1
+    assert board.fen() == POSITIONS['kiwipete'][0]
+
+
+def test_time_control_from_clock():
+    engine = NegamaxEngine(opening_book=False, endgame_table=False, move_time=2)
+    assert engine.allocate_time() == 2
+    assert engine.allocate_time(60, 1) == 60 / 30 + 1
+    assert engine.allocate_time(1, 5) == 0.5 # never more than half of the clock
+
+
+def test_aborted_iteration_is_rolled_back():
+    # Stop in the middle of the third iteration, deep inside the tree
+    fen = POSITIONS['kiwipete'][0]
+    board = chess.Board(fen)
+    engine = NegamaxEngine(opening_book=False, endgame_table=False)
+    iterations = []
+    engine.info_callback = lambda info: iterations.append((info['depth'], info['score'], list(info['pv'])))
+    evaluate = engine.evaluate
+    leaf_plies = [] # length of the move stack at the leaves of the third iteration
+    def stop_during_third_iteration(board, color):
+        if engine.completed_depth == 2:
+            leaf_plies.append(len(board.move_stack))
+            if len(leaf_plies) == 500:
+                engine.stop()
+        return evaluate(board, color)
+    engine.evaluate = stop_during_third_iteration
+    move = engine.search(board, max_depth=5)
+    assert [depth for depth, score, pv in iterations] == [1, 2]
+    assert leaf_plies[-1] == 3
+    depth, score, pv = iterations[-1]
+    assert engine.completed_depth == 2 and engine.pv == pv and move == pv[0]
+    assert engine.evaluation == score
+    # The board and the incremental evaluation are back at the root
+    assert board.fen() == fen and not board.move_stack
+    assert engine.evaluator.evaluate() == request_evaluation(board)
+
+
+def quiescence(fen, alpha=float('-Inf'), beta=float('Inf'), **kwargs):
+    """ Quiescence score of a position (from the side to move) and the engine that searched it. """
+    board = chess.Board(fen)
+    engine = NegamaxEngine(opening_book=False, endgame_table=False, quiescence=True, **kwargs)
+    engine.root_ply = 0
+    engine.evaluator.reset(board)
+    score = engine.quiescence_search(board, 1 if board.turn else -1, alpha, beta, 0)
+    assert board.fen() == fen
+    return score, engine
+
+
+def test_quiescence_avoids_defended_capture():
+    # The pawn on d5 is defended: the queen capture only looks good without resolving the recapture
+    board = chess.Board('k7/8/4p3/3p4/8/8/8/K2Q4 w - - 0 1')
+    assert searched(board, depth=1)[1] == chess.Move.from_uci('d1d5')
+    assert searched(board, depth=1, quiescence=True)[1] != chess.Move.from_uci('d1d5')
+
+
+def test_quiescence_quiet_position():
+    score, engine = quiescence(POSITIONS['start'][0])
+    assert score == 0 and engine.num_qnodes == 1
+
+
+def test_quiescence_stand_pat_cutoff():
+    # A queen against a pawn it can capture: the static evaluation already reaches beta
+    score, engine = quiescence('k7/8/8/3p4/8/8/8/K2Q4 w - - 0 1', -1, 1)
+    assert score == 8 and engine.num_qnodes == 1
+    # With a full window the capture is searched
+    score, engine = quiescence('k7/8/8/3p4/8/8/8/K2Q4 w - - 0 1')
+    assert score == 9 and engine.num_qnodes > 1
+
+
+def test_quiescence_in_check():
+    # All evasions are searched, checkmate is detected inside the quiescence search
+    score, engine = quiescence('3R2k1/5ppp/8/8/8/8/5PPP/6K1 b - - 0 1')
+    assert score == -MATE
+
+
+def test_quiescence_checks():
+    score, engine = quiescence(MATE_IN_ONE)
+    assert score == 5
+    score, engine = quiescence(MATE_IN_ONE, quiescence_checks=True)
+    assert score == MATE - 1
+
+
+def test_staged_move_order():
+    board = chess.Board(POSITIONS['kiwipete'][0])
+    engine = NegamaxEngine(opening_book=False, endgame_table=False)
+    pv_move, tt_move, killer = (chess.Move.from_uci(uci) for uci in ('e2a6', 'd5d6', 'a2a3'))
+    engine.killers[2] = [killer, chess.Move.from_uci('f3h3')] # quiet killer and a capture (searched as capture)
+    engine.history[1, chess.G2, chess.G3] = 100
+    moves = list(engine.order_moves(board, 2, pv_move, tt_move))
+    assert sorted(moves, key=str) == sorted(board.legal_moves, key=str)
+    assert moves[:2] == [pv_move, tt_move]
+    captures = moves[2:2 + len(engine.generate_captures(board)) - 1] # without the pv move
+    assert all(board.is_capture(move) for move in captures)
+    victims = [engine.captured_value(board, move) for move in captures]
+    assert victims == sorted(victims, reverse=True)
+    assert moves[len(captures) + 2:len(captures) + 4] == [killer, chess.Move.from_uci('g2g3')]
+
+
+def test_killers_and_history():
+    board = chess.Board()
+    engine = NegamaxEngine(opening_book=False, endgame_table=False)
+    first, second, third = (chess.Move.from_uci(uci) for uci in ('g1f3', 'b1c3', 'e2e4'))
+    for move in (first, second, second, third):
+        engine.update_quiet_cutoff(board, move, 3, 2)
+    assert engine.killers[3] == [third, second] # the two most recent, without duplicates
+    assert engine.history[1, chess.B1, chess.C3] == 8
+    engine.reset_move_ordering()
+    assert engine.killers == {} and engine.history[1, chess.B1, chess.C3] == 4
+
+
+def test_move_ordering_statistics():
+    engine = NegamaxEngine(depth=3, opening_book=False, endgame_table=False)
+    assert engine.first_move_cutoff_rate() is None
+    engine.search(chess.Board())
+    assert engine.num_cutoffs > 0 and engine.first_move_cutoff_rate() > 50
+    assert any(engine.killers.values()) and engine.history.any()
+
+
+def searched_nodes(fen, **kwargs):
+    """ Evaluation, best move and node count of a depth 4 search. """
+    engine = NegamaxEngine(depth=4, opening_book=False, endgame_table=False, **kwargs)
+    move = engine.search(chess.Board(fen))
+    return engine.evaluation, move, engine.num_nodes
+
+
+@pytest.mark.parametrize('fen', FENS)
+def test_principal_variation_search(fen):
+    # The zero window searches only prove that moves are worse, the result is exact
+    evaluation, move, nodes = searched_nodes(fen)
+    pvs_evaluation, pvs_move, pvs_nodes = searched_nodes(fen, pvs=True)
+    assert pvs_evaluation == evaluation
+    assert pvs_nodes <= nodes
+
+
+@pytest.mark.parametrize('fen', FENS)
+def test_pruning_and_reductions(fen):
+    evaluation, move, nodes = searched_nodes(fen)
+    for settings in ({'null_move': True}, {'lmr': True}):
+        assert searched_nodes(fen, **settings)[1] in chess.Board(fen).legal_moves
+    reduced_evaluation, reduced_move, reduced_nodes = searched_nodes(fen, pvs=True, null_move=True, lmr=True)
+    assert reduced_move in chess.Board(fen).legal_moves
+    assert reduced_nodes < nodes
+
+
+def test_no_null_move_with_pawns_only():
+    # Zugzwang is common in pawn endings, passing is not tried there
+    fen = '8/5k2/8/3p4/3P4/8/5K2/8 w - - 0 1'
+    assert searched_nodes(fen, null_move=True) == searched_nodes(fen)
+
+
+def test_reductions_find_mate():
+    evaluation, move, nodes = searched_nodes(MATE_IN_ONE, pvs=True, null_move=True, lmr=True)
+    assert move == chess.Move.from_uci('d1d8') and evaluation == float('Inf')
+
+
+def python_chess_draw(board) -> bool:
+    """ Draw rules of NegamaxEngine.is_draw in terms of python-chess (a single repetition counts). """
+    return board.is_repetition(2) or board.halfmove_clock >= 100 and not board.is_checkmate() \
+        or board.is_insufficient_material()
+
+
+def test_repetitions_in_hash_stack():
+    # Knights moving back and forth repeat positions of the game before the root and of the search
+    rng = random.Random(3)
+    engine = NegamaxEngine(opening_book=False, endgame_table=False)
+    shuffles = ['g1f3', 'g8f6', 'f3g1', 'f6g8', 'b1c3', 'b8c6', 'c3b1', 'c6b8']
+    num_draws = 0
+    for i in range(20):
+        board = chess.Board()
+        for ply in range(rng.randint(0, 12)):
+            board.push(rng.choice(list(board.legal_moves)) if rng.random() < 0.3 else
+                       next((move for move in board.legal_moves if move.uci() in shuffles), chess.Move.null()))
+        engine.root_ply = len(board.move_stack)
+        engine.reset_position_keys(board)
+        assert not engine.is_draw(board, 0) or python_chess_draw(board)
+        # Walk down a line, back up and down another line (entries of the old line must be dropped)
+        for line in range(2):
+            depth = rng.randint(1, 8)
+            for ply in range(1, depth + 1):
+                moves = [move for move in board.legal_moves if move.uci() in shuffles] or list(board.legal_moves)
+                board.push(rng.choice(moves))
+                assert engine.is_draw(board, ply) == python_chess_draw(board), board.fen()
+                num_draws += python_chess_draw(board)
+            for ply in range(depth):
+                board.pop()
+    assert num_draws > 10
+
+
+def test_fifty_move_rule():
+    board = chess.Board('7k/8/8/8/8/8/8/R5K1 w - - 99 80')
+    engine = NegamaxEngine(opening_book=False, endgame_table=False)
+    engine.reset_position_keys(board)
+    board.push_uci('a1a2')
+    assert engine.is_draw(board, 1)
+    # Checkmate takes precedence
+    board = chess.Board('7k/8/6K1/8/8/8/8/R7 w - - 99 80')
+    engine.reset_position_keys(board)
+    board.push_uci('a1a8')
+    assert not engine.is_draw(board, 1)
+
+
+@pytest.mark.parametrize('fen,evaluation,move', [
+    ('7k/5Q2/6K1/8/8/8/8/8 b - - 0 1', 0, None), # stalemate at the root
+    ('5Q1k/8/6K1/8/8/8/8/8 b - - 0 1', float('-Inf'), None), # checkmate at the root
+    ('7k/8/5QK1/8/8/8/8/8 w - - 0 1', float('Inf'), 'f6f8'), # checkmate, not the stalemate after Qf7
+    ])
+def test_terminal_nodes(fen, evaluation, move):
+    engine = NegamaxEngine(depth=2, opening_book=False, endgame_table=False)
+    best_move = engine.search(chess.Board(fen))
+    assert engine.evaluation == evaluation
+    assert best_move == (move and chess.Move.from_uci(move))
@@ -0,0 +1,114 @@
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import chess
+import pytest
+
+from src.chess_engine import server
+from src.chess_engine.server import EngineService, ServiceError, make_server, parse_request
+
+
+SETTINGS = {'depth': 2, 'opening_book': False, 'endgame_table': False}
+
+
+@pytest.fixture(scope='module')
+def service():
+    with EngineService(SETTINGS, workers=2) as service:
+        assert service.wait_ready(60)
+        yield service
+
+
+@pytest.mark.parametrize('request_,message', [
+    ([], 'JSON object'),
+    ({'command': 'perft'}, 'No command'),
+    ({'fen': 'not a fen'}, 'invalid position'),
+    ({'moves': ['e2e5']}, 'invalid position'),
+    ({'depth': 0}, 'depth'),
+    ({'move_time': -1}, 'move_time'),
+    ({'timeout': 'soon'}, 'timeout'),
+    ])
+def test_parse_request_errors(request_, message):
+    with pytest.raises(ServiceError, match=message) as error:
+        parse_request(request_)
+    assert error.value.status == 400
+
+
+def test_bestmove_and_analyse(service):
+    result = service.run({'command': 'bestmove', 'moves': ['e2e4', 'e7e5']})
+    board = chess.Board()
+    board.push_uci('e2e4')
+    board.push_uci('e7e5')
+    assert chess.Move.from_uci(result['best_move']) in board.legal_moves
+    assert result['source'] == 'search' and result['depth'] == 2
+    result = service.run({'command': 'analyse', 'fen': '6k1/5ppp/8/8/8/8/5PPP/3R2K1 w - - 0 1', 'depth': 3})
+    assert result['pv'][0] == 'd1d8' and result['score'] == 'mate'
+
+
+def test_deadline_of_running_search(service):
+    start = time.time()
+    result = service.run({'move_time': 30, 'timeout': 0.5})
+    assert time.time() - start < 0.5 + server.DEADLINE_GRACE
+    assert result['best_move'] is not None
+
+
+def test_deadline_of_queued_request(service):
+    # Occupy both workers, then a request with a short deadline expires in the queue
+    busy = [service.submit({'move_time': 1, 'timeout': 5}) for i in range(2)]
+    with pytest.raises(ServiceError, match='deadline') as error:
+        service.run({'timeout': 0.1})
+    assert error.value.status == 504
+    for job in busy:
+        job.done.wait(10)
+    assert service.metrics()['requests']['expired'] >= 1
+
+
+def test_session_reuses_transposition_table(service):
+    request = {'command': 'analyse', 'fen': 'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1',
+               'depth': 3, 'session': 'game'}
+    first = service.run(request)
+    second = service.run(request)
+    assert second['worker'] == first['worker']
+    assert second['nodes'] < first['nodes'] # children are found in the session's table
+    assert service.end_session('game')
+    assert not service.end_session('game')
+    assert service.run(request)['nodes'] == first['nodes']
+    service.end_session('game')
+
+
+def test_sessions_limited_per_worker(service, monkeypatch):
+    monkeypatch.setattr(server, 'MAX_SESSIONS', 2)
+    with service.lock:
+        for session in ('a', 'b', 'c'):
+            service.pin_session(session, 0)
+        service.pin_session('d', 1)
+        service.pin_session('b', 0) # used again, 'c' is now the least recently used of worker 0
+        service.pin_session('e', 0)
+        pinned = {session: worker for session, worker in service.sessions.items() if session in 'abcde'}
+    assert pinned == {'d': 1, 'b': 0, 'e': 0}
+    for session in pinned:
+        service.end_session(session)
+
+
+def test_http(service):
+    http_server = make_server(service, port=0)
+    thread = threading.Thread(target=http_server.serve_forever, daemon=True)
+    thread.start()
+    url = f'http://127.0.0.1:{http_server.server_address[1]}'
+    try:
+        request = urllib.request.Request(url + '/bestmove', data=json.dumps({'depth': 1}).encode(), method='POST')
+        with urllib.request.urlopen(request) as response:
+            assert json.load(response)['best_move'] is not None
+        with urllib.request.urlopen(url + '/metrics') as response:
+            assert json.load(response)['workers'] == 2
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(urllib.request.Request(url + '/analyse', data=b'{"depth": 99}', method='POST'))
+        assert error.value.code == 400
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(urllib.request.Request(url + '/sessions/unknown', method='DELETE'))
+        assert error.value.code == 404
+    finally:
+        http_server.shutdown()
+        http_server.server_close()
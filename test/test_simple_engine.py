@@ -0,0 +1,82 @@
+import random
+
+import chess
+import pytest
+
+from src.chess_engine import SimpleEngine, bitboard
+from src.chess_engine.benchmark import POSITIONS
+
+
+def random_positions(seed, num_games=4, max_plies=120):
+    """ Every fifth position of random games. """
+    rng = random.Random(seed)
+    boards = []
+    for i in range(num_games):
+        board = chess.Board()
+        while not board.is_game_over() and len(board.move_stack) < max_plies:
+            board.push(rng.choice(list(board.legal_moves)))
+            if len(board.move_stack) % 5 == 0 and not board.is_game_over():
+                boards.append(board.copy())
+    return boards
+
+
+def attacking_candidates(board) -> set:
+    """ Checks and captures, or all moves if there are none (candidates of the slow path). """
+    moves = {move for move in board.legal_moves if board.is_capture(move) or board.gives_check(move)}
+    return moves or set(board.legal_moves)
+
+
+def limiting_candidates(board) -> set:
+    """ Moves leaving the opponent the fewest legal replies (candidates of the slow path). """
+    replies = {}
+    for move in board.legal_moves:
+        board.push(move)
+        replies[move] = board.legal_moves.count()
+        board.pop()
+    fewest = min(replies.values())
+    return {move for move, count in replies.items() if count == fewest}
+
+
+def chosen_moves(engine, board, num_calls=10) -> set:
+    fen = board.fen()
+    moves = {engine.make_move(board) for i in range(num_calls)}
+    assert board.fen() == fen
+    return moves
+
+
+@pytest.mark.parametrize('fen', [fen for fen, counts in POSITIONS.values()])
+def test_root_move_features(fen):
+    board = chess.Board(fen)
+    legal_moves, captures, checks, mobility = bitboard.root_move_features(board)
+    assert sorted(legal_moves, key=str) == sorted(board.legal_moves, key=str)
+    for move, capture, check, replies in zip(legal_moves, captures, checks, mobility):
+        assert capture == board.is_capture(move)
+        assert check == board.gives_check(move)
+        board.push(move)
+        assert replies == board.legal_moves.count()
+        board.pop()
+    assert (bitboard.root_move_features(board, count_replies=False)[3] == -1).all()
+
+
+def test_fast_candidates_match_slow_path():
+    random.seed(0)
+    for board in random_positions(seed=1):
+        assert chosen_moves(SimpleEngine('attacking'), board) <= attacking_candidates(board)
+        assert chosen_moves(SimpleEngine('attacking', fast=False), board) <= attacking_candidates(board)
+        assert chosen_moves(SimpleEngine('limiting'), board) <= limiting_candidates(board)
+        assert chosen_moves(SimpleEngine('limiting', fast=False), board) <= limiting_candidates(board)
+
+
+def test_fast_path_picks_all_candidates():
+    # The choice among the candidates stays random
+    random.seed(0)
+    board = chess.Board()
+    assert chosen_moves(SimpleEngine('attacking'), board, 400) == set(board.legal_moves)
+    board = chess.Board(POSITIONS['kiwipete'][0])
+    assert chosen_moves(SimpleEngine('attacking'), board, 400) == attacking_candidates(board)
+
+
+def test_chess960_uses_slow_path():
+    board = chess.Board.from_chess960_pos(100)
+    for heuristic in ('attacking', 'limiting'):
+        assert SimpleEngine(heuristic).make_move(board) in board.legal_moves
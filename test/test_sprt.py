@@ -0,0 +1,94 @@
+import pytest
+
+from src.chess_engine import SimpleEngine
+from src.chess_engine.game_formats import sprt_bounds, sprt_llr, sprt_match
+
+
+class ResigningEngine:
+    """ Player that resigns on its first move. """
+
+    def make_move(self, board):
+        return 'resign'
+
+    def __str__(self):
+        return 'resigningEngine'
+
+
+def decision(pair_scores, elo0=0, elo1=10):
+    """ Number of pairs until the SPRT stops and the accepted hypothesis (None without decision). """
+    lower, upper = sprt_bounds()
+    for n in range(1, len(pair_scores) + 1):
+        llr = sprt_llr(pair_scores[:n], elo0, elo1)
+        if llr >= upper:
+            return n, 'H1'
+        if llr <= lower:
+            return n, 'H0'
+    return len(pair_scores), None
+
+
+def test_bounds():
+    lower, upper = sprt_bounds(0.05, 0.05)
+    assert lower == pytest.approx(-2.944, abs=1e-3)
+    assert upper == pytest.approx(2.944, abs=1e-3)
+
+
+def test_no_pairs():
+    assert sprt_llr([]) == 0
+
+
+def test_all_wins_accept_h1():
+    n, hypothesis = decision([2] * 200)
+    assert hypothesis == 'H1'
+    assert 5 < n < 50
+
+
+def test_all_losses_accept_h0():
+    n, hypothesis = decision([0] * 200)
+    assert hypothesis == 'H0'
+    assert 5 < n < 50
+
+
+def test_all_draws_accept_h0():
+    # A score of exactly 50% is closer to elo0 = 0 than to elo1 = 10
+    n, hypothesis = decision([1] * 500)
+    assert hypothesis == 'H0'
+    assert n > 20
+
+
+def test_few_pairs_are_not_decisive():
+    for pair_scores in ([2], [0], [1], [2, 2], [2, 1.5]):
+        lower, upper = sprt_bounds()
+        assert lower < sprt_llr(pair_scores) < upper
+
+
+def test_single_different_pair_is_bounded():
+    all_wins = sprt_llr([2] * 200)
+    assert sprt_llr([2] * 199 + [1.5]) < all_wins < 1000
+
+
+def test_mixed_results():
+    # Equal players: wins and losses balance out, so H1 must not be accepted
+    balanced = [0.5, 1, 1, 1.5] * 400
+    assert decision(balanced)[1] == 'H0'
+    # A clearly stronger player is detected
+    stronger = [1, 1.5, 2, 1.5, 1, 0.5, 2, 1.5] * 200
+    assert decision(stronger)[1] == 'H1'
+
+
+def test_sprt_match_stops():
+    result = sprt_match(SimpleEngine('random'), ResigningEngine(), max_games=200, seed=0, verbose=False)
+    assert result['decision'] == 'H1'
+    assert result['losses'] == result['draws'] == 0
+    assert result['pentanomial'][-1] == result['num_games'] // 2
+    assert result['num_games'] < 200
+    assert result['llr'] >= result['bounds'][1]
+
+    result = sprt_match(ResigningEngine(), SimpleEngine('random'), max_games=200, seed=0, verbose=False)
+    assert result['decision'] == 'H0'
+    assert result['wins'] == 0
+
+
+def test_sprt_match_without_decision():
+    result = sprt_match(SimpleEngine('random'), ResigningEngine(), max_games=4, seed=0, verbose=False)
+    assert result['decision'] is None
+    assert result['num_games'] == 4
@@ -0,0 +1,132 @@
+import chess
+import pytest
+
+from src.chess_engine import NegamaxEngine
+from src.chess_engine.transposition import TranspositionTable, EXACT, LOWER, UPPER
+
+
+KEY = 0x9D39247E33776D41
+MOVE = chess.Move.from_uci('e2e4')
+REPLY = chess.Move.from_uci('e7e5')
+FENS = ['r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1',
+        '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1',
+        'r1bqkb1r/pppp1ppp/2n2n2/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4']
+
+
+def child_node(engine):
+    """ Set up the search state for the start position and play 1. e4 (a node at ply 1). """
+    board = chess.Board()
+    engine.root_ply = 0
+    engine.pv = []
+    engine.evaluator.reset(board)
+    engine.reset_position_keys(board)
+    engine.push_move(board, MOVE)
+    return board
+
+
+def test_store_and_probe():
+    table = TranspositionTable(1)
+    assert table.probe(KEY) is None
+    table.store(KEY, 3, 1.5, EXACT, MOVE)
+    assert table.probe(KEY) == (3, 1.5, EXACT, MOVE)
+    assert len(table) == 1
+    table.clear()
+    assert table.probe(KEY) is None and len(table) == 0
+
+
+def test_replacement_policy():
+    table = TranspositionTable(1)
+    other = KEY + table.num_buckets # same bucket, different position
+    table.store(KEY, 5, 1.0, EXACT, MOVE)
+    # A shallower result of another position goes to the always-replace slot
+    assert not table.store(other, 2, 2.0, LOWER, REPLY)
+    assert table.probe(KEY) == (5, 1.0, EXACT, MOVE)
+    assert table.probe(other) == (2, 2.0, LOWER, REPLY)
+    # A deeper result takes the depth-preferred slot
+    assert table.store(other, 6, 3.0, UPPER, REPLY)
+    assert table.probe(other) == (6, 3.0, UPPER, REPLY)
+    assert table.probe(KEY) is None
+
+
+@pytest.mark.parametrize('flag,score,window,cutoff', [
+    (EXACT, 0.5, (-10, 10), True),
+    (LOWER, 5, (-1, 1), True), # fail high: score >= beta
+    (LOWER, 5, (-10, 10), False), # only raises alpha
+    (UPPER, -5, (-1, 1), True), # fail low: score <= alpha
+    (UPPER, -5, (-10, 10), False), # only lowers beta
+    ])
+def test_bound_cutoffs(flag, score, window, cutoff):
+    engine = NegamaxEngine(depth=2, opening_book=False, endgame_table=False)
+    board = child_node(engine)
+    engine.tt.store(chess.polyglot.zobrist_hash(board), 2, score, flag, REPLY)
+    evaluation, move = engine.negamax(board, -1, 2, *window)
+    assert (engine.num_nodes == 1) == cutoff
+    if cutoff:
+        assert (evaluation, move) == (score, REPLY)
+
+
+def test_shallow_entry_is_not_used():
+    engine = NegamaxEngine(depth=2, opening_book=False, endgame_table=False)
+    board = child_node(engine)
+    engine.tt.store(chess.polyglot.zobrist_hash(board), 1, 0.5, EXACT, REPLY)
+    engine.negamax(board, -1, 2, -10, 10)
+    assert engine.num_nodes > 1
+    # The result of the search replaces the shallow entry
+    assert engine.tt.probe(chess.polyglot.zobrist_hash(board))[0] == 2
+
+
+@pytest.mark.parametrize('fen', FENS)
+def test_search_with_table(fen):
+    board = chess.Board(fen)
+    # Iterative deepening reuses the entries of earlier iterations and of transpositions
+    with_table = NegamaxEngine(opening_book=False, endgame_table=False)
+    without_table = NegamaxEngine(opening_book=False, endgame_table=False, transposition_table=False)
+    with_table.search(board, max_depth=4)
+    without_table.search(board, max_depth=4)
+    assert with_table.evaluation == without_table.evaluation
+    assert with_table.num_nodes < without_table.num_nodes
+    assert with_table.num_tt_hits > 0
+
+
+@pytest.fixture
+def shared_table():
+    table = TranspositionTable(1, shared=True)
+    yield table
+    table.close(unlink=True)
+
+
+def test_shared_table_attach(shared_table):
+    shared_table.store(KEY, 3, 1.5, EXACT, MOVE)
+    attached = TranspositionTable(1, name=shared_table.name)
+    assert attached.probe(KEY) == (3, 1.5, EXACT, MOVE)
+    attached.store(KEY + 1, 2, -0.5, UPPER, None)
+    assert shared_table.probe(KEY + 1) == (2, -0.5, UPPER, None)
+    attached.close()
+
+
+@pytest.mark.parametrize('field,value', [('scores', 7.0), ('depths', 9), ('flags', LOWER), ('moves', 1234)])
+def test_torn_entry_is_ignored(shared_table, field, value):
+    # Another process wrote one field of the slot between the writes of this entry
+    shared_table.store(KEY, 3, 1.5, EXACT, MOVE)
+    slot = 2 * (KEY % shared_table.num_buckets)
+    getattr(shared_table, field)[slot] = value
+    assert shared_table.probe(KEY) is None
+
+
+def test_torn_entry_is_replaced(shared_table):
+    shared_table.store(KEY, 5, 1.5, EXACT, MOVE)
+    slot = 2 * (KEY % shared_table.num_buckets)
+    shared_table.scores[slot] = 7.0
+    # The inconsistent entry is not protected by its depth
+    assert not shared_table.store(KEY, 1, 0.5, LOWER, MOVE)
+    assert shared_table.probe(KEY) == (1, 0.5, LOWER, MOVE)
+
+
+def test_parallel_search():
+    board = chess.Board('r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1')
+    engine = NegamaxEngine(depth=3, opening_book=False, endgame_table=False, workers=2)
+    try:
+        assert engine.search(board) in board.legal_moves
+        assert engine.completed_depth == 3
+    finally:
+        engine.close()
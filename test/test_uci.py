@@ -0,0 +1,127 @@
+import io
+import time
+
+import chess
+import pytest
+
+from src.chess_engine import NegamaxEngine
+from src.chess_engine.uci import UciInterface
+
+
+MATE_IN_TWO = 'kbK5/pp6/1P6/8/8/8/8/R7 w - - 0 1' # 1. Ra6 bxa6 2. b7#
+
+
+@pytest.fixture
+def uci():
+    interface = UciInterface(io.StringIO(), io.StringIO())
+    interface.handle('setoption name OwnBook value false')
+    yield interface
+    interface.stop_search()
+    interface.engine.close()
+
+
+def output(interface):
+    return interface.output_stream.getvalue().splitlines()
+
+
+def wait(interface, timeout=30):
+    """ Wait for the search thread and return the bestmove line. """
+    interface.search_thread.join(timeout)
+    assert not interface.search_thread.is_alive()
+    return [line for line in output(interface) if line.startswith('bestmove')][-1]
+
+
+def test_handshake(uci):
+    uci.handle('uci')
+    uci.handle('isready')
+    lines = output(uci)
+    assert lines[0] == 'id name NegamaxEngine'
+    assert 'option name Ponder type check default false' in lines
+    assert lines[-2:] == ['uciok', 'readyok']
+
+
+def test_go_depth(uci):
+    uci.handle('position startpos moves e2e4 e7e5')
+    uci.handle('go depth 2')
+    bestmove = wait(uci).split()
+    board = chess.Board()
+    board.push_uci('e2e4')
+    board.push_uci('e7e5')
+    assert chess.Move.from_uci(bestmove[1]) in board.legal_moves
+    assert any(line.startswith('info depth 2 ') for line in output(uci))
+
+
+def test_invalid_commands_are_ignored(uci):
+    uci.handle('position startpos moves e2e4')
+    for command in ('position startpos moves e2e4 e7e6 e1e3', 'position fen not a fen',
+                    'setoption name Hash value lots', 'go depth two'):
+        assert uci.handle(command)
+    assert uci.board.move_stack == [chess.Move.from_uci('e2e4')] # the last valid position is kept
+    assert uci.options['Hash'] == 16
+    assert sum(line.startswith('info string ignored') for line in output(uci)) == 4
+    uci.handle('isready')
+    assert output(uci)[-1] == 'readyok'
+
+
+def test_run_survives_invalid_input():
+    commands = 'uci\nposition startpos moves e2e5\nsetoption name Threads value x\nisready\nquit\n'
+    interface = UciInterface(io.StringIO(commands), io.StringIO())
+    interface.run()
+    assert output(interface)[-1] == 'readyok'
+
+
+@pytest.mark.parametrize('fen,mate', [('6k1/5ppp/8/8/8/8/5PPP/3R2K1 w - - 0 1', 'mate 1'), (MATE_IN_TWO, 'mate 2')])
+def test_mate_distance(uci, fen, mate):
+    uci.handle(f'position fen {fen}')
+    uci.handle('go depth 5')
+    wait(uci)
+    infos = [line for line in output(uci) if line.startswith('info depth')]
+    assert f'score {mate} ' in infos[-1]
+
+
+def test_mate_distance_with_short_pv(uci):
+    # A table hit can cut the principal variation, the distance comes from the score
+    uci.send_info({'depth': 6, 'score': float('Inf'), 'mate_plies': 5, 'nodes': 10, 'time': 0.1,
+                   'pv': [chess.Move.from_uci('a1a6')]})
+    uci.send_info({'depth': 6, 'score': float('-Inf'), 'mate_plies': 4, 'nodes': 10, 'time': 0.1,
+                   'pv': [chess.Move.from_uci('a1a6')]})
+    assert ' score mate 3 ' in output(uci)[-2]
+    assert ' score mate -2 ' in output(uci)[-1]
+
+
+def test_ponderhit_before_search_starts(uci):
+    uci.handle('position startpos')
+    uci.handle('go ponder movetime 200')
+    # Sent immediately, possibly before the search thread set up its deadline
+    uci.handle('ponderhit')
+    start = time.perf_counter()
+    wait(uci, timeout=10)
+    assert time.perf_counter() - start < 5
+
+
+def test_pending_deadline():
+    engine = NegamaxEngine(opening_book=False, endgame_table=False)
+    engine.set_deadline(0.05)
+    start = time.perf_counter()
+    assert engine.search(chess.Board(), max_depth=64) is not None
+    assert time.perf_counter() - start < 5
+    assert engine.completed_depth < 64
+    # Without a deadline, only the depth limit applies
+    engine.set_deadline(0.01)
+    engine.set_deadline(None)
+    engine.search(chess.Board(), max_depth=2)
+    assert engine.completed_depth == 2
+
+
+@pytest.mark.parametrize('transposition_table', [True, False])
+def test_mate_plies(transposition_table):
+    engine = NegamaxEngine(depth=5, opening_book=False, endgame_table=False, transposition_table=transposition_table)
+    board = chess.Board(MATE_IN_TWO)
+    assert engine.search(board) == chess.Move.from_uci('a1a6')
+    assert engine.evaluation == float('Inf') and engine.mate_plies == 3
+    # Iterative deepening over the filled table
+    engine.search(board, max_depth=6)
+    assert engine.evaluation == float('Inf') and engine.mate_plies == 3
+    board.push_uci('a1a6')
+    engine.search(board, max_depth=4)
+    assert engine.evaluation == float('-Inf') and engine.mate_plies == 2